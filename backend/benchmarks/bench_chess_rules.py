@@ -0,0 +1,94 @@
+"""Per-move cost of game-end detection as games get longer.
+
+Plays each game one move at a time the way /move sees it, and times what a
+request spends on the board:
+- before: replay the stored moves, then is_game_over(claim_draw=True)
+  followed by the outcome chain (is_checkmate, ..., can_claim_threefold)
+- after: GameRules from the per-game cache, push the move, classify
+
+Times are averaged over the plies leading up to each reported length. Games
+are random playouts biased towards quiet moves, so the window since the last
+capture or pawn move is long, which is the slow case for repetition claims.
+
+    PYTHONPATH=backend python backend/benchmarks/bench_chess_rules.py
+"""
+import random
+import time
+
+import chess
+
+from theo_api.core.chess_rules import GameRulesCache
+
+LENGTHS = (20, 60, 120, 240, 400)
+WINDOW = 10
+GAMES = 5
+
+
+def playout(plies: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    board = chess.Board()
+    moves = []
+    while len(moves) < plies:
+        legal = list(board.legal_moves)
+        quiet = [m for m in legal if not board.is_zeroing(m)]
+        candidates = quiet if quiet and rng.random() < 0.85 else legal
+        rng.shuffle(candidates)
+        for move in candidates:
+            board.push(move)
+            if not board.is_game_over(claim_draw=True):
+                moves.append(move.uci())
+                break
+            board.pop()
+        else:
+            return playout(plies, seed + 1000)
+    return moves
+
+
+def before(stored: list[str], uci: str) -> None:
+    board = chess.Board()
+    for m in stored:
+        board.push_uci(m)
+    board.push_uci(uci)
+    if board.is_game_over(claim_draw=True):
+        board.is_checkmate() or board.is_stalemate() or board.is_insufficient_material() \
+            or board.can_claim_fifty_moves() or board.can_claim_threefold_repetition()
+
+
+def after(cache: GameRulesCache, stored: list[str], uci: str) -> None:
+    rules = cache.checkout("g", chess.STARTING_FEN, stored)
+    rules.push(chess.Move.from_uci(uci))
+    rules.outcome()
+    cache.checkin("g", rules)
+
+
+def per_ply(fn, moves: list[str], *args) -> list[float]:
+    """Microseconds spent by `fn` on each move of the game, in order."""
+    out = []
+    stored: list[str] = []
+    for uci in moves:
+        start = time.perf_counter()
+        fn(*args, stored, uci)
+        out.append((time.perf_counter() - start) * 1e6)
+        stored.append(uci)
+    return out
+
+
+def main() -> None:
+    longest = max(LENGTHS)
+    t_before = [0.0] * longest
+    t_after = [0.0] * longest
+    for seed in range(GAMES):
+        moves = playout(longest, seed)
+        for i, t in enumerate(per_ply(before, moves)):
+            t_before[i] += t / GAMES
+        for i, t in enumerate(per_ply(after, moves, GameRulesCache())):
+            t_after[i] += t / GAMES
+
+    print(f"{'plies':>6} {'before us/move':>15} {'after us/move':>14}")
+    for n in LENGTHS:
+        window = slice(n - WINDOW, n)
+        print(f"{n:>6} {sum(t_before[window]) / WINDOW:>15.1f} {sum(t_after[window]) / WINDOW:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Game listing page cost at increasing depth: keyset cursor vs OFFSET.
+
+Fills a SQLite file with synthetic games (short FENs, no moves), then times
+fetching one page of 50 at several depths into the listing, unfiltered and
+with status / Elo filters.
+
+    PYTHONPATH=backend python backend/benchmarks/bench_game_listing.py [--rows 1000000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from theo_api.services.storage import repo
+from theo_api.services.storage.db import Base
+from theo_api.services.storage.models import Game
+
+PAGE = 50
+REPEAT = 20
+
+
+def fill(path: str, rows: int) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    rng = random.Random(3)
+    base = datetime(2025, 1, 1)
+    conn = sqlite3.connect(path)
+    batch = []
+    for i in range(rows):
+        batch.append((
+            str(uuid.UUID(int=rng.getrandbits(128))),
+            (base + timedelta(seconds=i * 30 + rng.randint(0, 29))).strftime("%Y-%m-%d %H:%M:%S.%f"),
+            rng.choice((400, 800, 1200, 1600, 2000)),
+            rng.choice(("white", "black")),
+            "8/8/8/8/8/8/8/8 w - - 0 1",
+            "8/8/8/8/8/8/8/8 w - - 0 1",
+            "",
+            "",
+            "active" if rng.random() < 0.05 else "finished",
+        ))
+        if len(batch) == 50_000:
+            conn.executemany("INSERT INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            batch = []
+    conn.executemany("INSERT INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def timed(fn) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "games.db")
+        start = time.perf_counter()
+        fill(path, args.rows)
+        print(f"{args.rows:,} games in {time.perf_counter() - start:.0f}s")
+
+        engine = create_engine(f"sqlite:///{path}")
+        with Session(engine) as db:
+            for label, filters in (
+                ("all", []),
+                ("status=active", repo.game_filters(status="active")),
+                ("elo_bucket=1200", repo.game_filters(elo_bucket=1200)),
+            ):
+                total = len(db.execute(select(Game.id).where(*filters)).all())
+                print(f"\n{label} ({total:,} rows)")
+                print(f"{'depth':>10} {'keyset ms':>10} {'offset ms':>10}")
+                for frac in (0.0, 0.1, 0.5, 0.99):
+                    depth = int(total * frac)
+                    # Cursor of the row just before `depth`, as a client following next_cursor would hold
+                    after = None
+                    if depth:
+                        row = db.execute(
+                            select(Game.created_at, Game.id).where(*filters)
+                            .order_by(Game.created_at.desc(), Game.id.desc()).offset(depth - 1).limit(1)
+                        ).one()
+                        after = (row.created_at, row.id)
+                    keyset = timed(lambda: repo.list_games(db, filters, PAGE, after))
+                    offset = timed(lambda: db.execute(
+                        select(Game.id, Game.created_at, Game.status, Game.elo_bucket, Game.player_color, Game.current_fen)
+                        .where(*filters).order_by(Game.created_at.desc(), Game.id.desc()).offset(depth).limit(PAGE)
+                    ).all())
+                    print(f"{depth:>10,} {keyset:>10.2f} {offset:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Metrics update cost: counter and histogram updates from one and several threads.
+
+    PYTHONPATH=backend python backend/benchmarks/bench_metrics.py [--ops 200000]
+"""
+import argparse
+import threading
+import time
+
+from theo_api.core import metrics
+
+
+def _per_op_us(fn, ops: int, threads: int) -> float:
+    def run():
+        for _ in range(ops):
+            fn()
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return (time.perf_counter() - start) / (ops * threads) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ops", type=int, default=200_000)
+    args = parser.parse_args()
+
+    c = metrics.counter("bench_counter_total", "benchmark")
+    h = metrics.histogram("bench_seconds", "benchmark", ("elo_bucket",))
+    child = h.labels(elo_bucket=800)
+
+    cases = [
+        ("counter.inc()", c.inc),
+        ("histogram.labels().observe()", lambda: h.labels(elo_bucket=800).observe(0.042)),
+        ("bound child.observe()", lambda: child.observe(0.042)),
+    ]
+    for threads in (1, 4):
+        for name, fn in cases:
+            print(f"{name:<32} threads={threads}  {_per_op_us(fn, args.ops, threads):6.2f} us/op")
+
+    start = time.perf_counter()
+    body = metrics.render()
+    print(f"render(): {(time.perf_counter() - start) * 1000:.2f} ms, {len(body)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""PGN import throughput: end to end, and per stage (parsing, DB inserts).
+
+Generates a synthetic archive of random games (~70 plies, some comments and
+variations), then imports it into a fresh SQLite file.
+
+    PYTHONPATH=backend python backend/benchmarks/bench_pgn_import.py [--games 5000] [--workers N]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+import chess
+import chess.pgn
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from theo_api.services.storage import repo
+from theo_api.services.storage.db import Base
+from theo_api.services.storage.pgn_import import _rows, import_pgn
+from theo_api.utils.pgn import iter_chunks, parse_chunk
+
+
+def write_archive(path: str, n: int) -> None:
+    rng = random.Random(7)
+    with open(path, "w") as fh:
+        for i in range(n):
+            board = chess.Board()
+            game = chess.pgn.Game()
+            game.headers["White"] = f"player{i}"
+            game.headers["WhiteElo"] = str(rng.randint(600, 2400))
+            node = game
+            for _ in range(rng.randint(30, 110)):
+                moves = list(board.legal_moves)
+                if not moves:
+                    break
+                move = rng.choice(moves)
+                if rng.random() < 0.03:
+                    node.add_variation(rng.choice(moves))
+                node = node.add_main_variation(move) if node.variations else node.add_variation(move)
+                if rng.random() < 0.05:
+                    node.comment = "[%clk 0:03:00]"
+                board.push(move)
+            game.headers["Result"] = board.result(claim_draw=True)
+            print(game, file=fh, end="\n\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pgn = os.path.join(tmp, "archive.pgn")
+        write_archive(pgn, args.games)
+        print(f"{args.games} games, {os.path.getsize(pgn) / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        results = []
+        with open(pgn, "rb") as fh:
+            for chunk in iter_chunks(fh):
+                results.append(parse_chunk(chunk))
+        parse_s = time.perf_counter() - start
+        print(f"parse (one process):     {args.games / parse_s:8,.0f} games/s")
+
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'insert.db')}")
+        Base.metadata.create_all(engine)
+        batches = [_rows(results[i:i + 20], None, datetime.utcnow()) for i in range(0, len(results), 20)]
+        start = time.perf_counter()
+        with sessionmaker(bind=engine)() as db:
+            for games, positions in batches:
+                repo.insert_games(db, games, positions)
+                db.commit()
+        insert_s = time.perf_counter() - start
+        rows = sum(len(p) for _, p in batches)
+        print(f"insert (main process):   {args.games / insert_s:8,.0f} games/s ({rows:,} index rows)")
+
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'import.db')}")
+        Base.metadata.create_all(engine)
+        stats = import_pgn(pgn, sessionmaker(bind=engine), workers=args.workers)
+        print(f"import ({args.workers} workers):     {stats.rate:8,.0f} games/s")
+
+
+if __name__ == "__main__":
+    main()
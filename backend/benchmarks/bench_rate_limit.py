@@ -0,0 +1,113 @@
+"""Rate limiter microbenchmark: throughput and memory with many distinct keys.
+
+Compares the GCRA limiter in `theo_api.core.rate_limit` with the previous
+list-of-timestamps implementation, and measures the per-check cost of the
+shared-memory and TCP-store backends.
+
+    PYTHONPATH=backend python backend/benchmarks/bench_rate_limit.py [--keys 100000]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from theo_api.core.rate_limit import RateLimiter, SharedMemoryRateLimiter, TcpRateLimiter
+from theo_api.core.rate_limit_server import serve
+
+
+class ListRateLimiter:
+    """The previous implementation, kept here as the baseline."""
+
+    def __init__(self, max_requests: int, per_seconds: int):
+        self.max_requests = max_requests
+        self.per_seconds = per_seconds
+        self.state: dict[str, list[float]] = {}
+        self.lock = asyncio.Lock()
+
+    async def hit(self, key: str) -> bool:
+        now = time.time()
+        async with self.lock:
+            q = self.state.get(key) or []
+            cutoff = now - self.per_seconds
+            q = [t for t in q if t > cutoff]
+            if len(q) >= self.max_requests:
+                self.state[key] = q
+                return False
+            q.append(now)
+            self.state[key] = q
+            return True
+
+
+async def _drive(limiter, keys: list[str], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for key in keys:
+            await limiter.hit(key)
+    return time.perf_counter() - start
+
+
+def run(name: str, limiter, keys: list[str], rounds: int) -> None:
+    tracemalloc.start()
+    elapsed = asyncio.run(_drive(limiter, keys, rounds))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    hits = len(keys) * rounds
+    print(f"{name:>6}: {hits / elapsed:>12,.0f} hits/s  {elapsed / hits * 1e6:6.2f} us/hit  peak {peak / 2**20:7.1f} MiB")
+
+
+def run_sync(name: str, limiter, keys: list[str], rounds: int) -> None:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for key in keys:
+            limiter.acquire(key)
+    elapsed = time.perf_counter() - start
+    hits = len(keys) * rounds
+    print(f"{name:>6}: {hits / elapsed:>12,.0f} hits/s  {elapsed / hits * 1e6:6.2f} us/hit")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=30)
+    args = parser.parse_args()
+
+    keys = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(args.keys)]
+    print(f"{args.keys:,} distinct keys x {args.rounds} rounds, limit 60/min")
+    run("list", ListRateLimiter(60, 60), keys, args.rounds)
+    run("gcra", RateLimiter(60, 60), keys, args.rounds)
+
+    # Without the coroutine wrapper, as used by rate_limit_dependency
+    run_sync("sync", RateLimiter(60, 60), keys, args.rounds)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shm = SharedMemoryRateLimiter(60, 60, path=os.path.join(tmp, "rl"), slots=2 * len(keys))
+        run_sync("shm", shm, keys, args.rounds)
+        shm.close()
+
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(serve("127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    host, port = server.sockets[0].getsockname()[:2]
+    tcp = TcpRateLimiter(60, 60, address=f"{host}:{port}", timeout=1.0)
+    run_sync("tcp", tcp, keys[: max(1, len(keys) // 10)], 1)
+    tcp._drop_connection()
+    time.sleep(0.05)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+    # Idle keys are reclaimed once their window has passed
+    limiter = RateLimiter(60, 60)
+    now = time.monotonic()
+    for key in keys:
+        limiter.acquire(key, now)
+    print(f"gcra keys before eviction: {len(limiter):,}, after window: ", end="")
+    limiter.evict_idle(now + 61)
+    print(f"{len(limiter):,}")
+
+
+if __name__ == "__main__":
+    main()
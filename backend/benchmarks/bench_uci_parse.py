@@ -0,0 +1,127 @@
+"""UCI output parsing cost per search.
+
+Replays Stockfish-like output for one search (depth N, MultiPV 3, with
+currmove and hashfull-only lines as Stockfish prints them on long searches)
+through the previous per-line parser and through the current pipeline:
+reader-side filtering, cheap multipv slotting, and parsing only the final
+line of each slot.
+
+The output is synthetic, shaped after real Stockfish 16 logs, so the
+benchmark runs without an engine binary.
+
+    PYTHONPATH=backend python backend/benchmarks/bench_uci_parse.py [--depth 14] [--searches 2000]
+"""
+import argparse
+import random
+import time
+
+from theo_api.services.stockfish.engine import UciLine, _is_pv_info, _multipv_of, _parse_info
+
+MOVES = ["e2e4", "d2d4", "g1f3", "c2c4", "e7e5", "d7d5", "g8f6", "c7c5", "b1c3", "f1c4", "b8c6", "f8b4"]
+
+
+def synthetic_search(depth: int, multipv: int = 3, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    out = ["info string NNUE evaluation using nn-5af11540bbfe.nnue enabled"]
+    nodes = 0
+    for d in range(1, depth + 1):
+        for m in range(1, 30 if d >= 10 else 0):
+            out.append(f"info depth {d} currmove {rng.choice(MOVES)} currmovenumber {m}")
+        for mpv in range(1, multipv + 1):
+            nodes += rng.randint(500, 5000) * d
+            bound = rng.choice(["", "", "", " lowerbound", " upperbound"]) if d > 8 else ""
+            pv = " ".join(rng.choice(MOVES) for _ in range(min(d, 12)))
+            out.append(
+                f"info depth {d} seldepth {d + rng.randint(0, 8)} multipv {mpv} score cp {rng.randint(-60, 60)}{bound} "
+                f"nodes {nodes} nps {rng.randint(800_000, 1_200_000)} hashfull {min(999, d * 7)} tbhits 0 "
+                f"time {d * 9} pv {pv}"
+            )
+        if d >= 10:
+            out.append(f"info depth {d} seldepth {d + 6} multipv 1 hashfull {d * 7} nodes {nodes} time {d * 9}")
+    out.append(f"bestmove {MOVES[0]} ponder {MOVES[4]}")
+    return out
+
+
+def _old_parse_info(line: str):
+    # The previous parser: tokenizes every line and calls toks.index per field
+    toks = line.split()
+    if "pv" not in toks or "score" not in toks:
+        return None
+
+    def get_int_after(key: str) -> int | None:
+        if key in toks:
+            i = toks.index(key)
+            if i + 1 < len(toks):
+                try:
+                    return int(toks[i + 1])
+                except ValueError:
+                    return None
+        return None
+
+    depth = get_int_after("depth") or 0
+    multipv = get_int_after("multipv") or 1
+    si = toks.index("score")
+    eval_cp = mate = None
+    n = int(toks[si + 2])
+    if toks[si + 1] == "cp":
+        eval_cp = n
+    else:
+        mate = n
+    bound = toks[si + 3][:5] if toks[si + 3] in ("lowerbound", "upperbound") else None
+    pvi = toks.index("pv")
+    return multipv, UciLine(
+        pv=toks[pvi + 1 :], eval_cp=eval_cp, mate=mate, depth=depth,
+        seldepth=get_int_after("seldepth"), nodes=get_int_after("nodes"), nps=get_int_after("nps"),
+        hashfull=get_int_after("hashfull"), time_ms=get_int_after("time"), tbhits=get_int_after("tbhits"),
+        bound=bound,
+    )
+
+
+def old_pipeline(output: list[str]) -> dict[int, UciLine]:
+    lines = {}
+    for line in output:
+        if line.startswith("info "):
+            parsed = _old_parse_info(line)
+            if parsed is not None:
+                lines[parsed[0]] = parsed[1]
+    return lines
+
+
+def new_pipeline(output: list[str]) -> dict[int, UciLine]:
+    raw = {}
+    for line in output:
+        # reader thread
+        if line.startswith("info ") and not _is_pv_info(line):
+            continue
+        # analyze loop
+        if line.startswith("info "):
+            raw[_multipv_of(line)] = line
+    lines = {}
+    for slot, info in raw.items():
+        parsed = _parse_info(info)
+        if parsed is not None:
+            lines[slot] = parsed[1]
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--depth", type=int, default=14)
+    parser.add_argument("--searches", type=int, default=2000)
+    args = parser.parse_args()
+
+    output = synthetic_search(args.depth)
+    queued_new = sum(1 for line in output if not (line.startswith("info ") and not _is_pv_info(line)))
+    assert old_pipeline(output) == new_pipeline(output)
+    print(f"{len(output)} lines per search, {queued_new} reach the queue after filtering")
+
+    for name, fn in (("old per-line parse", old_pipeline), ("filter + final-line parse", new_pipeline)):
+        start = time.perf_counter()
+        for _ in range(args.searches):
+            fn(output)
+        per_search = (time.perf_counter() - start) / args.searches * 1e6
+        print(f"{name:<28} {per_search:8.1f} us/search")
+
+
+if __name__ == "__main__":
+    main()
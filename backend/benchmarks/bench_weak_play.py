@@ -0,0 +1,129 @@
+"""Engine CPU per move and move quality of the 400 and 800 buckets.
+
+Plays both the previous low-Elo settings (depth 6/8, MultiPV 3, weighted
+pick among the top lines) and the current ones (node-budgeted search that
+always plays the best line, plus heuristic beginner moves, see
+services/stockfish/weak.py) on the same positions. The positions come from seeded random playouts.
+
+For each setting it reports the Stockfish CPU time per move (from
+/proc/<pid>/stat, so Linux only), the wall time per move, and the average
+centipawn loss of the chosen moves. The loss is judged by a separate
+reference search at --ref-depth, which is not counted.
+
+Needs a Stockfish binary (STOCKFISH_PATH or `stockfish` on PATH):
+
+    PYTHONPATH=backend python backend/benchmarks/bench_weak_play.py [--positions 200] [--ref-depth 12]
+"""
+import argparse
+import os
+import random
+import time
+
+import chess
+
+from theo_api.services.stockfish.difficulty import Difficulty, get_difficulty
+from theo_api.services.stockfish.engine import StockfishUCI
+from theo_api.services.stockfish.weak import heuristic_move
+
+OLD = {
+    400: Difficulty(skill_level=2, movetime_ms=50, depth=6, multipv=3, choose_top_n=3),
+    800: Difficulty(skill_level=6, movetime_ms=100, depth=8, multipv=3, choose_top_n=2),
+}
+MATE_CP = 1000
+
+
+def positions(n: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    out = []
+    while len(out) < n:
+        board = chess.Board()
+        for _ in range(rng.randint(6, 40)):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            board.push(rng.choice(moves))
+        if not board.is_game_over():
+            out.append(board.fen())
+    return out
+
+
+def cpu_seconds(engine: StockfishUCI) -> float:
+    with open(f"/proc/{engine.proc.pid}/stat") as fh:
+        fields = fh.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def pick(analysis, diff: Difficulty, fen: str, rng: random.Random) -> str | None:
+    # Mirrors analysis.choose_engine_reply
+    reply = analysis.best_move
+    candidates = [l.pv[0] for l in analysis.lines[: diff.choose_top_n] if l.pv]
+    if diff.choose_top_n > 1 and candidates:
+        weights = [max(0.05, 0.7 / (i + 1)) for i in range(len(candidates))]
+        reply = rng.choices(candidates, weights=weights, k=1)[0]
+    if diff.blunder_rate and rng.random() < diff.blunder_rate:
+        move = heuristic_move(chess.Board(fen), rng)
+        reply = move.uci() if move else reply
+    return reply
+
+
+def score(analysis) -> int:
+    line = analysis.lines[0]
+    if line.mate is not None:
+        return MATE_CP if line.mate > 0 else -MATE_CP
+    return max(-MATE_CP, min(MATE_CP, line.eval_cp))
+
+
+def play(engine: StockfishUCI, diff: Difficulty, fens: list[str], seed: int) -> tuple[list[str], float, float]:
+    rng = random.Random(seed)
+    engine.set_option("Skill Level", diff.skill_level)
+    replies = []
+    cpu0, wall0 = cpu_seconds(engine), time.perf_counter()
+    for fen in fens:
+        analysis = engine.analyze(fen=fen, movetime_ms=diff.movetime_ms, depth=diff.depth, multipv=diff.multipv, nodes=diff.nodes)
+        replies.append(pick(analysis, diff, fen, rng))
+    # Python-side work (the heuristic policy) runs in this process and is included in wall time
+    return replies, (cpu_seconds(engine) - cpu0) / len(fens), (time.perf_counter() - wall0) / len(fens)
+
+
+def cp_loss(ref: StockfishUCI, fens: list[str], replies: list[str], depth: int, best: dict[str, int]) -> float:
+    total = 0
+    for fen, uci in zip(fens, replies):
+        if fen not in best:
+            best[fen] = score(ref.analyze(fen=fen, movetime_ms=0, depth=depth, multipv=1))
+        board = chess.Board(fen)
+        board.push_uci(uci)
+        if board.is_checkmate():
+            after = MATE_CP
+        elif board.is_game_over():
+            after = 0
+        else:
+            after = -score(ref.analyze(fen=board.fen(), movetime_ms=0, depth=depth - 1, multipv=1))
+        total += max(0, best[fen] - after)
+    return total / len(fens)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", type=int, default=200)
+    parser.add_argument("--ref-depth", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fens = positions(args.positions, args.seed)
+    engine, ref = StockfishUCI(), StockfishUCI()
+    ref.set_option("Skill Level", 20)
+    best: dict[str, int] = {}
+    try:
+        print(f"{'bucket':>6}  {'setting':<8} {'cpu ms/move':>11} {'wall ms/move':>12} {'avg cp loss':>11}")
+        for bucket in (400, 800):
+            for name, diff in (("previous", OLD[bucket]), ("current", get_difficulty(bucket))):
+                replies, cpu, wall = play(engine, diff, fens, args.seed)
+                loss = cp_loss(ref, fens, replies, args.ref_depth, best)
+                print(f"{bucket:>6}  {name:<8} {cpu * 1000:>11.1f} {wall * 1000:>12.1f} {loss:>11.0f}")
+    finally:
+        engine.close()
+        ref.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Shared fixtures: an in-memory database wired into the app's `get_db`.
+
+Modules adjust `session_factory` by overriding the hook fixtures below, or
+by wrapping it in a fixture of the same name for other per-module patches.
+A test that needs a real connection pool parametrizes `db_engine`
+indirectly with pool options, e.g. `{"pool_size": 2}`, and gets a file
+database behind a QueuePool.
+"""
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
+
+import theo_api.api.games as games_mod
+from theo_api.core.game_versions import GameVersions
+from theo_api.main import app
+from theo_api.services.storage.db import Base, get_db
+
+
+@pytest.fixture
+def foreign_keys():
+	"""Override to return True to enforce foreign keys, like the server databases do."""
+	return False
+
+
+@pytest.fixture
+def game_versions_ttl():
+	"""Override with a TTL (seconds) to give the games API a fresh version map."""
+	return None
+
+
+@pytest.fixture
+def db_engine(request, tmp_path, foreign_keys):
+	pool = getattr(request, "param", None)
+	if pool is None:
+		engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+	else:
+		engine = create_engine(
+			f"sqlite:///{tmp_path / 'test.db'}",
+			connect_args={"check_same_thread": False},
+			poolclass=QueuePool,
+			**pool,
+		)
+	if foreign_keys:
+		event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA foreign_keys=ON"))
+	Base.metadata.create_all(bind=engine)
+	# Not disposed: sessions of closed WebSocket tests may still be finalized later
+	return engine
+
+
+@pytest.fixture
+def session_factory(monkeypatch, db_engine, game_versions_ttl):
+	factory = sessionmaker(bind=db_engine, autoflush=False, autocommit=False)
+
+	def override_get_db():
+		db = factory()
+		try:
+			yield db
+		finally:
+			db.close()
+
+	if game_versions_ttl is not None:
+		monkeypatch.setattr(games_mod, "game_versions", GameVersions(ttl=game_versions_ttl))
+	monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+	return factory
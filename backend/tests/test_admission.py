@@ -0,0 +1,55 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import theo_api.services.stockfish.analysis as analysis_mod
+from theo_api.core.admission import AdmissionController, EngineOverloaded
+from theo_api.main import app
+from theo_api.services.stockfish.difficulty import get_difficulty
+
+
+def test_admits_until_capacity_then_sheds():
+	ctrl = AdmissionController(capacity_ms=500, degrade_ratio=1.0, parallelism=1)
+	strong = get_difficulty(2000)  # 400 ms budget
+	with ctrl.admit(strong, degradable=False) as first:
+		assert first.difficulty == strong
+		assert ctrl.outstanding_ms == 400
+		with pytest.raises(EngineOverloaded) as exc:
+			with ctrl.admit(strong, degradable=False):
+				pass
+		assert exc.value.retry_after >= 1
+	assert ctrl.outstanding_ms == 0
+	assert ctrl.shed == 1
+
+
+def test_cheap_requests_fit_where_expensive_do_not():
+	ctrl = AdmissionController(capacity_ms=500, degrade_ratio=1.0)
+	with ctrl.admit(get_difficulty(2000), degradable=False):
+		with ctrl.admit(get_difficulty(400), degradable=False) as cheap:
+			assert cheap.cost_ms == 50
+
+
+def test_degrades_above_soft_limit():
+	ctrl = AdmissionController(capacity_ms=1000, degrade_ratio=0.5)
+	full = get_difficulty(2000)
+	with ctrl.admit(full):
+		with ctrl.admit(full) as second:
+			assert second.degraded
+			assert second.difficulty.depth < full.depth
+			assert second.cost_ms < 400
+	assert ctrl.degraded == 1
+
+
+def test_idle_engine_always_admits():
+	ctrl = AdmissionController(capacity_ms=10)
+	with ctrl.admit(get_difficulty(2000), degradable=False) as ticket:
+		assert ticket.cost_ms == 400
+
+
+def test_overload_maps_to_503_with_retry_after(monkeypatch):
+	def overloaded(fen, elo):
+		raise EngineOverloaded(retry_after=3)
+
+	monkeypatch.setattr(analysis_mod, "choose_engine_reply", overloaded)
+	resp = TestClient(app).post("/api/coach/hint", json={"fen": "startpos", "elo": 1200})
+	assert resp.status_code == 503
+	assert resp.headers["Retry-After"] == "3"
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from theo_api.config import settings
+from theo_api.main import app
+from theo_api.services.coaching.post_game import review_key
+from theo_api.services.storage import archive, repo
+from theo_api.services.storage.models import ArchivedGame, Game
+
+
+@pytest.fixture
+def foreign_keys():
+	return True
+
+
+@pytest.fixture
+def session_factory(session_factory, tmp_path, monkeypatch):
+	monkeypatch.setattr(settings, "archive_dir", str(tmp_path / "archive"))
+	monkeypatch.setattr(archive, "_cache", archive._BlockCache())
+	return session_factory
+
+
+def _game(created_at, status="finished", moves="e2e4 e7e5"):
+	return Game(
+		created_at=created_at,
+		elo_bucket=800,
+		player_color="white",
+		start_fen="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+		current_fen="rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2",
+		moves_uci=moves,
+		pgn="[Event \"Theo Training Game\"]\n\n1. e4 e5 *\n",
+		status=status,
+	)
+
+
+def test_archive_moves_old_finished_games_and_reads_them_back(session_factory, monkeypatch):
+	monkeypatch.setattr(archive, "BLOCK_GAMES", 3)
+	old = datetime.utcnow() - timedelta(days=40)
+	db = session_factory()
+	games = [_game(old + timedelta(minutes=i)) for i in range(7)]
+	games.append(_game(old, status="active"))
+	games.append(_game(datetime.utcnow()))
+	db.add_all(games)
+	db.commit()
+	ids = [g.id for g in games]
+	repo.add_positions(db, ids[1], [(0, 11), (1, 12)])
+	db.commit()
+	key = review_key(games[0].moves_uci)
+	repo.mark_review_pending(db, ids[0], key)
+	repo.save_review(db, ids[0], key, ["Keep your king safe."])
+
+	assert archive.archive_games(db, timedelta(days=30), log=lambda msg: None) == 7
+	assert db.execute(select(func.count()).select_from(Game)).scalar_one() == 2
+	# Blocks of at most three games
+	assert len({e.offset for e in db.execute(select(ArchivedGame)).scalars()}) == 3
+	# The position index keeps pointing at archived games
+	assert repo.position_occurrences(db, 12) == (1, 1, [(ids[1], 1)])
+	# A review of an archived game is written to the hot table
+	repo.mark_review_pending(db, ids[2], review_key(games[2].moves_uci))
+	db.close()
+
+	client = TestClient(app)
+	resp = client.get(f"/api/games/{ids[5]}")
+	assert resp.status_code == 200
+	body = resp.json()
+	assert body["status"] == "finished"
+	assert body["moves_uci"] == ["e2e4", "e7e5"]
+	assert body["pgn"].startswith('[Event "Theo Training Game"]')
+
+	resp = client.get(f"/api/games/{ids[0]}/review")
+	assert resp.status_code == 200
+	assert resp.json()["takeaways"] == ["Keep your king safe."]
+
+	resp = client.post(f"/api/games/{ids[3]}/finish")
+	assert resp.status_code == 200
+	assert client.post(f"/api/games/{ids[3]}/move", json={"move_uci": "g1f3"}).status_code == 400
+
+	db = session_factory()
+	assert db.get(Game, ids[3]) is None  # finishing didn't resurrect the hot row
+	assert repo.get_game(db, ids[7]).archived is False
+	assert repo.get_game(db, "missing") is None
+
+
+def test_corrupt_block_is_rejected(session_factory):
+	segment, offset, length = archive.append_block([{"id": "x"}])
+	with open(archive._segment_path(segment), "r+b") as fh:
+		fh.seek(offset)
+		fh.write(b"XXXX")
+	with pytest.raises(ValueError):
+		archive._cache.get(segment, offset, length)
@@ -0,0 +1,70 @@
+import random
+
+import chess
+import chess.polyglot
+
+from theo_api.core.chess_rules import GameRules, GameRulesCache
+
+
+def reference_outcome(board):
+	if not board.is_game_over(claim_draw=True):
+		return None
+	if board.is_checkmate():
+		return "checkmate"
+	if board.is_stalemate():
+		return "stalemate"
+	if board.is_insufficient_material():
+		return "insufficient_material"
+	if board.can_claim_fifty_moves():
+		return "fifty_move"
+	if board.can_claim_threefold_repetition():
+		return "threefold"
+	return "draw"
+
+
+def test_matches_python_chess_on_random_games():
+	rng = random.Random(7)
+	seen = set()
+	for game in range(60):
+		fen = chess.STARTING_FEN if game % 2 else "4k3/8/8/8/8/8/4P3/R3K2R w KQ - 90 1"
+		rules = GameRules(fen)
+		for _ in range(250):
+			board = rules.board
+			assert rules.tracker.key == chess.polyglot.zobrist_hash(board)
+			expected = reference_outcome(board)
+			assert rules.outcome().outcome == expected, board.fen()
+			if expected:
+				seen.add(expected)
+				break
+			moves = list(board.legal_moves)
+			quiet = [m for m in moves if not board.is_zeroing(m)]
+			rules.push(rng.choice(quiet if quiet and rng.random() < 0.9 else moves))
+	assert {"threefold", "fifty_move"} <= seen
+
+
+def test_threefold_claim_by_next_move():
+	rules = GameRules(chess.STARTING_FEN, ["g1f3", "g8f6", "f3g1", "f6g8", "g1f3", "g8f6", "f3g1"])
+	# Nf6-g8 would reach the start position for the third time
+	result = rules.outcome()
+	assert result.game_over and result.outcome == "threefold"
+	assert result.pgn_result == "1/2-1/2"
+
+
+def test_checkmate_winner_and_result():
+	rules = GameRules(chess.STARTING_FEN, ["f2f3", "e7e5", "g2g4", "d8h4"])
+	result = rules.outcome()
+	assert (result.outcome, result.winner, result.pgn_result) == ("checkmate", "black", "0-1")
+
+
+def test_cache_reuses_matching_entry_and_rebuilds_stale_one():
+	cache = GameRulesCache(maxsize=2)
+	rules = cache.checkout("g", chess.STARTING_FEN, ["e2e4"])
+	rules.push(chess.Move.from_uci("e7e5"))
+	cache.checkin("g", rules)
+
+	assert cache.checkout("g", chess.STARTING_FEN, ["e2e4", "e7e5"]) is rules
+	cache.checkin("g", rules)
+	stale = cache.checkout("g", chess.STARTING_FEN, ["e2e4", "e7e5", "g1f3"])
+	assert stale is not rules
+	assert stale.plies == 3
+	assert (cache.hits, cache.misses) == (1, 2)
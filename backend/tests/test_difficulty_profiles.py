@@ -0,0 +1,83 @@
+import json
+import os
+import queue
+
+import pytest
+
+from theo_api.services.stockfish.difficulty import (
+	BUCKETS,
+	DifficultyProfiles,
+	ProfileError,
+	load_profile,
+	parse_profile,
+	profiles_dir,
+	search_cost_ms,
+)
+from theo_api.services.stockfish.engine import StockfishUCI
+
+
+def _write(path, data, bump=0):
+	path.write_text(json.dumps(data))
+	# Make the change visible even within the filesystem's mtime resolution
+	st = path.stat()
+	os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + bump))
+
+
+def test_repository_profiles_are_valid():
+	store = DifficultyProfiles(profiles_dir())
+	store.check()
+	for bucket in BUCKETS:
+		assert store.get(bucket) == load_profile(profiles_dir() / f"elo_{bucket}.json")
+
+
+@pytest.mark.parametrize("data, message", [
+	({"skill_level": 5}, "missing fields"),
+	({**{"skill_level": 5, "movetime_ms": 100, "depth": 8, "multipv": 3, "choose_top_n": 1}, "ponder": True}, "unknown fields"),
+	({"skill_level": 25, "movetime_ms": 100, "depth": 8, "multipv": 3, "choose_top_n": 1}, "skill_level"),
+	({"skill_level": 5, "movetime_ms": "100", "depth": 8, "multipv": 3, "choose_top_n": 1}, "movetime_ms"),
+	({"skill_level": 5, "movetime_ms": 100, "depth": None, "multipv": 1, "choose_top_n": 2}, "choose_top_n"),
+	([1, 2], "JSON object"),
+])
+def test_invalid_profiles_are_rejected(data, message):
+	with pytest.raises(ProfileError, match=message):
+		parse_profile(data)
+
+
+def test_profiles_hot_reload_and_keep_last_good(tmp_path):
+	store = DifficultyProfiles(tmp_path, reload_s=0)
+	# No built-in defaults: a bucket without a file has no profile
+	with pytest.raises(ProfileError, match="bucket 1200"):
+		store.get(1200)
+
+	path = tmp_path / "elo_1200.json"
+	_write(path, {"skill_level": 9, "movetime_ms": 120, "depth": 9, "nodes": 40000, "multipv": 2, "choose_top_n": 2, "threads": 2})
+	d = store.get(1200)
+	assert (d.skill_level, d.nodes, d.threads) == (9, 40000, 2)
+	assert search_cost_ms(d) == 240
+
+	_write(path, {"skill_level": 9}, bump=1_000_000)
+	assert store.get(1200) == d
+	with pytest.raises(ProfileError, match="elo_1200.json"):
+		store.check()
+
+	path.unlink()
+	assert store.get(1200) == d
+	with pytest.raises(ProfileError, match="elo_1200.json: file not found"):
+		store.check()
+
+
+def test_engine_combines_limits_and_skips_unchanged_options():
+	engine = StockfishUCI.__new__(StockfishUCI)
+	sent = []
+	engine._send = sent.append
+	engine._options = {}
+	engine.q = queue.Queue()
+	engine.q.put("bestmove e2e4")
+
+	engine.set_option("Hash", 16)
+	engine.set_option("Hash", 16)
+	assert sent.count("setoption name Hash value 16") == 1
+
+	analysis = engine.analyze(fen="startpos-fen", movetime_ms=150, depth=10, multipv=3, nodes=5000)
+	assert analysis.best_move == "e2e4"
+	assert sent[-1] == "go nodes 5000 depth 10 movetime 150"
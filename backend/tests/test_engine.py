@@ -28,3 +28,40 @@ def test_engine_analysis_dataclass():
 	ea = EngineAnalysis(fen="startfen", lines=[UciLine(pv=["e2e4"], eval_cp=20, mate=None, depth=10)], best_move="e2e4")
 	assert ea.fen == "startfen"
 	assert ea.best_move == "e2e4"
+
+
+def test_parse_info_search_statistics_and_bound():
+	line = "info depth 14 seldepth 21 multipv 1 score cp 25 lowerbound nodes 180000 nps 1200000 hashfull 37 tbhits 2 time 150 pv d2d4"
+	mpv, uciline = _parse_info(line)
+	assert (uciline.seldepth, uciline.nodes, uciline.nps) == (21, 180000, 1200000)
+	assert (uciline.hashfull, uciline.time_ms, uciline.tbhits) == (37, 150, 2)
+	assert uciline.bound == "lower"
+	assert uciline.eval_cp == 25
+
+
+def test_search_stats_use_latest_counters():
+	from theo_api.services.stockfish.engine import _search_stats
+
+	first = UciLine(pv=["e2e4"], eval_cp=20, mate=None, depth=12, seldepth=18, nodes=1000, nps=500000)
+	second = UciLine(pv=["d2d4"], eval_cp=10, mate=None, depth=11, seldepth=20, nodes=1500, nps=510000, bound="upper")
+	stats = _search_stats([first, second], last=second)
+	assert stats.depth == 12
+	assert stats.seldepth == 20
+	assert stats.nodes == 1500
+	assert stats.bounded_lines == 1
+
+
+def test_non_pv_info_lines_are_skipped():
+	from theo_api.services.stockfish.engine import _is_pv_info
+
+	assert _parse_info("info depth 12 currmove e2e4 currmovenumber 1") is None
+	assert _parse_info("info string NNUE evaluation enabled") is None
+	assert not _is_pv_info("info depth 10 seldepth 14 multipv 1 hashfull 70 nodes 1000 time 90")
+	assert _is_pv_info("info depth 10 multipv 1 score cp 5 pv e2e4")
+
+
+def test_multipv_slot_without_full_parse():
+	from theo_api.services.stockfish.engine import _multipv_of
+
+	assert _multipv_of("info depth 9 multipv 3 score cp 1 pv e2e4") == 3
+	assert _multipv_of("info depth 9 score cp 1 pv e2e4") == 1
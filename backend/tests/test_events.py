@@ -0,0 +1,48 @@
+import json
+
+from theo_api.core.events import EventLog
+
+
+def test_events_are_written_as_json_lines(tmp_path):
+	path = tmp_path / "events.jsonl"
+	log = EventLog(str(path), batch_size=2)
+	for ply in range(1, 4):
+		log.emit("move", game_id="g1", ply=ply)
+	log.close()
+
+	records = [json.loads(line) for line in path.read_text().splitlines()]
+	assert [r["ply"] for r in records] == [1, 2, 3]
+	assert records[0]["event"] == "move"
+	assert "ts" in records[0]
+	assert log.written == 3
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path, monkeypatch):
+	log = EventLog(str(tmp_path / "events.jsonl"), queue_size=2)
+	monkeypatch.setattr(log, "_start", lambda: None)  # no writer: the queue only fills
+	for _ in range(5):
+		log.emit("move")
+	assert log.dropped == 3
+
+
+def test_sampling_is_stable_per_key_and_unsampled_events_are_kept(tmp_path):
+	path = tmp_path / "events.jsonl"
+	log = EventLog(str(path), sample_rate=0.5)
+	keys = [f"game-{i}" for i in range(200)]
+	chosen = {k for k in keys if log.sampled(k)}
+	assert 50 < len(chosen) < 150
+	assert chosen == {k for k in keys if log.sampled(k)}
+
+	for k in keys[:20]:
+		log.emit("move", sample_key=k, game_id=k)
+	log.emit("game_over", game_id="any")
+	log.close()
+	logged = [json.loads(line) for line in path.read_text().splitlines()]
+	assert {r["game_id"] for r in logged if r["event"] == "move"} == chosen & set(keys[:20])
+	assert any(r["event"] == "game_over" for r in logged)
+
+
+def test_disabled_log_writes_nothing(tmp_path):
+	log = EventLog("")
+	log.emit("move", game_id="g")
+	assert log._thread is None
@@ -0,0 +1,66 @@
+import json
+from datetime import datetime, timedelta
+
+import chess
+from fastapi.testclient import TestClient
+
+from theo_api.main import app
+from theo_api.services.storage import repo
+from theo_api.services.storage.models import Game
+
+
+def _add_games(db, n, base=datetime(2026, 1, 1)):
+	ids = []
+	for i in range(n):
+		g = Game(
+			# Pairs share a timestamp, so paging has to break ties on id
+			created_at=base + timedelta(minutes=i // 2),
+			elo_bucket=800 if i % 2 else 1200,
+			player_color="white",
+			start_fen=chess.STARTING_FEN,
+			current_fen=chess.STARTING_FEN,
+			moves_uci="e2e4 e7e5" if i % 3 else "",
+			pgn="[Event \"Stored\"]\n\n1. e4 e5 *\n" if i % 3 == 1 else "",
+			status="finished" if i != 4 else "active",
+		)
+		db.add(g)
+		ids.append(g)
+	db.commit()
+	return [g.id for g in sorted(ids, key=lambda g: (g.created_at, g.id))]
+
+
+def test_iter_games_pages_with_keyset(session_factory):
+	db = session_factory()
+	ordered = _add_games(db, 9)
+	pages = list(repo.iter_games(db, [], page_size=2))
+	assert [len(p) for p in pages] == [2, 2, 2, 2, 1]
+	assert [g.id for p in pages for g in p] == ordered
+
+	filters = repo.game_filters(status="finished", elo_bucket=1200, created_from=datetime(2026, 1, 1, 0, 1))
+	got = [g for p in repo.iter_games(db, filters, page_size=2) for g in p]
+	assert {g.elo_bucket for g in got} == {1200}
+	assert all(g.status == "finished" and g.created_at >= datetime(2026, 1, 1, 0, 1) for g in got)
+	assert len(got) == 3
+
+
+def test_export_streams_pgn_and_ndjson(session_factory):
+	db = session_factory()
+	_add_games(db, 9)
+	db.close()
+	client = TestClient(app)
+
+	resp = client.get("/api/games/export", params={"format": "ndjson"})
+	assert resp.status_code == 200
+	assert resp.headers["content-type"].startswith("application/x-ndjson")
+	rows = [json.loads(line) for line in resp.text.splitlines()]
+	assert len(rows) == 8
+	assert all(r["status"] == "finished" for r in rows)
+
+	resp = client.get("/api/games/export", params={"status": "all", "elo_bucket": 800})
+	assert resp.status_code == 200
+	assert resp.headers["content-type"].startswith("application/x-chess-pgn")
+	games = [g for g in resp.text.split("\n\n[") if g.strip()]
+	assert len(games) == 4
+	# Stored PGN is reused as-is; games without one are rendered from their moves
+	assert resp.text.count('[Event "Stored"]') == 2
+	assert resp.text.count('[Event "Theo Training Game"]') == 2
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+import chess
+from fastapi.testclient import TestClient
+
+from theo_api.main import app
+from theo_api.services.storage.models import Game
+
+
+def _add_games(db, n, base=datetime(2026, 1, 1)):
+	ids = []
+	for i in range(n):
+		g = Game(
+			# Pairs share a timestamp, so paging has to break ties on id
+			created_at=base + timedelta(minutes=i // 2),
+			elo_bucket=800 if i % 2 else 1200,
+			player_color="white",
+			start_fen=chess.STARTING_FEN,
+			current_fen=chess.STARTING_FEN,
+			moves_uci="e2e4 e7e5" if i % 3 else "",
+			pgn="[Event \"Stored\"]\n\n1. e4 e5 *\n" if i % 3 == 1 else "",
+			status="finished" if i != 4 else "active",
+		)
+		db.add(g)
+		ids.append(g)
+	db.commit()
+	return [g.id for g in sorted(ids, key=lambda g: (g.created_at, g.id))]
+
+
+def test_list_games_follows_cursor(session_factory):
+	db = session_factory()
+	ordered = _add_games(db, 9)
+	db.close()
+	client = TestClient(app)
+
+	seen = []
+	cursor = None
+	while True:
+		params = {"limit": 4}
+		if cursor:
+			params["cursor"] = cursor
+		resp = client.get("/api/games", params=params)
+		assert resp.status_code == 200, resp.text
+		body = resp.json()
+		seen.extend(g["game_id"] for g in body["games"])
+		cursor = body["next_cursor"]
+		if cursor is None:
+			break
+	assert seen == ordered[::-1]
+
+	resp = client.get("/api/games", params={"status": "active"})
+	assert [g["status"] for g in resp.json()["games"]] == ["active"]
+	resp = client.get("/api/games", params={"elo_bucket": 800, "created_to": "2026-01-01T00:02:00"})
+	assert len(resp.json()["games"]) == 2
+	assert client.get("/api/games", params={"cursor": "garbage"}).status_code == 400
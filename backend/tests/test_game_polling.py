@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import theo_api.api.games as games_mod
+from theo_api.config import settings
+from theo_api.core.game_versions import etag_matches, version_of
+from theo_api.main import app
+from theo_api.services.storage import repo
+
+
+@pytest.fixture
+def game_versions_ttl():
+	return 60
+
+
+def _new_game(factory):
+	db = factory()
+	g = repo.create_game(db, elo_bucket=800, player_color="white", start_fen="6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+	game_id = g.id
+	db.close()
+	return game_id
+
+
+def test_etag_and_304_without_db(session_factory, monkeypatch):
+	game_id = _new_game(session_factory)
+	client = TestClient(app)
+
+	resp = client.get(f"/api/games/{game_id}")
+	assert resp.status_code == 200
+	tag = resp.headers["etag"]
+	assert tag == '"g0"'
+
+	def no_db(*args, **kwargs):
+		raise AssertionError("DB read on a conditional hit")
+
+	monkeypatch.setattr(repo, "get_game", no_db)
+	resp = client.get(f"/api/games/{game_id}", headers={"If-None-Match": tag})
+	assert resp.status_code == 304
+	assert resp.headers["etag"] == tag
+	assert resp.content == b""
+
+
+def test_move_changes_etag(session_factory, monkeypatch):
+	monkeypatch.setattr(games_mod, "generate_takeaways", lambda *a: [])
+	game_id = _new_game(session_factory)
+	client = TestClient(app)
+	tag = client.get(f"/api/games/{game_id}").headers["etag"]
+
+	assert client.post(f"/api/games/{game_id}/move", json={"move_uci": "a1a8"}).status_code == 200
+	resp = client.get(f"/api/games/{game_id}", headers={"If-None-Match": tag})
+	assert resp.status_code == 200
+	assert resp.headers["etag"] == '"g3"'  # one ply, finished
+	assert resp.json()["moves_uci"] == ["a1a8"]
+
+
+def test_long_poll_wakes_on_change_and_times_out(session_factory, monkeypatch):
+	monkeypatch.setattr(games_mod, "generate_takeaways", lambda *a: [])
+	game_id = _new_game(session_factory)
+	client = TestClient(app)
+	client.get(f"/api/games/{game_id}")
+
+	timer = threading.Timer(0.2, lambda: client.post(f"/api/games/{game_id}/move", json={"move_uci": "a1a8"}))
+	timer.start()
+	resp = client.get(f"/api/games/{game_id}", params={"wait_for_version": 0}, headers={"If-None-Match": '"g0"'})
+	timer.join()
+	assert resp.status_code == 200
+	assert resp.json()["status"] == "finished"
+
+	monkeypatch.setattr(settings, "game_long_poll_s", 0.1)
+	resp = client.get(f"/api/games/{game_id}", params={"wait_for_version": 3}, headers={"If-None-Match": '"g3"'})
+	assert resp.status_code == 304
+	assert games_mod.game_versions.waiting() == 0
+
+
+# The finishing move and its background review need both connections; a waiting poll must not hold one
+@pytest.mark.parametrize("db_engine", [{"pool_size": 2, "max_overflow": 0, "pool_timeout": 1}], indirect=True)
+def test_long_poll_releases_its_db_connection(session_factory, db_engine, monkeypatch):
+	monkeypatch.setattr(games_mod, "generate_takeaways", lambda *a: [])
+	monkeypatch.setattr(settings, "game_long_poll_s", 5)
+	game_id = _new_game(session_factory)
+	client = TestClient(app)
+
+	result = {}
+	poll = threading.Thread(target=lambda: result.update(resp=client.get(f"/api/games/{game_id}", params={"wait_for_version": 0})))
+	poll.start()
+	deadline = time.monotonic() + 2
+	while games_mod.game_versions.waiting() == 0 and time.monotonic() < deadline:
+		time.sleep(0.01)
+	assert games_mod.game_versions.waiting() == 1
+	assert db_engine.pool.checkedout() == 0
+
+	assert client.post(f"/api/games/{game_id}/move", json={"move_uci": "a1a8"}).status_code == 200
+	poll.join()
+	assert result["resp"].status_code == 200
+	assert result["resp"].json()["moves_uci"] == ["a1a8"]
+
+
+def test_versions_and_etag_matching():
+	assert version_of("", "active") == 0
+	assert version_of("e2e4 e7e5", "active") == 4
+	assert version_of("e2e4 e7e5", "finished") == 5
+	assert etag_matches('W/"g4", "g5"', 5)
+	assert etag_matches("*", 1)
+	assert not etag_matches('"g4"', 5)
+	assert not etag_matches(None, 5)
@@ -0,0 +1,94 @@
+import chess
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import theo_api.api.stateless_games as stateless_mod
+import theo_api.services.stockfish.analysis as analysis_mod
+from theo_api.core import game_token
+from theo_api.core.chess_rules import GameRules
+from theo_api.services.stockfish.engine import EngineAnalysis
+
+
+def _moves(*uci):
+	return [chess.Move.from_uci(m) for m in uci]
+
+
+def test_round_trip_is_two_bytes_per_move():
+	moves = _moves("e2e4", "e7e5", "g1f3", "b8c6")
+	short = game_token.encode(chess.STARTING_FEN, moves[:2])
+	token = game_token.encode(chess.STARTING_FEN, moves)
+	assert game_token.decode(token) == (chess.STARTING_FEN, moves)
+	# base64 of 2 extra bytes per move
+	assert len(token) - len(short) <= 6
+
+
+def test_custom_start_and_promotion():
+	fen = "8/P7/8/8/8/8/8/k6K w - - 0 1"
+	moves = _moves("a7a8n")
+	rules = game_token.open_game(game_token.encode(fen, moves))
+	assert rules.start_fen == fen
+	assert rules.board.piece_at(chess.A8) == chess.Piece(chess.KNIGHT, chess.WHITE)
+
+
+def test_tampered_or_illegal_tokens_are_rejected():
+	token = game_token.encode(chess.STARTING_FEN, _moves("e2e4"))
+	raw = bytearray(token.encode())
+	raw[3] = ord("A") if raw[3] != ord("A") else ord("B")
+	with pytest.raises(game_token.InvalidGameToken):
+		game_token.decode(raw.decode())
+	with pytest.raises(game_token.InvalidGameToken):
+		game_token.decode("not a token")
+	with pytest.raises(game_token.InvalidGameToken):
+		game_token.open_game(game_token.encode(chess.STARTING_FEN, _moves("e2e5")))
+
+
+def test_engine_history_starts_at_last_irreversible_move():
+	rules = GameRules(chess.STARTING_FEN, ["e2e4", "e7e5", "g1f3", "g8f6", "f3g1"])
+	root, moves = game_token.engine_history(rules.board)
+	assert moves == ["g1f3", "g8f6", "f3g1"]
+	assert root.startswith("rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w")
+
+
+def test_stateless_move_with_token_detects_threefold(monkeypatch):
+	replies = {"g1f3": "g8f6", "f3g1": "f6g8"}
+	histories = []
+
+	def fake_choose(fen, elo_bucket, history=None):
+		histories.append(history)
+		return replies[history[1][-1]], EngineAnalysis(fen=fen, lines=[], best_move=None)
+
+	async def fake_hint(analysis, elo_bucket):
+		return "Test hint"
+
+	monkeypatch.setattr(analysis_mod, "choose_engine_reply", fake_choose)
+	monkeypatch.setattr(stateless_mod, "get_hint_for_async", fake_hint)
+	# Mounted by main.py only when there is no database
+	app = FastAPI()
+	app.include_router(stateless_mod.router, prefix="/api")
+	client = TestClient(app)
+
+	fen, token = chess.STARTING_FEN, None
+	for move in ["g1f3", "f3g1"] * 3:
+		resp = client.post("/api/games/move", json={"fen": fen, "move_uci": move, "elo": 1200, "game_token": token})
+		assert resp.status_code == 200, resp.text
+		data = resp.json()
+		if data["game_over"]:
+			break
+		fen, token = data["fen_after_engine"], data["game_token"]
+
+	assert data["outcome"] == "threefold"
+	# The engine saw the whole shuffle, not just the current position
+	assert len(histories[-1][1]) > 3
+
+	# A token that doesn't verify or doesn't match the FEN costs the history, not the move
+	forged = client.post("/api/games/move", json={"fen": chess.STARTING_FEN, "move_uci": "g1f3", "elo": 1200, "game_token": "AQBm"})
+	assert forged.status_code == 200, forged.text
+	assert forged.json()["engine_reply_uci"] == "g8f6"
+	assert histories[-1][1] == ["g1f3"]
+
+	replies["b1c3"] = "b8c6"
+	after_e4 = "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2"
+	stale = client.post("/api/games/move", json={"fen": after_e4, "move_uci": "b1c3", "elo": 1200, "game_token": token})
+	assert stale.status_code == 200, stale.text
+	assert histories[-1][1] == ["b1c3"]
@@ -0,0 +1,196 @@
+import types
+
+import chess
+import pytest
+from fastapi.testclient import TestClient
+
+import theo_api.api.games as games_mod
+from theo_api.core.admission import EngineOverloaded
+from theo_api.main import app
+from theo_api.services.stockfish.engine import EngineAnalysis, UciLine
+from theo_api.services.storage import repo
+
+
+@pytest.fixture
+def game_versions_ttl():
+	return 60
+
+
+@pytest.fixture
+def session_factory(session_factory, monkeypatch):
+	monkeypatch.setattr(games_mod, "generate_takeaways", lambda pgn, elo_bucket, player_color: ["Nice game!"])
+	# Review threads would share the one StaticPool connection with the socket's session; run them inline
+	inline = types.SimpleNamespace(Thread=lambda target, args, daemon: types.SimpleNamespace(start=lambda: target(*args)))
+	monkeypatch.setattr(games_mod, "threading", inline)
+	return session_factory
+
+
+@pytest.fixture
+def fake_engine(monkeypatch):
+	calls = []
+
+	def fake_choose(fen, elo_bucket):
+		calls.append(fen)
+		line = UciLine(pv=["e7e5", "g1f3"], eval_cp=-30, mate=None, depth=10)
+		return "e7e5", EngineAnalysis(fen=fen, lines=[line], best_move="e7e5")
+
+	class FakeLLM:
+		def hint_from_analysis(self, analysis, elo_bucket):
+			return "Control the centre."
+
+	monkeypatch.setattr(games_mod, "choose_engine_reply", fake_choose)
+	monkeypatch.setattr(games_mod, "LLMClient", FakeLLM)
+	return calls
+
+
+def _new_game(factory, start_fen=games_mod.START_FEN):
+	db = factory()
+	g = repo.create_game(db, elo_bucket=800, player_color="white", start_fen=start_fen)
+	game_id = g.id
+	db.close()
+	return game_id
+
+
+def test_ws_streams_turn_in_stages(session_factory, fake_engine):
+	game_id = _new_game(session_factory)
+	client = TestClient(app)
+
+	with client.websocket_connect(f"/api/games/{game_id}/ws") as ws:
+		state = ws.receive_json()
+		assert state["type"] == "state" and state["version"] == 0 and state["moves_uci"] == []
+
+		ws.send_text("e2e4")
+		messages = [ws.receive_json() for _ in range(4)]
+		assert [m["type"] for m in messages] == ["move", "engine", "eval", "hint"]
+		move, reply, evaluation, hint = messages
+		assert move["move_uci"] == "e2e4" and move["game_over"] is False
+		assert reply["engine_reply_uci"] == "e7e5"
+		# Black to move after e2e4: the engine's -30 is +30 for White and the player
+		assert evaluation["eval_white_cp"] == 30 and evaluation["eval_player_cp"] == 30
+		assert evaluation["top_moves"][0]["move"] == "e7e5"
+		assert hint["llm_response"] == "Control the centre."
+
+		ws.send_json({"move": "g1f3"})
+		messages = [ws.receive_json() for _ in range(4)]
+		assert [m["type"] for m in messages] == ["move", "engine", "eval", "hint"]
+		# The fake engine repeats e7e5, which is no longer legal: no reply is played
+		assert messages[1]["engine_reply_uci"] is None
+
+	db = session_factory()
+	assert repo.get_game(db, game_id).moves_uci == "e2e4 e7e5 g1f3"
+	db.close()
+
+
+def test_ws_rejects_bad_moves_and_keeps_the_connection(session_factory, fake_engine):
+	game_id = _new_game(session_factory)
+	client = TestClient(app)
+
+	with client.websocket_connect(f"/api/games/{game_id}/ws") as ws:
+		ws.receive_json()
+		ws.send_text("e2e5")
+		assert ws.receive_json() == {"type": "error", "detail": "Invalid UCI move format"}
+		ws.send_text("   ")
+		assert ws.receive_json() == {"type": "error", "detail": "Expected a UCI move"}
+		ws.send_text("zz")
+		assert ws.receive_json() == {"type": "error", "detail": "Invalid UCI move format"}
+		ws.send_json({"nope": 1})
+		assert ws.receive_json()["type"] == "error"
+
+		ws.send_text("d2d4")
+		assert ws.receive_json()["type"] == "move"
+	assert fake_engine == ["rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq - 0 1"]
+
+
+def test_ws_engine_overload_reports_unsaved_move_and_keeps_the_connection(session_factory, fake_engine, monkeypatch):
+	game_id = _new_game(session_factory)
+	client = TestClient(app)
+	working = games_mod.choose_engine_reply
+
+	def overloaded(fen, elo_bucket):
+		raise EngineOverloaded(retry_after=3)
+
+	monkeypatch.setattr(games_mod, "choose_engine_reply", overloaded)
+	with client.websocket_connect(f"/api/games/{game_id}/ws") as ws:
+		ws.receive_json()
+		ws.send_text("e2e4")
+		assert ws.receive_json()["type"] == "move"
+		error = ws.receive_json()
+		assert error["type"] == "error" and error["retry_after"] == 3
+		assert "not saved" in error["detail"]
+
+		db = session_factory()
+		assert repo.get_game(db, game_id).moves_uci == ""
+		db.close()
+
+		# The board was rebuilt from the stored game, so the same move is legal again
+		monkeypatch.setattr(games_mod, "choose_engine_reply", working)
+		ws.send_text("e2e4")
+		assert [ws.receive_json()["type"] for _ in range(4)] == ["move", "engine", "eval", "hint"]
+
+	db = session_factory()
+	assert repo.get_game(db, game_id).moves_uci == "e2e4 e7e5"
+	db.close()
+
+
+def test_ws_game_over_on_users_move(session_factory, fake_engine):
+	game_id = _new_game(session_factory, "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+	client = TestClient(app)
+
+	with client.websocket_connect(f"/api/games/{game_id}/ws") as ws:
+		ws.receive_json()
+		ws.send_text("a1a8")
+		msg = ws.receive_json()
+		assert msg["type"] == "move" and msg["game_over"] is True and msg["outcome"] == "checkmate"
+		ws.send_text("g1f1")
+		assert ws.receive_json() == {"type": "error", "detail": "Game is not active"}
+
+	assert fake_engine == []
+	resp = client.get(f"/api/games/{game_id}")
+	assert resp.json()["status"] == "finished"
+
+
+def test_ws_picks_up_moves_made_over_http(session_factory, fake_engine):
+	game_id = _new_game(session_factory)
+	client = TestClient(app)
+
+	with client.websocket_connect(f"/api/games/{game_id}/ws") as ws:
+		ws.receive_json()
+		resp = client.post(f"/api/games/{game_id}/move", json={"move_uci": "e2e4"})
+		assert resp.status_code == 200
+		ws.send_text("g1f3")
+		msg = ws.receive_json()
+		assert msg["type"] == "move"
+		assert msg["fen_before"].startswith("rnbqkbnr/pppp1ppp/8/4p3/4P3/8/")
+
+
+@pytest.mark.parametrize("game_versions_ttl", [0])
+def test_ws_keeps_http_moves_after_the_version_map_expires(session_factory, fake_engine, monkeypatch):
+
+	def first_legal(fen, elo_bucket):
+		reply = next(iter(chess.Board(fen).legal_moves)).uci()
+		return reply, EngineAnalysis(fen=fen, lines=[UciLine(pv=[reply], eval_cp=0, mate=None, depth=10)], best_move=reply)
+
+	monkeypatch.setattr(games_mod, "choose_engine_reply", first_legal)
+	game_id = _new_game(session_factory)
+	client = TestClient(app)
+
+	with client.websocket_connect(f"/api/games/{game_id}/ws") as ws:
+		ws.receive_json()
+		ws.send_text("e2e4")
+		assert [ws.receive_json()["type"] for _ in range(4)] == ["move", "engine", "eval", "hint"]
+		assert client.post(f"/api/games/{game_id}/move", json={"move_uci": "g1f3"}).status_code == 200
+		ws.send_text("d2d4")
+		messages = [ws.receive_json() for _ in range(4)]
+		assert messages[0]["type"] == "move"
+
+	db = session_factory()
+	moves = repo.get_game(db, game_id).moves_uci.split()
+	db.close()
+	assert len(moves) == 6
+	assert moves[0] == "e2e4" and moves[2] == "g1f3" and moves[4] == "d2d4"
+
+
+def test_ws_unknown_game(session_factory):
+	client = TestClient(app)
+	with client.websocket_connect("/api/games/nope/ws") as ws:
+		assert ws.receive_json() == {"type": "error", "detail": "Game not found"}
@@ -0,0 +1,71 @@
+import asyncio
+
+from theo_api.core.lifecycle import Warmup
+
+
+def test_ready_only_after_required_steps_succeed():
+	w = Warmup()
+	w.add("fast", lambda: None)
+	w.add("optional", lambda: 1 / 0, required=False)
+	assert not w.ready
+	assert w.status()["progress"] == "0/2"
+
+	asyncio.run(w.run())
+	status = w.status()
+	assert w.ready
+	assert status["steps"]["fast"]["status"] == "ok"
+	assert status["steps"]["optional"]["status"] == "failed"
+	assert "ZeroDivisionError" in status["steps"]["optional"]["error"]
+
+
+def test_failed_required_step_keeps_instance_unready():
+	w = Warmup()
+
+	def no_engine():
+		raise FileNotFoundError("stockfish")
+
+	w.add("engine_pool", no_engine)
+	asyncio.run(w.run())
+	assert not w.ready
+	assert w.status()["progress"] == "1/1"
+
+
+def test_retry_step_recovers_once_fixed():
+	broken = [True]
+
+	def check():
+		if broken[0]:
+			raise ValueError("elo_400.json: invalid JSON")
+
+	w = Warmup()
+	w.add("profiles", check, retry=True)
+	w.add("engine_pool", lambda: 1 / 0, required=False)
+	asyncio.run(w.run())
+	w.retry_failed()
+	assert not w.ready
+
+	broken[0] = False
+	w.retry_failed()
+	assert w.ready
+	steps = w.status()["steps"]
+	assert steps["profiles"]["status"] == "ok" and steps["profiles"]["error"] is None
+	# Only steps registered with retry are re-run
+	assert steps["engine_pool"]["status"] == "failed"
+
+
+def test_steps_run_in_parallel():
+	import threading
+
+	barrier = threading.Barrier(3, timeout=2)
+	w = Warmup()
+	for name in ("a", "b", "c"):
+		w.add(name, barrier.wait)
+	asyncio.run(w.run())
+	assert w.ready
+
+
+def test_skipped_warmup_is_ready():
+	w = Warmup()
+	w.add("engine_pool", lambda: 1 / 0)
+	w.skip()
+	assert w.ready
@@ -0,0 +1,55 @@
+from fastapi.testclient import TestClient
+
+from theo_api.core import metrics
+from theo_api.main import app
+
+
+def test_counter_and_histogram_exposition():
+	c = metrics.Counter("t_requests_total", "test", ("kind",))
+	c.labels(kind="a").inc()
+	c.labels(kind="a").inc(2)
+	c.labels(kind='q"x').inc()
+	assert c.collect() == ['t_requests_total{kind="a"} 3', 't_requests_total{kind="q\\"x"} 1']
+
+	h = metrics.Histogram("t_seconds", "test", buckets=(0.1, 1))
+	for v in (0.05, 0.5, 5):
+		h.observe(v)
+	assert h.collect() == [
+		't_seconds_bucket{le="0.1"} 1',
+		't_seconds_bucket{le="1"} 2',
+		't_seconds_bucket{le="+Inf"} 3',
+		't_seconds_sum 5.55',
+		't_seconds_count 3',
+	]
+
+
+def test_register_returns_existing_family():
+	first = metrics.counter("t_once_total", "test")
+	assert metrics.counter("t_once_total", "test") is first
+
+
+def test_metrics_endpoint_exposes_engine_llm_and_stage_metrics():
+	client = TestClient(app)
+	client.get("/api/health")
+	res = client.get("/api/metrics")
+	assert res.status_code == 200
+	assert res.headers["content-type"].startswith("text/plain")
+	body = res.text
+	assert "# TYPE theo_stage_duration_seconds histogram" in body
+	assert 'theo_stage_duration_seconds_count{route="GET /health",stage="total"}' in body
+	for name in ("theo_engine_processes", "theo_engine_respawns_total", "theo_llm_errors_total", "theo_rate_limit_rejections_total"):
+		assert f"# TYPE {name} " in body
+
+
+def test_search_stats_are_aggregated_per_bucket():
+	from theo_api.services.stockfish.analysis import _record_search, search_stats_by_bucket
+	from theo_api.services.stockfish.engine import EngineAnalysis, SearchStats
+
+	stats = SearchStats(depth=10, seldepth=16, nodes=400000, nps=800000, hashfull=120, time_ms=500, bounded_lines=1)
+	_record_search(777, EngineAnalysis(fen="x", lines=[], best_move=None, stats=stats), 0.5)
+	bucket = search_stats_by_bucket()["777"]
+	assert bucket["searches"] == 1
+	assert bucket["avg_search_ms"] == 500.0
+	assert bucket["avg_nps"] == 800000.0
+	assert bucket["nodes"] == 400000
+	assert bucket["bounded_lines"] == 1
@@ -0,0 +1,81 @@
+import time
+
+import chess
+
+from theo_api.services.coaching.motifs import detect_motifs, hint_from_motifs
+from theo_api.services.llm.client import LLMClient
+from theo_api.services.stockfish.engine import EngineAnalysis, UciLine
+
+
+def make_analysis(fen: str, best: str | None = None) -> EngineAnalysis:
+	lines = [UciLine(pv=[best], eval_cp=100, mate=None, depth=8)] if best else []
+	return EngineAnalysis(fen=fen, lines=lines, best_move=best)
+
+
+def kinds(fen: str, best: str | None = None) -> list[str]:
+	return [m.kind for m in detect_motifs(chess.Board(fen), make_analysis(fen, best))]
+
+
+def test_hanging_piece_detected():
+	# White bishop on c4 attacked by the black pawn on d5
+	fen = "rnbqkbnr/ppp1pppp/8/3p4/2B5/8/PPPP1PPP/RNBQK1NR w KQkq - 0 3"
+	assert "hanging" in kinds(fen)
+
+
+def test_missed_capture_from_best_move():
+	# Black queen on h4 can be taken for free by the knight on f3
+	fen = "rnb1kbnr/pppp1ppp/8/4p3/4P2q/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3"
+	assert kinds(fen, "f3h4")[0] == "missed_capture"
+
+
+def test_knight_fork_detected():
+	fen = "r3k3/8/8/3N4/8/8/8/4K3 w - - 0 1"
+	assert "fork" in kinds(fen, "d5c7")
+
+
+def test_pin_detected():
+	fen = "4k3/8/8/8/1b6/2N5/8/4K3 w - - 0 1"
+	assert "pin" in kinds(fen)
+
+
+def test_back_rank_weakness_detected():
+	fen = "3r2k1/5ppp/8/8/8/8/5PPP/6K1 w - - 0 1"
+	assert "back_rank" in kinds(fen)
+
+
+def test_undeveloped_minors_in_opening():
+	assert "undeveloped" in kinds(chess.STARTING_FEN)
+
+
+def test_no_motif_for_invalid_fen():
+	assert hint_from_motifs(make_analysis("startpos"), 800) is None
+
+
+def test_hint_is_deterministic_and_tier_aware():
+	fen = "rnbqkbnr/ppp1pppp/8/3p4/2B5/8/PPPP1PPP/RNBQK1NR w KQkq - 0 3"
+	analysis = make_analysis(fen)
+	novice = hint_from_motifs(analysis, 400)
+	assert novice == hint_from_motifs(analysis, 400)
+	assert novice != hint_from_motifs(analysis, 2000)
+	assert "c4" in novice
+
+
+def test_client_uses_motif_hint_before_llm(monkeypatch):
+	def fail_chat(*args, **kwargs):
+		raise AssertionError("LLM should not be called when a motif applies")
+
+	client = LLMClient(api_key="test-key")
+	monkeypatch.setattr(client, "chat", fail_chat)
+	fen = "rnbqkbnr/ppp1pppp/8/3p4/2B5/8/PPPP1PPP/RNBQK1NR w KQkq - 0 3"
+	hint = client.hint_from_analysis(make_analysis(fen), 1200)
+	assert "c4" in hint
+
+
+def test_motif_hint_is_fast():
+	fen = "r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R b KQkq - 3 3"
+	analysis = make_analysis(fen, "g8f6")
+	hint_from_motifs(analysis, 1200)
+	start = time.perf_counter()
+	for _ in range(100):
+		hint_from_motifs(analysis, 1200)
+	assert (time.perf_counter() - start) / 100 < 0.005
@@ -0,0 +1,136 @@
+import io
+import json
+
+import chess
+import chess.polyglot
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from theo_api.services.storage.db import Base
+from theo_api.services.storage.models import Game, PositionIndex
+from theo_api.services.storage.pgn_import import import_pgn
+from theo_api.utils.pgn import iter_chunks, parse_chunk, parse_game
+
+PGN = """
+[Event "One"]
+[White "A"]
+[Black "B"]
+[WhiteElo "1850"]
+[BlackElo "1650"]
+[Result "1-0"]
+
+1. e4 e5 2. Qh5 (2. Nf3 Nc6) Nc6 {a comment} 3. Bc4 Nf6?? 4. Qxf7# 1-0
+
+[Event "Illegal"]
+[Result "*"]
+
+1. e4 e4 *
+
+[Event "From FEN"]
+[SetUp "1"]
+[FEN "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1"]
+[Result "1-0"]
+
+1. Ra8# 1-0
+
+[Event "Four"]
+[Result "1/2-1/2"]
+
+1. d4 d5 2. c4 e6
+3. Nc3 Nf6 1/2-1/2
+"""
+
+
+@pytest.fixture
+def pgn_file(tmp_path):
+	path = tmp_path / "games.pgn"
+	path.write_text(PGN)
+	return path
+
+
+@pytest.fixture
+def session_factory():
+	engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+	Base.metadata.create_all(bind=engine)
+	return sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+
+def test_chunks_split_games_and_resume_at_offsets(pgn_file):
+	with open(pgn_file, "rb") as fh:
+		chunks = list(iter_chunks(fh, games_per_chunk=3))
+	assert [len(c.games) for c in chunks] == [3, 1]
+	assert chunks[0].games[0].lstrip().startswith('[Event "One"]')
+	assert chunks[1].games[0].startswith('[Event "Four"]')
+	assert chunks[1].end == pgn_file.stat().st_size
+
+	with open(pgn_file, "rb") as fh:
+		resumed = list(iter_chunks(fh, games_per_chunk=3, start=chunks[0].end))
+	assert [c.games for c in resumed] == [chunks[1].games]
+
+
+def test_tag_like_lines_inside_comments_do_not_split_games():
+	pgn = (
+		'[Event "Clock"]\n\n1. e4 {\n[%clk 0:03:00] } e5 2. Nf3 ; {\n[%clk 0:02:59]\n2... Nc6 *\n\n'
+		'[Event "Next"]\n\n1. d4 { a comment\n[Event "quoted"] } d5 *\n'
+	)
+	chunk = next(iter_chunks(io.BytesIO(pgn.encode())))
+	assert len(chunk.games) == 2
+	assert [g.moves for g in parse_chunk(chunk).games] == [["e2e4", "e7e5", "g1f3", "b8c6"], ["d2d4", "d7d5"]]
+
+
+def test_parse_validates_and_hashes_main_line():
+	chunk = next(iter_chunks(io.BytesIO(PGN.encode()), games_per_chunk=10))
+	result = parse_chunk(chunk)
+	assert len(result.games) == 3
+	assert len(result.errors) == 1 and "Illegal" in result.errors[0]
+
+	first = result.games[0]
+	assert first.moves == ["e2e4", "e7e5", "d1h5", "b8c6", "f1c4", "g8f6", "h5f7"]
+	board = chess.Board()
+	keys = [chess.polyglot.zobrist_hash(board)]
+	for uci in first.moves:
+		board.push_uci(uci)
+		keys.append(chess.polyglot.zobrist_hash(board))
+	assert first.positions == list(enumerate(keys))
+	assert first.final_fen == board.fen()
+
+	from_fen = result.games[1]
+	assert from_fen.start_fen == "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1"
+	assert from_fen.moves == ["a1a8"]
+	# Ids depend on the game, not its formatting
+	assert parse_game(chunk.games[0].replace(" ", "  ")).id == first.id
+	assert parse_game(chunk.games[0].replace('"A"', '"C"')).id != first.id
+
+
+def test_import_batches_checkpoints_and_resumes(pgn_file, session_factory, tmp_path):
+	checkpoint = str(tmp_path / "games.import.json")
+	seen = []
+
+	def stop_after_first_batch(stats, size):
+		seen.append(stats.offset)
+		raise KeyboardInterrupt
+
+	with pytest.raises(KeyboardInterrupt):
+		import_pgn(
+			str(pgn_file), session_factory, workers=1, batch_size=1, games_per_chunk=1,
+			checkpoint=checkpoint, progress=stop_after_first_batch,
+		)
+	state = json.load(open(checkpoint))
+	assert state["offset"] == seen[0] and state["read"] == 1
+
+	stats = import_pgn(str(pgn_file), session_factory, workers=1, batch_size=2, games_per_chunk=1, checkpoint=checkpoint)
+	assert (stats.read, stats.inserted, stats.invalid) == (2, 2, 1)
+	assert json.load(open(checkpoint))["offset"] == pgn_file.stat().st_size
+
+	with session_factory() as db:
+		games = db.execute(select(Game).order_by(Game.created_at)).scalars().all()
+		assert len(games) == 3
+		assert {g.status for g in games} == {"finished"}
+		assert {g.elo_bucket for g in games} == {1600, 1200}
+		assert db.execute(select(func.count()).select_from(PositionIndex)).scalar_one() == 8 + 2 + 7
+
+	# A full re-import skips games that are already stored
+	again = import_pgn(str(pgn_file), session_factory, workers=1)
+	assert (again.read, again.inserted) == (3, 0)
@@ -0,0 +1,87 @@
+import chess
+import chess.polyglot
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import theo_api.api.games as games_mod
+from theo_api.main import app
+from theo_api.services.storage import repo
+from theo_api.services.storage.models import PositionIndex
+from theo_api.services.storage.positions import backfill, game_positions, position_key, to_signed
+
+MATE_IN_ONE = "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1"
+
+
+@pytest.fixture
+def session_factory(session_factory, monkeypatch):
+	monkeypatch.setattr(games_mod, "generate_takeaways", lambda pgn, elo_bucket, player_color: [])
+	return session_factory
+
+
+def test_game_positions_match_polyglot():
+	moves = ["e2e4", "e7e5", "g1f3", "b8c6", "f1b5", "a7a6"]
+	board = chess.Board()
+	expected = [(0, to_signed(chess.polyglot.zobrist_hash(board)))]
+	for i, uci in enumerate(moves, 1):
+		board.push_uci(uci)
+		expected.append((i, to_signed(chess.polyglot.zobrist_hash(board))))
+	assert game_positions(chess.STARTING_FEN, moves) == expected
+	assert all(-(1 << 63) <= key < (1 << 63) for _, key in expected)
+	# Corrupt move lists index their valid prefix
+	assert game_positions(chess.STARTING_FEN, ["e2e4", "zzzz", "e7e5"]) == expected[:2]
+
+
+def test_moves_are_indexed_and_backfill_fills_the_rest(session_factory):
+	db = session_factory()
+	played = repo.create_game(db, elo_bucket=1200, player_color="white", start_fen=MATE_IN_ONE)
+	old = repo.create_game(db, elo_bucket=1200, player_color="white", start_fen=chess.STARTING_FEN)
+	old.moves_uci = "e2e4 e7e5"
+	repo.save_game(db, old)
+	played_id, old_id = played.id, old.id
+	db.close()
+
+	client = TestClient(app)
+	resp = client.post(f"/api/games/{played_id}/move", json={"move_uci": "a1a8"})
+	assert resp.status_code == 200, resp.text
+
+	db = session_factory()
+	rows = db.execute(select(PositionIndex.game_id, PositionIndex.ply)).all()
+	assert sorted(rows) == [(played_id, 1)]
+
+	assert backfill(db, batch_size=1, log=lambda msg: None) == (2, 5)
+	rows = db.execute(select(PositionIndex.game_id, PositionIndex.ply)).all()
+	assert sorted(rows) == sorted([(played_id, 0), (played_id, 1), (old_id, 0), (old_id, 1), (old_id, 2)])
+	# Indexed games are skipped on the next run
+	assert backfill(db, log=lambda msg: None) == (0, 0)
+	db.close()
+
+	board = chess.Board()
+	board.push_uci("e2e4")
+	resp = client.get("/api/positions", params={"fen": board.fen()})
+	assert resp.status_code == 200
+	body = resp.json()
+	assert body["key"] == position_key(board)
+	assert body["occurrences"] == 1
+	assert body["samples"] == [{"game_id": old_id, "ply": 1}]
+
+	assert client.get("/api/positions", params={"fen": "not a fen"}).status_code == 400
+
+
+def test_popular_positions(session_factory):
+	db = session_factory()
+	for moves in ("e2e4 e7e5", "e2e4 c7c5", "d2d4 d7d5"):
+		g = repo.create_game(db, elo_bucket=800, player_color="white", start_fen=chess.STARTING_FEN)
+		g.moves_uci = moves
+		repo.save_game(db, g)
+	backfill(db, log=lambda msg: None)
+	db.close()
+
+	resp = TestClient(app).get("/api/positions/popular", params={"limit": 2, "min_ply": 1})
+	assert resp.status_code == 200
+	top = resp.json()
+	assert top[0]["occurrences"] == 2
+	assert top[0]["games"] == 2
+	board = chess.Board()
+	board.push_uci("e2e4")
+	assert top[0]["fen"] == board.fen()
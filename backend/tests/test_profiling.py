@@ -0,0 +1,89 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from theo_api.config import settings
+from theo_api.main import app
+from theo_api.utils import profiling
+
+
+def _slow_app():
+	slow = FastAPI()
+	slow.add_middleware(profiling.ProfilingMiddleware)
+
+	@slow.get("/slow")
+	def slow_endpoint():
+		deadline = time.perf_counter() + 0.08
+		while time.perf_counter() < deadline:
+			sum(range(1000))
+		return {"ok": True}
+
+	return slow
+
+
+def test_header_triggers_profile_with_endpoint_stacks(monkeypatch, tmp_path):
+	monkeypatch.setattr(settings, "profile_allow_header", True)
+	monkeypatch.setattr(settings, "profile_sample_rate", 0.0)
+	monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+	monkeypatch.setattr(settings, "profile_interval_ms", 1.0)
+	client = TestClient(_slow_app())
+
+	assert client.get("/slow").status_code == 200
+	assert profiling.list_profiles() == []
+
+	assert client.get("/slow", headers={"X-Theo-Profile": "1"}).status_code == 200
+	[info] = profiling.list_profiles()
+	assert info.method == "GET"
+	assert info.route == "slow"
+	assert info.samples > 0
+	body = profiling.read_profile(info.name)
+	assert "slow_endpoint (test_profiling)" in body
+
+
+def test_profile_write_errors_are_reported_as_events(monkeypatch, tmp_path):
+	blocked = tmp_path / "not-a-dir"
+	blocked.write_text("")
+	monkeypatch.setattr(settings, "profile_allow_header", True)
+	monkeypatch.setattr(settings, "profile_dir", str(blocked))
+	monkeypatch.setattr(settings, "profile_interval_ms", 1.0)
+	emitted = []
+	monkeypatch.setattr(profiling.events, "emit", lambda event, **fields: emitted.append((event, fields)))
+
+	assert TestClient(_slow_app()).get("/slow", headers={"X-Theo-Profile": "1"}).status_code == 200
+	[(event, fields)] = emitted
+	assert event == "profile_write_error"
+	assert fields["path"] == "/slow" and fields["error"]
+
+
+def test_profiles_are_pruned_and_names_validated(monkeypatch, tmp_path):
+	monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+	monkeypatch.setattr(settings, "profile_keep", 2)
+	for i in range(3):
+		(tmp_path / f"20260101-00000{i}-5ms-GET-x.collapsed").write_text("a;b 1\n")
+	profiling._prune()
+	assert [p.name for p in profiling.list_profiles()] == [
+		"20260101-000002-5ms-GET-x.collapsed",
+		"20260101-000001-5ms-GET-x.collapsed",
+	]
+	assert profiling.read_profile("../secrets.collapsed") is None
+
+
+def test_admin_profiles_endpoint_and_token(monkeypatch, tmp_path):
+	monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+	(tmp_path / "20260101-000000-12ms-POST-games_game_id_move.collapsed").write_text("event-loop;run 3\n")
+	client = TestClient(app)
+
+	# Without a configured token the admin endpoints are closed
+	monkeypatch.setattr(settings, "admin_token", "")
+	assert client.get("/api/admin/profiles").status_code == 403
+
+	monkeypatch.setattr(settings, "admin_token", "s3cret")
+	assert client.get("/api/admin/profiles").status_code == 403
+	assert client.get("/api/admin/profiles", headers={"X-Admin-Token": "wrong"}).status_code == 403
+	admin = {"X-Admin-Token": "s3cret"}
+	res = client.get("/api/admin/profiles", headers=admin)
+	assert res.status_code == 200
+	assert res.json()["profiles"][0]["duration_ms"] == 12
+	name = "20260101-000000-12ms-POST-games_game_id_move.collapsed"
+	assert client.get(f"/api/admin/profiles/{name}", headers=admin).text == "event-loop;run 3\n"
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from theo_api.core.rate_limit import RateLimiter, SharedMemoryRateLimiter, TcpRateLimiter
+from theo_api.core.rate_limit_server import serve
+
+
+def test_allows_burst_then_blocks():
+	limiter = RateLimiter(max_requests=3, per_seconds=60)
+	assert [limiter.acquire("a", now=100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+	assert limiter.acquire("a", now=100.0) > 0
+	# other keys are independent
+	assert limiter.acquire("b", now=100.0) == 0.0
+
+
+def test_allowance_recovers_over_time():
+	limiter = RateLimiter(max_requests=2, per_seconds=10)
+	limiter.acquire("a", now=0.0)
+	limiter.acquire("a", now=0.0)
+	retry = limiter.acquire("a", now=0.0)
+	assert retry == 5.0
+	assert limiter.acquire("a", now=5.0) == 0.0
+
+
+def test_idle_keys_are_evicted():
+	limiter = RateLimiter(max_requests=5, per_seconds=10, shards=4)
+	for i in range(100):
+		limiter.acquire(f"k{i}", now=0.0)
+	assert len(limiter) == 100
+	assert limiter.evict_idle(now=1.0) == 0
+	assert limiter.evict_idle(now=11.0) == 100
+	assert len(limiter) == 0
+
+
+def test_background_sweep_drops_idle_keys():
+	limiter = RateLimiter(max_requests=1, per_seconds=0.2, shards=2)
+	try:
+		for i in range(100):
+			limiter.acquire(f"k{i}")
+		assert len(limiter) == 100
+		deadline = time.monotonic() + 5
+		while len(limiter) and time.monotonic() < deadline:
+			time.sleep(0.05)
+		assert len(limiter) == 0
+	finally:
+		limiter.close()
+
+
+def test_async_hit_wrapper():
+	limiter = RateLimiter(max_requests=1, per_seconds=60)
+	assert asyncio.run(limiter.hit("a")) is True
+	assert asyncio.run(limiter.hit("a")) is False
+
+
+def test_shared_memory_limit_is_shared_between_instances(tmp_path):
+	path = str(tmp_path / "rl")
+	worker_a = SharedMemoryRateLimiter(max_requests=3, per_seconds=60, path=path, slots=64)
+	worker_b = SharedMemoryRateLimiter(max_requests=3, per_seconds=60, path=path, slots=64)
+	try:
+		assert worker_a.acquire("ip", now=10.0) == 0.0
+		assert worker_b.acquire("ip", now=10.0) == 0.0
+		assert worker_a.acquire("ip", now=10.0) == 0.0
+		assert worker_b.acquire("ip", now=10.0) > 0
+		assert worker_b.acquire("other", now=10.0) == 0.0
+	finally:
+		worker_a.close()
+		worker_b.close()
+
+
+def test_shared_memory_reuses_expired_slots(tmp_path):
+	limiter = SharedMemoryRateLimiter(max_requests=1, per_seconds=1, path=str(tmp_path / "rl"), slots=8)
+	try:
+		# a single bucket: many more keys than slots still works
+		for i in range(100):
+			assert limiter.acquire(f"k{i}", now=float(i * 2)) == 0.0
+		limiter.acquire("hot", now=500.0)
+		assert limiter.acquire("hot", now=500.0) > 0
+	finally:
+		limiter.close()
+
+
+@pytest.fixture
+def store_address():
+	loop = asyncio.new_event_loop()
+	server = loop.run_until_complete(serve("127.0.0.1", 0))
+	thread = threading.Thread(target=loop.run_forever, daemon=True)
+	thread.start()
+	host, port = server.sockets[0].getsockname()[:2]
+	yield f"{host}:{port}"
+	loop.call_soon_threadsafe(loop.stop)
+	thread.join(timeout=1)
+
+
+def test_tcp_limit_is_shared_between_clients(store_address):
+	host_a = TcpRateLimiter(max_requests=2, per_seconds=60, address=store_address, timeout=1.0)
+	host_b = TcpRateLimiter(max_requests=2, per_seconds=60, address=store_address, timeout=1.0)
+	assert host_a.acquire("ip") == 0.0
+	assert host_b.acquire("ip") == 0.0
+	assert host_a.acquire("ip") > 0
+
+
+def test_tcp_limiter_fails_open_when_store_is_down():
+	limiter = TcpRateLimiter(max_requests=1, per_seconds=60, address="127.0.0.1:1", timeout=0.05)
+	assert limiter.acquire("ip") == 0.0
+	assert limiter.acquire("ip") == 0.0
+
+
+def test_blocking_backends_run_off_the_event_loop(tmp_path):
+	limiter = SharedMemoryRateLimiter(max_requests=1, per_seconds=60, path=str(tmp_path / "rl"), slots=64)
+	loop_thread = threading.get_ident()
+	seen = []
+	acquire = limiter.acquire
+
+	def recording(key, now=None):
+		seen.append(threading.get_ident())
+		return acquire(key, now)
+
+	limiter.acquire = recording
+	try:
+		assert asyncio.run(limiter.hit("a")) is True
+		assert asyncio.run(limiter.hit("a")) is False
+	finally:
+		limiter.close()
+	assert seen and loop_thread not in seen
@@ -0,0 +1,60 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import theo_api.api.games as games_mod
+from theo_api.main import app
+from theo_api.services.storage import repo
+
+
+@pytest.fixture
+def takeaway_calls(monkeypatch):
+	calls = []
+
+	def fake_generate(pgn, elo_bucket, player_color):
+		calls.append(pgn)
+		return ["Nice game!", "Watch your back rank."]
+
+	monkeypatch.setattr(games_mod, "generate_takeaways", fake_generate)
+	return calls
+
+
+def test_review_generated_once_when_game_ends(session_factory, takeaway_calls):
+	db = session_factory()
+	g = repo.create_game(db, elo_bucket=1200, player_color="white", start_fen="6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+	game_id = g.id
+	db.close()
+
+	client = TestClient(app)
+	resp = client.post(f"/api/games/{game_id}/move", json={"move_uci": "a1a8"})
+	assert resp.status_code == 200, resp.text
+	assert resp.json()["game_over"] is True
+	assert len(takeaway_calls) == 1
+
+	for _ in range(2):
+		resp = client.get(f"/api/games/{game_id}/review")
+		assert resp.status_code == 200
+		assert resp.json()["status"] == "ready"
+		assert resp.json()["takeaways"] == ["Nice game!", "Watch your back rank."]
+	assert len(takeaway_calls) == 1
+
+
+def test_review_pending_until_generated(session_factory, takeaway_calls, monkeypatch):
+	db = session_factory()
+	g = repo.create_game(db, elo_bucket=800, player_color="black", start_fen="8/8/8/4k3/8/4K3/8/8 w - - 0 1")
+	game_id = g.id
+	repo.mark_review_pending(db, game_id, "stale-key")
+	db.close()
+
+	# Hold background work so the pending state is observable
+	monkeypatch.setattr(games_mod, "_build_review", lambda *args: None)
+	client = TestClient(app)
+	resp = client.get(f"/api/games/{game_id}/review")
+	assert resp.status_code == 202
+	assert resp.json()["status"] == "pending"
+	assert resp.json()["takeaways"] == []
+	assert takeaway_calls == []
+
+
+def test_review_missing_game_is_404(session_factory):
+	client = TestClient(app)
+	assert client.get("/api/games/does-not-exist/review").status_code == 404
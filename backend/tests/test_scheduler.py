@@ -0,0 +1,202 @@
+import threading
+import time
+
+import pytest
+
+from theo_api.core.admission import EngineOverloaded
+from theo_api.services.stockfish.difficulty import get_difficulty
+from theo_api.services.stockfish.engine import EngineAnalysis
+from theo_api.services.stockfish.scheduler import EngineScheduler, Priority, current_request, engine_request
+
+
+class FakeEngine:
+	"""Records analysed FENs; a search blocks until released or stopped."""
+
+	def __init__(self, log, gate=None):
+		self.log = log
+		self.gate = gate
+		self.stopped = threading.Event()
+
+	def set_option(self, name, value):
+		pass
+
+	def stop(self):
+		self.stopped.set()
+
+	def analyze(self, *, fen, movetime_ms, depth, multipv, history=None, nodes=None, on_go=None):
+		self.log.append(fen)
+		if on_go is not None:
+			on_go()
+		if self.gate is not None and fen == "blocker":
+			self.gate.wait(timeout=5)
+		if fen.startswith("bg"):
+			self.stopped.wait(timeout=0.2)
+			self.stopped.clear()
+		return EngineAnalysis(fen=fen, lines=[], best_move=None)
+
+	def close(self):
+		pass
+
+
+def make_scheduler(log, gate=None):
+	return EngineScheduler(workers=1, engine_factory=lambda: FakeEngine(log, gate))
+
+
+def test_higher_priority_runs_first_and_clients_alternate():
+	log = []
+	gate = threading.Event()
+	sched = make_scheduler(log, gate)
+	diff = get_difficulty(800)
+	try:
+		blocker = sched.submit("blocker", diff, Priority.MOVE)
+		while not log:
+			time.sleep(0.001)
+		futures = [
+			sched.submit("a-explain", diff, Priority.EXPLAIN, client="a"),
+			sched.submit("a-hint-1", diff, Priority.HINT, client="a"),
+			sched.submit("a-hint-2", diff, Priority.HINT, client="a"),
+			sched.submit("b-hint-1", diff, Priority.HINT, client="b"),
+			sched.submit("c-move", diff, Priority.MOVE, client="c"),
+		]
+		gate.set()
+		blocker.result(timeout=5)
+		for f in futures:
+			f.result(timeout=5)
+		assert log == ["blocker", "c-move", "a-hint-1", "b-hint-1", "a-hint-2", "a-explain"]
+		snap = sched.snapshot()
+		assert snap["classes"]["hint"]["waited"] == 3
+		assert snap["engines_spawned"] == 1
+	finally:
+		sched.close()
+
+
+def test_background_search_is_preempted_and_requeued():
+	log = []
+	sched = make_scheduler(log)
+	diff = get_difficulty(800)
+	try:
+		bg = sched.submit("bg-review", diff, Priority.BACKGROUND)
+		while not log:
+			time.sleep(0.001)
+		move = sched.submit("move", diff, Priority.MOVE)
+		move.result(timeout=5)
+		bg.result(timeout=5)
+		assert log[:2] == ["bg-review", "move"]
+		assert log.count("bg-review") == 2
+		assert sched.snapshot()["classes"]["background"]["preempted"] == 1
+	finally:
+		sched.close()
+
+
+def test_stop_is_not_sent_before_the_search_starts():
+	log = []
+	setting_up = threading.Event()
+	release = threading.Event()
+
+	class SlowSetup(FakeEngine):
+		def set_option(self, name, value):
+			if name == "Skill Level" and not release.is_set():
+				setting_up.set()
+				release.wait(timeout=5)
+
+	engine = SlowSetup(log)
+	sched = EngineScheduler(workers=1, engine_factory=lambda: engine)
+	diff = get_difficulty(800)
+	try:
+		bg = sched.submit("bg-review", diff, Priority.BACKGROUND)
+		assert setting_up.wait(timeout=5)
+		move = sched.submit("move", diff, Priority.MOVE)
+		# Claimed but no `go` yet: a stop now would be lost
+		assert not engine.stopped.is_set()
+		release.set()
+		move.result(timeout=5)
+		bg.result(timeout=5)
+		assert log == ["bg-review", "move", "bg-review"]
+		assert sched.snapshot()["classes"]["background"]["preempted"] == 1
+	finally:
+		sched.close()
+
+
+def test_timed_out_job_is_dropped_and_reported_as_overload():
+	log = []
+	gate = threading.Event()
+	sched = make_scheduler(log, gate)
+	diff = get_difficulty(800)
+	try:
+		blocker = sched.submit("blocker", diff, Priority.MOVE)
+		while not log:
+			time.sleep(0.001)
+		with pytest.raises(EngineOverloaded):
+			sched.analyze("late", diff, timeout=0.05)
+		gate.set()
+		blocker.result(timeout=5)
+		assert sched.analyze("next", diff, timeout=5).fen == "next"
+		# The abandoned search never took the worker
+		assert log == ["blocker", "next"]
+	finally:
+		sched.close()
+
+
+def test_failed_engine_is_respawned():
+	calls = []
+
+	class Broken(FakeEngine):
+		def analyze(self, **kwargs):
+			raise RuntimeError("engine died")
+
+	def factory():
+		calls.append(1)
+		return Broken([]) if len(calls) == 1 else FakeEngine([])
+
+	sched = EngineScheduler(workers=1, engine_factory=factory)
+	diff = get_difficulty(800)
+	try:
+		first = sched.submit("x", diff)
+		try:
+			first.result(timeout=5)
+		except RuntimeError:
+			pass
+		assert sched.submit("y", diff).result(timeout=5).fen == "y"
+		assert sched.snapshot()["engine_respawns"] == 1
+	finally:
+		sched.close()
+
+
+def test_engine_request_context():
+	assert current_request() == (Priority.MOVE, "anon")
+	with engine_request(Priority.HINT, client="1.2.3.4"):
+		assert current_request() == (Priority.HINT, "1.2.3.4")
+	assert current_request() == (Priority.MOVE, "anon")
+
+
+def test_engine_queue_endpoint():
+	from fastapi.testclient import TestClient
+	from theo_api.main import app
+
+	data = TestClient(app).get("/api/engine/queue").json()
+	assert set(data["scheduler"]["classes"]) == {"move", "hint", "explain", "background"}
+	assert "outstanding_ms" in data["admission"]
+
+
+def test_warm_start_reports_spawn_failure_and_keeps_workers():
+	log = []
+	attempts = []
+
+	def factory():
+		attempts.append(1)
+		if len(attempts) == 1:
+			raise FileNotFoundError("stockfish")
+		return FakeEngine(log)
+
+	sched = EngineScheduler(workers=1, engine_factory=factory)
+	try:
+		sched.start(warm=True)
+	except FileNotFoundError:
+		pass
+	else:
+		raise AssertionError("warm start should report the failed spawn")
+	try:
+		sched.analyze("after", get_difficulty(800), timeout=5)
+		assert log == ["after"]
+	finally:
+		sched.close()
@@ -0,0 +1,49 @@
+from theo_api.services.llm.templates import (
+	estimate_tokens,
+	get_templates,
+	live_hint_messages,
+	live_hint_suffix,
+	review_suffix,
+)
+from theo_api.services.stockfish.engine import EngineAnalysis, UciLine
+
+
+def make_analysis(pv_len: int = 4) -> EngineAnalysis:
+	pv = ["e2e4", "e7e5", "g1f3", "b8c6"] * (pv_len // 4 + 1)
+	lines = [UciLine(pv=pv[:pv_len], eval_cp=30 - i, mate=None, depth=12) for i in range(3)]
+	return EngineAnalysis(fen="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", lines=lines, best_move="e2e4")
+
+
+def test_system_prefix_is_static_per_tier():
+	a = live_hint_messages(make_analysis(), 400)
+	b = live_hint_messages(make_analysis(8), 500)
+	assert a[0]["content"] is b[0]["content"]
+	assert a[0]["content"] != live_hint_messages(make_analysis(), 2000)[0]["content"]
+
+
+def test_dynamic_data_only_in_suffix():
+	analysis = make_analysis()
+	messages = live_hint_messages(analysis, 1200)
+	assert analysis.fen not in messages[0]["content"]
+	assert analysis.fen in messages[1]["content"]
+
+
+def test_every_tier_has_tone_guidance():
+	templates = get_templates()
+	for elo in (400, 800, 1200, 1600, 2000):
+		assert "Tone guidance:" in templates.system_prompt("live_hint", elo)
+		assert "JSON array" in templates.system_prompt("review", elo)
+
+
+def test_live_hint_suffix_respects_budget():
+	analysis = make_analysis(40)
+	suffix = live_hint_suffix(analysis, 1200, budget=60)
+	assert estimate_tokens(suffix) <= 60
+	assert "Line 1" in suffix
+
+
+def test_review_suffix_trims_long_pgn():
+	pgn = "1. e4 e5 " * 2000
+	suffix = review_suffix(pgn, 1200, "white", budget=200)
+	assert estimate_tokens(suffix) <= 200
+	assert suffix.rstrip().endswith("e5")
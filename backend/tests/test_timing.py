@@ -0,0 +1,67 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from theo_api.main import app
+from theo_api.utils import timing
+
+
+def test_histogram_buckets_and_quantiles():
+	h = timing.Histogram(buckets=(1, 10, 100))
+	for ms in (0.5, 5, 5, 50, 500):
+		h.observe(ms)
+	assert h.counts == [1, 2, 1, 1]
+	assert h.count == 5
+	assert h.quantile(0.5) == 10.0
+	assert h.quantile(1.0) == float("inf")
+
+
+def test_server_timing_header_sums_repeated_stages():
+	header = timing.server_timing_header([("db_commit", 1.0), ("llm", 3.0), ("db_commit", 2.5)], 10.0)
+	assert header == "db_commit;dur=3.50, llm;dur=3.00, total;dur=10.00"
+
+
+def test_span_outside_request_is_aggregated_globally():
+	before = timing.histogram("-", "unit_test_stage").count
+	with timing.span("unit_test_stage"):
+		pass
+	assert timing.histogram("-", "unit_test_stage").count == before + 1
+
+
+def test_response_carries_server_timing_and_feeds_histograms():
+	client = TestClient(app)
+	before = timing.histogram("GET /health", "handler").count
+
+	res = client.get("/api/health")
+	assert res.status_code == 200
+	header = res.headers["server-timing"]
+	assert "handler;dur=" in header
+	assert "serialize;dur=" in header
+	assert "total;dur=" in header
+
+	assert timing.histogram("GET /health", "handler").count == before + 1
+	snapshot = client.get("/api/timings").json()
+	assert snapshot["GET /health"]["total"]["count"] >= 1
+
+
+def test_background_tasks_are_not_counted_in_route_latency():
+	from fastapi import BackgroundTasks, FastAPI
+
+	def slow_task():
+		with timing.span("unit_test_background"):
+			time.sleep(0.2)
+
+	bg_app = FastAPI()
+	bg_app.add_middleware(timing.ServerTimingMiddleware)
+
+	@bg_app.get("/with-task")
+	def with_task(background_tasks: BackgroundTasks):
+		background_tasks.add_task(slow_task)
+		return {"ok": True}
+
+	total = timing.histogram("GET /with-task", "total")
+	before = total.count, total.sum
+	assert TestClient(bg_app).get("/with-task").status_code == 200
+	assert total.count == before[0] + 1
+	assert total.sum - before[1] < 100
+	assert timing.histogram("GET /with-task", "unit_test_background").count == 0
@@ -0,0 +1,51 @@
+import random
+from collections import Counter
+
+import chess
+
+import theo_api.services.stockfish.analysis as analysis_mod
+from theo_api.services.stockfish.difficulty import degrade, get_difficulty
+from theo_api.services.stockfish.engine import EngineAnalysis, UciLine
+from theo_api.services.stockfish.weak import heuristic_move
+
+
+def test_heuristic_prefers_free_material():
+	# White can take an undefended queen on d5
+	board = chess.Board("4k3/8/8/3q4/8/2N5/8/4K3 w - - 0 1")
+	rng = random.Random(1)
+	picks = Counter(heuristic_move(board, rng).uci() for _ in range(200))
+	assert picks.most_common(1)[0][0] == "c3d5"
+
+
+def test_heuristic_moves_are_legal_and_none_when_mated():
+	rng = random.Random(2)
+	board = chess.Board()
+	for _ in range(60):
+		move = heuristic_move(board, rng)
+		if move is None:
+			break
+		assert move in board.legal_moves
+		board.push(move)
+	assert heuristic_move(chess.Board("R5k1/5ppp/8/8/8/8/5PPP/6K1 b - - 1 1")) is None
+
+
+def test_low_buckets_use_node_budgets():
+	for bucket in (400, 800):
+		d = get_difficulty(bucket)
+		# Three lines keep the eval's top moves; the engine's move is always the best one
+		assert d.nodes and d.multipv == 3 and d.choose_top_n == 1 and 0 < d.blunder_rate < 0.5
+		assert degrade(d).nodes < d.nodes
+	assert get_difficulty(1600).nodes is None and get_difficulty(1600).blunder_rate == 0
+
+
+def test_choose_engine_reply_blunders_at_the_bucket_rate(monkeypatch):
+	def fake_analyze(fen, elo_bucket, degradable=True, history=None):
+		return EngineAnalysis(fen=fen, lines=[UciLine(pv=["e2e4"], eval_cp=30, mate=None, depth=5)], best_move="e2e4")
+
+	monkeypatch.setattr(analysis_mod, "analyze_position", fake_analyze)
+	random.seed(3)
+	replies = [analysis_mod.choose_engine_reply(chess.STARTING_FEN, 400)[0] for _ in range(400)]
+	other = sum(r != "e2e4" for r in replies) / len(replies)
+	# Heuristic picks are sometimes e2e4 too
+	assert 0.15 < other < 0.35
+	assert all(r == "e2e4" for r in (analysis_mod.choose_engine_reply(chess.STARTING_FEN, 2000)[0] for _ in range(20)))
@@ -0,0 +1,38 @@
+import hmac
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from theo_api.config import settings
+from theo_api.utils.profiling import list_profiles, profiling_enabled, read_profile
+from theo_api.utils.timing import TimedRoute
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    # Closed unless a token is configured
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), settings.admin_token.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)], route_class=TimedRoute)
+
+
+@router.get("/profiles")
+def profiles(limit: int = 20):
+    """Latest request profiles, newest first."""
+    return {
+        "enabled": profiling_enabled(),
+        "profiles": [asdict(p) for p in list_profiles(limit=min(max(limit, 1), 200))],
+    }
+
+
+@router.get("/profiles/{name}", response_class=PlainTextResponse)
+def profile(name: str):
+    """One profile as collapsed stacks (flamegraph.pl / speedscope input)."""
+    body = read_profile(name)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(body)
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+
+from theo_api.core.admission import engine_admission
+from theo_api.services.stockfish.analysis import search_stats_by_bucket
+from theo_api.services.stockfish.scheduler import engine_scheduler
+from theo_api.utils.timing import TimedRoute
+
+router = APIRouter(prefix="/engine", tags=["engine"], route_class=TimedRoute)
+
+
+@router.get("/queue")
+def engine_queue():
+    """Engine scheduler queues and per-class wait times, plus admission state."""
+    return {"scheduler": engine_scheduler.snapshot(), "admission": engine_admission.snapshot()}
+
+
+@router.get("/stats")
+def engine_stats():
+    """Search statistics (time, depth, NPS, hash fill, bounded lines) per Elo bucket."""
+    return search_stats_by_bucket()
@@ -1,20 +1,26 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from theo_api.core.rate_limit import rate_limit_dependency
+from theo_api.core.admission import EngineOverloaded
 
 from theo_api.schemas.coach import HintRequest, HintResponse
 from theo_api.services.stockfish.difficulty import clamp_bucket
 import theo_api.services.stockfish.analysis as analysis_mod
+from theo_api.services.stockfish.scheduler import Priority, engine_request
+from theo_api.utils.timing import TimedRoute
 
-router = APIRouter(prefix="/coach", tags=["coach"])
+router = APIRouter(prefix="/coach", tags=["coach"], route_class=TimedRoute)
 
 
 @router.post("/hint", response_model=HintResponse)
-async def coach_hint(req: HintRequest, _rl=Depends(rate_limit_dependency)):
+async def coach_hint(req: HintRequest, request: Request, _rl=Depends(rate_limit_dependency)):
     # normalize elo
     elo_bucket = clamp_bucket(req.elo)
 
     try:
-        move_uci, analysis = analysis_mod.choose_engine_reply(req.fen, elo_bucket)
+        with engine_request(Priority.HINT, client=request.client.host if request.client else None):
+            move_uci, analysis = analysis_mod.choose_engine_reply(req.fen, elo_bucket)
+    except EngineOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+import base64
 import chess
-import chess.pgn
-import io
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Literal
 
 from theo_api.services.storage.db import get_db
 from theo_api.services.storage import repo
+from theo_api.services.storage.export import MEDIA_TYPES, export_games
+from theo_api.services.storage.positions import game_positions, to_signed
 from theo_api.schemas.games import (
     CreateGameRequest,
     CreateGameResponse,
@@ -13,54 +21,105 @@ from theo_api.schemas.games import (
     MoveResponse,
     AnalysisLine,
     GameStateResponse,
+    GameListResponse,
+    GameSummary,
 )
 from theo_api.services.stockfish.difficulty import clamp_bucket
 from theo_api.services.stockfish.analysis import choose_engine_reply
+from theo_api.services.stockfish.scheduler import Priority, engine_request
 from theo_api.services.llm.client import LLMClient
+from theo_api.services.coaching.post_game import generate_takeaways, review_key
+from theo_api.config import settings
+from theo_api.core import events
+from theo_api.core.admission import EngineOverloaded
+from theo_api.core.game_versions import etag, etag_matches, game_versions, version_of
+from theo_api.core.chess_rules import GameRules, Outcome, game_rules_cache
+from theo_api.utils.pgn import render_pgn
+from theo_api.utils.timing import TimedRoute, current_spans, span
 
-router = APIRouter(prefix="/games", tags=["games"])
+router = APIRouter(prefix="/games", tags=["games"], route_class=TimedRoute)
 
 START_FEN = chess.STARTING_FEN
 
+# A pending review older than this is assumed lost (e.g. the worker restarted) and is rescheduled.
+REVIEW_PENDING_TIMEOUT = timedelta(minutes=2)
+
+_reviews_in_flight: set[tuple[str, str]] = set()
+_reviews_lock = threading.Lock()
+
 
 def _moves_str_to_list(moves_uci: str) -> list[str]:
     s = moves_uci.strip()
     return s.split() if s else []
 
 
-def _build_board_from_game(game) -> chess.Board:
-    board = chess.Board(game.start_fen)
-    for uci in _moves_str_to_list(game.moves_uci):
-        board.push_uci(uci)
-    return board
-
-
-def _compute_pgn(game) -> str:
-    board = chess.Board(game.start_fen)
-    game_pgn = chess.pgn.Game()
-    game_pgn.headers["Event"] = "Theo Training Game"
-    game_pgn.headers["White"] = "Player" if game.player_color == "white" else "Theo"
-    game_pgn.headers["Black"] = "Theo" if game.player_color == "white" else "Player"
-
-    node = game_pgn
-    for uci in _moves_str_to_list(game.moves_uci):
-        move = board.parse_uci(uci)
-        node = node.add_variation(move)
-        board.push(move)
-
-    if board.is_checkmate():
-        # If it's checkmate and it's side-to-move's turn, they are the one checkmated.
-        # So the winner is the opposite side.
-        game_pgn.headers["Result"] = "1-0" if board.turn == chess.BLACK else "0-1"
-    elif board.is_stalemate() or board.is_insufficient_material() or board.can_claim_draw():
-        game_pgn.headers["Result"] = "1/2-1/2"
-    else:
-        game_pgn.headers["Result"] = "*"
+def _log_move(game, ply: int, move_uci: str, engine_reply: str | None, analysis, outcome: str | None, winner: str | None):
+    stats = analysis.stats if analysis is not None else None
+    best = analysis.lines[0] if analysis is not None and analysis.lines else None
+    events.emit(
+        "move",
+        sample_key=game.id,
+        game_id=game.id,
+        ply=ply,
+        elo_bucket=game.elo_bucket,
+        move=move_uci,
+        engine_reply=engine_reply,
+        eval_cp=best.eval_cp if best else None,
+        mate=best.mate if best else None,
+        depth=stats.depth if stats else None,
+        nodes=stats.nodes if stats else None,
+        nps=stats.nps if stats else None,
+        outcome=outcome,
+        timings_ms=current_spans(),
+    )
+    if outcome is not None:
+        events.emit("game_over", game_id=game.id, plies=ply, outcome=outcome, winner=winner, elo_bucket=game.elo_bucket)
+
+
+def _game_rules(game) -> GameRules:
+    # Cached board + repetition counts; replays the game only on a cache miss
+    with span("board_replay"):
+        return game_rules_cache.checkout(game.id, game.start_fen, _moves_str_to_list(game.moves_uci))
+
+
+def _saved(g) -> None:
+    # Called after every write to a game: bumps its version and wakes long polls
+    game_versions.set(g.id, version_of(g.moves_uci, g.status))
+
+
+def _position(rules: GameRules) -> tuple[int, int]:
+    # (ply, key) row for the position index
+    return rules.plies, to_signed(rules.tracker.key)
+
+
+def _compute_pgn(game, outcome: Outcome | None = None) -> str:
+    with span("pgn"):
+        return render_pgn(game, outcome)
+
+
+def _build_review(bind, game_id: str, moves_key: str) -> None:
+    """Background task: generate and store the review for one version of a game."""
+    with _reviews_lock:
+        if (game_id, moves_key) in _reviews_in_flight:
+            return
+        _reviews_in_flight.add((game_id, moves_key))
+    try:
+        with Session(bind=bind, autoflush=False) as db:
+            g = repo.get_game(db, game_id)
+            if g is None or review_key(g.moves_uci) != moves_key:
+                return
+            pgn = g.pgn or _compute_pgn(g)
+            takeaways = generate_takeaways(pgn, g.elo_bucket, g.player_color)
+            repo.save_review(db, game_id, moves_key, takeaways)
+    finally:
+        with _reviews_lock:
+            _reviews_in_flight.discard((game_id, moves_key))
+
 
-    buf = io.StringIO()
-    exporter = chess.pgn.FileExporter(buf)
-    game_pgn.accept(exporter)
-    return buf.getvalue()
+def _schedule_review(background_tasks: BackgroundTasks, db: Session, g) -> None:
+    moves_key = review_key(g.moves_uci)
+    repo.mark_review_pending(db, g.id, moves_key)
+    background_tasks.add_task(_build_review, db.get_bind(), g.id, moves_key)
 
 
 @router.post("", response_model=CreateGameResponse)
@@ -71,7 +130,8 @@ def create_game(req: CreateGameRequest, db: Session = Depends(get_db)):
     # If player is Black, Theo (White) should play first move automatically
     if req.player_color == "black":
         board = chess.Board(g.start_fen)
-        engine_reply, _analysis = choose_engine_reply(board.fen(), g.elo_bucket)
+        with engine_request(Priority.MOVE, client=g.id):
+            engine_reply, _analysis = choose_engine_reply(board.fen(), g.elo_bucket)
 
         if engine_reply:
             try:
@@ -80,10 +140,13 @@ def create_game(req: CreateGameRequest, db: Session = Depends(get_db)):
                     board.push(move)
                     g.moves_uci = engine_reply
                     g.current_fen = board.fen()
-                    repo.save_game(db, g)
             except ValueError:
                 pass
 
+    repo.add_positions(db, g.id, game_positions(g.start_fen, _moves_str_to_list(g.moves_uci)))
+    repo.save_game(db, g)
+    _saved(g)
+
     return CreateGameResponse(
         game_id=g.id,
         start_fen=g.start_fen,
@@ -92,11 +155,127 @@ def create_game(req: CreateGameRequest, db: Session = Depends(get_db)):
     )
 
 
+def _encode_cursor(created_at: datetime, game_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), game_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        created_at, game_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), str(game_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("", response_model=GameListResponse)
+def list_games(
+    status: str | None = None,
+    elo_bucket: int | None = None,
+    player_color: Literal["white", "black"] | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    db: Session = Depends(get_db),
+):
+    """Games newest first, one page at a time; follow `next_cursor` for the next page."""
+    filters = repo.game_filters(
+        status=status,
+        elo_bucket=elo_bucket,
+        player_color=player_color,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    after = _decode_cursor(cursor) if cursor else None
+    # One extra row tells us whether there is a next page
+    rows = repo.list_games(db, filters, limit + 1, after)
+    page = rows[:limit]
+    next_cursor = _encode_cursor(page[-1].created_at, page[-1].id) if len(rows) > limit else None
+    return GameListResponse(
+        games=[
+            GameSummary(
+                game_id=r.id,
+                created_at=r.created_at,
+                status=r.status,
+                elo_bucket=r.elo_bucket,
+                player_color=r.player_color,
+                current_fen=r.current_fen,
+            )
+            for r in page
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/export")
+def export(
+    format: Literal["pgn", "ndjson"] = "pgn",
+    status: str = "finished",
+    elo_bucket: int | None = None,
+    player_color: Literal["white", "black"] | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    db: Session = Depends(get_db),
+):
+    """Stream all matching games (status "all" for any status) as PGN or NDJSON."""
+    filters = repo.game_filters(
+        status=None if status == "all" else status,
+        elo_bucket=elo_bucket,
+        player_color=player_color,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    return StreamingResponse(
+        export_games(db.get_bind(), format, filters),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="theo-games.{format}"'},
+    )
+
+
 @router.get("/{game_id}", response_model=GameStateResponse)
-def get_game_state(game_id: str, db: Session = Depends(get_db)):
-    g = repo.get_game(db, game_id)
-    if not g:
-        raise HTTPException(status_code=404, detail="Game not found")
+async def get_game_state(
+    game_id: str,
+    request: Request,
+    response: Response,
+    wait_for_version: int | None = Query(None, ge=0),
+    db: Session = Depends(get_db),
+):
+    """Current game state with an ETag.
+
+    A matching If-None-Match gets 304, answered from the in-memory version map
+    when this process knows the game. With `wait_for_version=N` the request
+    waits (up to `game_long_poll_s`) until the game moves past version N.
+    """
+    g = None
+    version = game_versions.get(game_id)
+    if version is None:
+        g = await run_in_threadpool(repo.get_game, db, game_id)
+        if not g:
+            raise HTTPException(status_code=404, detail="Game not found")
+        version = version_of(g.moves_uci, g.status)
+        game_versions.set(g.id, version)
+
+    if wait_for_version is not None and version == wait_for_version:
+        # Return the pooled connection while waiting; the session checks out a new one if used again
+        await run_in_threadpool(db.close)
+        await game_versions.wait_for_change(game_id, version, settings.game_long_poll_s)
+        latest = game_versions.get(game_id)
+        if latest is not None and latest != version:
+            version, g = latest, None
+
+    if etag_matches(request.headers.get("if-none-match"), version):
+        return Response(status_code=304, headers={"ETag": etag(version), "Cache-Control": "no-cache"})
+
+    if g is None:
+        g = await run_in_threadpool(repo.get_game, db, game_id)
+        if not g:
+            raise HTTPException(status_code=404, detail="Game not found")
+        version = version_of(g.moves_uci, g.status)
+        game_versions.set(g.id, version)
+    response.headers["ETag"] = etag(version)
+    # Lets browsers keep the body and revalidate every poll with If-None-Match
+    response.headers["Cache-Control"] = "no-cache"
 
     return GameStateResponse(
         game_id=g.id,
@@ -110,20 +289,64 @@ def get_game_state(game_id: str, db: Session = Depends(get_db)):
     )
 
 
-@router.post("/{game_id}/move", response_model=MoveResponse)
-def submit_move(game_id: str, req: SubmitMoveRequest, db: Session = Depends(get_db)):
-    g = repo.get_game(db, game_id)
-    if not g:
-        raise HTTPException(status_code=404, detail="Game not found")
+def _flip(value: int | None, flip: bool) -> int | None:
+    return -value if flip and value is not None else value
+
+
+def _eval_payload(analysis, fen_after: str, player_color: str) -> dict:
+    """Best line and top moves from both White's and the player's point of view."""
+    # Engine scores are from the side to move in the analysed position (after the user's move)
+    black_to_move = chess.Board(fen_after).turn == chess.BLACK
+    player_black = player_color == "black"
+
+    best = analysis.lines[0] if analysis.lines else None
+    eval_white = _flip(best.eval_cp if best else None, black_to_move)
+    mate_white = _flip(best.mate if best else None, black_to_move)
+
+    top_moves: list[AnalysisLine] = []
+    for line in analysis.lines[:3]:
+        if not line.pv:
+            continue
+        line_eval_white = _flip(line.eval_cp, black_to_move)
+        line_mate_white = _flip(line.mate, black_to_move)
+        top_moves.append(
+            AnalysisLine(
+                move=line.pv[0],
+                eval_white_cp=line_eval_white,
+                mate_white=line_mate_white,
+                eval_player_cp=_flip(line_eval_white, player_black),
+                mate_player=_flip(line_mate_white, player_black),
+            )
+        )
+
+    return {
+        "eval_white_cp": eval_white,
+        "mate_white": mate_white,
+        "eval_player_cp": _flip(eval_white, player_black),
+        "mate_player": _flip(mate_white, player_black),
+        "pv": best.pv if best and best.pv else [],
+        "top_moves": top_moves,
+    }
+
+
+def _play_turn(db: Session, g, rules: GameRules, move_uci: str, schedule_review):
+    """Play the user's move and Theo's reply, yielding (stage, fields) as each part is ready.
+
+    Stages: "move" (user move applied), "engine" (reply played and the game
+    saved), "eval" (engine evaluation) and "hint" (LLM coaching). A game that
+    ends on the user's move stops after "move". Shared by the HTTP move
+    endpoint, which merges the stages into one MoveResponse, and the game
+    WebSocket, which sends each stage as its own message. Raises
+    HTTPException for invalid moves before anything is changed.
+    """
     if g.status != "active":
         raise HTTPException(status_code=400, detail="Game is not active")
-
-    board = _build_board_from_game(g)
+    board = rules.board
     fen_before = board.fen()
 
     # Validate user's move
     try:
-        user_move = board.parse_uci(req.move_uci)
+        user_move = board.parse_uci(move_uci)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid UCI move format")
 
@@ -131,64 +354,46 @@ def submit_move(game_id: str, req: SubmitMoveRequest, db: Session = Depends(get_
         raise HTTPException(status_code=400, detail="Illegal move")
 
     # Apply user's move
-    board.push(user_move)
+    rules.push(user_move)
     fen_after = board.fen()
+    positions = [_position(rules)]
+    moves = _moves_str_to_list(g.moves_uci)
+    moves.append(move_uci)
 
-    # If game ended after user's move, save and return without engine reply
-    if board.is_game_over(claim_draw=True):
-        moves = _moves_str_to_list(g.moves_uci)
-        moves.append(req.move_uci)
+    # If game ended after user's move, save and stop without engine reply
+    result = rules.outcome()
+    if result.game_over:
         g.moves_uci = " ".join(moves)
         g.current_fen = fen_after
-        g.pgn = _compute_pgn(g)
+        g.pgn = _compute_pgn(g, result)
         g.status = "finished"
+        repo.add_positions(db, g.id, positions)
         repo.save_game(db, g)
-
-        # outcome logic here
-        outcome = None
-        winner = None
-        if board.is_checkmate():
-            outcome = "checkmate"
-            # winner is opposite of turn current turn just got mated
-            winner = "white" if board.turn == chess.BLACK else "black"
-        elif board.is_stalemate():
-            outcome = "stalemate"
-        elif board.is_insufficient_material():
-            outcome = "insufficient_material"
-        elif board.can_claim_fifty_moves():
-            outcome = "fifty_move"
-        elif board.can_claim_threefold_repetition():
-            outcome = "threefold"
-        else:
-            outcome = "draw"
-
-        return MoveResponse(
-            game_id=g.id,
-            fen_before=fen_before,
-            move_uci=req.move_uci,
-            fen_after=fen_after,
-            engine_reply_uci=None,
-            fen_after_engine=None,
-            eval_white_cp=None,
-            mate_white=None,
-            eval_player_cp=None,
-            mate_player=None,
-            pv=[],
-            top_moves=[],
-            game_over=True,
-            outcome=outcome,
-            winner=winner,
-        )
+        _saved(g)
+        schedule_review(g)
+        _log_move(g, len(moves), move_uci, None, None, result.outcome, result.winner)
+    yield "move", {
+        "fen_before": fen_before,
+        "move_uci": move_uci,
+        "fen_after": fen_after,
+        "game_over": result.game_over,
+        "outcome": result.outcome,
+        "winner": result.winner,
+    }
+    if result.game_over:
+        return
 
     # Engine reply + analysis (analyze position after user's move)
-    engine_reply, analysis = choose_engine_reply(fen_after, g.elo_bucket)
+    with engine_request(Priority.MOVE, client=g.id):
+        engine_reply, analysis = choose_engine_reply(fen_after, g.elo_bucket)
 
     fen_after_engine = None
     if engine_reply:
         try:
             engine_move = board.parse_uci(engine_reply)
             if engine_move in board.legal_moves:
-                board.push(engine_move)
+                rules.push(engine_move)
+                positions.append(_position(rules))
                 fen_after_engine = board.fen()
             else:
                 engine_reply = None
@@ -196,235 +401,256 @@ def submit_move(game_id: str, req: SubmitMoveRequest, db: Session = Depends(get_
             engine_reply = None
 
     # Persist moves and state
-    moves = _moves_str_to_list(g.moves_uci)
-    moves.append(req.move_uci)
     if engine_reply:
         moves.append(engine_reply)
     g.moves_uci = " ".join(moves)
     g.current_fen = board.fen()
-    
+
     # Check if game ended after engine move
-    game_over = board.is_game_over(claim_draw=True)
-    outcome = None
-    winner = None
-    
-    if game_over:
-        g.pgn = _compute_pgn(g)
+    result = rules.outcome()
+    if result.game_over:
+        g.pgn = _compute_pgn(g, result)
         g.status = "finished"
-        
-        # Detect outcome type
-        if board.is_checkmate():
-            outcome = "checkmate"
-            winner = "white" if board.turn == chess.BLACK else "black"
-            print(f"CHECKMATE DETECTED! Winner: {winner}, Current turn: {board.turn}")
-        elif board.is_stalemate():
-            outcome = "stalemate"
-            print("STALEMATE DETECTED!")
-        elif board.is_insufficient_material():
-            outcome = "insufficient_material"
-        elif board.can_claim_fifty_moves():
-            outcome = "fifty_move"
-        elif board.can_claim_threefold_repetition():
-            outcome = "threefold"
-        else:
-            outcome = "draw"
-        
-        print(f"Game Over! Outcome: {outcome}, Winner: {winner}")
-    else:
-        print(f"Game continues. Board state: {board.fen()[:50]}...")
-    
-    repo.save_game(db, g)
 
-    # ----- Build coaching payload (both White POV and Player POV) -----
-    # Raw engine best-line values
-    raw_eval = analysis.lines[0].eval_cp if analysis.lines else None
-    raw_mate = analysis.lines[0].mate if analysis.lines else None
-    pv = analysis.lines[0].pv if analysis.lines and analysis.lines[0].pv else []
-
-    analyzed_board = chess.Board(fen_after)  # this is the position Stockfish analyzed (after user's move)
-
-    # Canonical: White POV (positive means White better)
-    eval_white = raw_eval
-    mate_white = raw_mate
-    if analyzed_board.turn == chess.BLACK:
-        # Flip if engine score is from side-to-move POV
-        if eval_white is not None:
-            eval_white = -eval_white
-        if mate_white is not None:
-            mate_white = -mate_white
-
-    # Player POV: positive means USER better
-    eval_player = eval_white
-    mate_player = mate_white
-    if g.player_color == "black":
-        if eval_player is not None:
-            eval_player = -eval_player
-        if mate_player is not None:
-            mate_player = -mate_player
-
-    # top_moves: include both POVs for each candidate
-    top_moves: list[AnalysisLine] = []
-    for line in analysis.lines[:3]:
-        if not line.pv:
-            continue
+    repo.add_positions(db, g.id, positions)
+    repo.save_game(db, g)
+    _saved(g)
+    if result.game_over:
+        schedule_review(g)
+    yield "engine", {
+        "engine_reply_uci": engine_reply,
+        "fen_after_engine": fen_after_engine,
+        "game_over": result.game_over,
+        "outcome": result.outcome,
+        "winner": result.winner,
+    }
 
-        line_eval = line.eval_cp
-        line_mate = line.mate
-
-        # Convert candidate to White POV
-        line_eval_white = line_eval
-        line_mate_white = line_mate
-        if analyzed_board.turn == chess.BLACK:
-            if line_eval_white is not None:
-                line_eval_white = -line_eval_white
-            if line_mate_white is not None:
-                line_mate_white = -line_mate_white
-
-        # Convert candidate to Player POV
-        line_eval_player = line_eval_white
-        line_mate_player = line_mate_white
-        if g.player_color == "black":
-            if line_eval_player is not None:
-                line_eval_player = -line_eval_player
-            if line_mate_player is not None:
-                line_mate_player = -line_mate_player
-
-        top_moves.append(
-            AnalysisLine(
-                move=line.pv[0],
-                eval_white_cp=line_eval_white,
-                mate_white=line_mate_white,
-                eval_player_cp=line_eval_player,
-                mate_player=line_mate_player,
-            )
-        )
+    yield "eval", _eval_payload(analysis, fen_after, g.player_color)
 
     # ----- Generate LLM coaching response -----
-    llm_response = None
-    if not game_over:
+    if not result.game_over:
+        llm_response = None
         try:
             llm_client = LLMClient()
             llm_response = llm_client.hint_from_analysis(analysis, g.elo_bucket)
         except Exception as e:
-            print(f"LLM coaching call failed: {e}")
-            llm_response = None
+            events.emit("llm_error", kind="hint", game_id=g.id, error=str(e))
+        yield "hint", {"llm_response": llm_response}
 
-    print(f"Returning response: game_over={game_over}, outcome={outcome}, winner={winner}")
-    
-    return MoveResponse(
-        game_id=g.id,
-        fen_before=fen_before,
-        move_uci=req.move_uci,
-        fen_after=fen_after,
-        engine_reply_uci=engine_reply,
-        fen_after_engine=fen_after_engine,
-        eval_white_cp=eval_white,
-        mate_white=mate_white,
-        eval_player_cp=eval_player,
-        mate_player=mate_player,
-        pv=pv,
-        top_moves=top_moves,
-        game_over=game_over,
-        outcome=outcome,
-        winner=winner,
-        llm_response=llm_response,
-    )
+    _log_move(g, len(moves), move_uci, engine_reply, analysis, result.outcome, result.winner)
 
 
-@router.post("/{game_id}/finish")
-def finish_game(game_id: str, db: Session = Depends(get_db)):
+@router.post("/{game_id}/move", response_model=MoveResponse)
+def submit_move(
+    game_id: str,
+    req: SubmitMoveRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
     g = repo.get_game(db, game_id)
     if not g:
         raise HTTPException(status_code=404, detail="Game not found")
+    if g.status != "active":
+        raise HTTPException(status_code=400, detail="Game is not active")
+
+    rules = _game_rules(g)
+    fields = {}
+    for _stage, data in _play_turn(db, g, rules, req.move_uci, lambda g: _schedule_review(background_tasks, db, g)):
+        fields.update(data)
+
+    if not fields["game_over"]:
+        # Saved and done with the board: the next move starts from here
+        game_rules_cache.checkin(g.id, rules)
+    return MoveResponse(game_id=g.id, **fields)
+
+
+def _start_review(db: Session, g) -> None:
+    # WebSocket turns have no BackgroundTasks; build the review on its own thread
+    moves_key = review_key(g.moves_uci)
+    repo.mark_review_pending(db, g.id, moves_key)
+    threading.Thread(target=_build_review, args=(db.get_bind(), g.id, moves_key), daemon=True).start()
+
+
+def _state_message(g, version: int) -> dict:
+    return {
+        "type": "state",
+        "version": version,
+        "game_id": g.id,
+        "status": g.status,
+        "elo_bucket": g.elo_bucket,
+        "player_color": g.player_color,
+        "start_fen": g.start_fen,
+        "current_fen": g.current_fen,
+        "moves_uci": _moves_str_to_list(g.moves_uci),
+    }
+
+
+def _frame_move(text: str) -> str | None:
+    # A frame is a bare UCI move ("e2e4") or {"move": "e2e4"}
+    text = text.strip()
+    if not text.startswith("{"):
+        return text or None
+    try:
+        move = json.loads(text).get("move")
+    except (ValueError, AttributeError):
+        return None
+    return move.strip() if isinstance(move, str) and move.strip() else None
+
+
+def _refresh(db: Session, g, rules: GameRules) -> GameRules:
+    # The game changed outside this connection (another tab, the HTTP API)
+    db.refresh(g)
+    moves = _moves_str_to_list(g.moves_uci)
+    return rules if rules.start_fen == g.start_fen and rules.matches(moves) else GameRules(g.start_fen, moves)
+
+
+def _reload(db: Session, g, rules: GameRules) -> GameRules:
+    # A turn failed part-way: drop its unsaved changes to the row and the board
+    db.rollback()
+    return _refresh(db, g, rules)
+
+
+@router.websocket("/{game_id}/ws")
+async def game_session(websocket: WebSocket, game_id: str, db: Session = Depends(get_db)):
+    """Play a game over one connection.
+
+    The game row and its board stay loaded for the life of the connection.
+    Before each turn the stored moves are compared with the loaded ones, and
+    the game is reloaded if it changed elsewhere. Each frame is a UCI move,
+    and the server answers with one message per stage as it becomes ready:
+    "move" (accepted), "engine" (Theo's reply, saved), "eval" and "hint".
+    Bad frames and illegal moves get an "error" message and the connection
+    stays open. So does a turn whose engine reply fails (at capacity, timed
+    out or crashed): its "error" message says the move was not saved, with
+    `retry_after` when the engine is overloaded.
+    """
+    await websocket.accept()
+    g = await run_in_threadpool(repo.get_game, db, game_id)
+    if not g:
+        await websocket.send_json({"type": "error", "detail": "Game not found"})
+        await websocket.close(code=4404)
+        return
+
+    rules = await run_in_threadpool(_game_rules, g)
+    version = version_of(g.moves_uci, g.status)
+    await websocket.send_json(_state_message(g, version))
+
+    turn = None
+    try:
+        while True:
+            move_uci = _frame_move(await websocket.receive_text())
+            if move_uci is None:
+                await websocket.send_json({"type": "error", "detail": "Expected a UCI move"})
+                continue
+
+            # The version map can't be trusted here: its entries expire and only cover this process
+            stored = None if g.archived else await run_in_threadpool(repo.get_game_progress, db, g.id)
+            if stored is not None and version_of(*stored) != version:
+                rules = await run_in_threadpool(_refresh, db, g, rules)
+                version = version_of(g.moves_uci, g.status)
+
+            turn = _play_turn(db, g, rules, move_uci, lambda g: _start_review(db, g))
+            saved = False
+            while True:
+                try:
+                    stage = await run_in_threadpool(next, turn, None)
+                except HTTPException as e:
+                    # Rejected before the board was touched
+                    await websocket.send_json({"type": "error", "detail": e.detail})
+                    break
+                except Exception as e:
+                    note = "" if saved else "; the move was not saved"
+                    if isinstance(e, EngineOverloaded):
+                        failure = {"detail": f"{e}{note}", "retry_after": e.retry_after}
+                    else:
+                        events.emit("turn_error", game_id=g.id, error=f"{type(e).__name__}: {e}")
+                        failure = {"detail": f"The turn could not be completed{note}"}
+                    turn = None
+                    try:
+                        # The board may hold a move that was never saved
+                        rules = await run_in_threadpool(_reload, db, g, rules)
+                    except Exception:
+                        rules = None
+                        raise
+                    await websocket.send_json({"type": "error", **failure})
+                    break
+                if stage is None:
+                    break
+                name, fields = stage
+                saved = saved or name == "engine" or (name == "move" and fields["game_over"])
+                await websocket.send_json({"type": name, **jsonable_encoder(fields)})
+            turn = None
+            version = version_of(g.moves_uci, g.status)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if turn is not None and rules is not None:
+            # The client left mid-turn: finish it so Theo's reply is saved
+            try:
+                await run_in_threadpool(lambda: [None for _ in turn])
+            except Exception:
+                rules = None
+        if rules is not None and g.status == "active":
+            game_rules_cache.checkin(g.id, rules)
+
+
+@router.post("/{game_id}/finish")
+def finish_game(game_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    row = repo.get_game_with_review(db, game_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Game not found")
+    g, review = row
+    if g.archived:
+        # Archived games are finished and immutable
+        return {"game_id": g.id, "status": g.status, "pgn": g.pgn}
 
     g.pgn = _compute_pgn(g)
     g.status = "finished"
     repo.save_game(db, g)
+    _saved(g)
+    if review is None or review.moves_key != review_key(g.moves_uci):
+        _schedule_review(background_tasks, db, g)
     return {"game_id": g.id, "status": g.status, "pgn": g.pgn}
 
 
 @router.get("/{game_id}/review")
-def get_game_review(game_id: str, db: Session = Depends(get_db)):
-    g = repo.get_game(db, game_id)
-    if not g:
+def get_game_review(
+    game_id: str,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    """Return the stored review, or status "pending" (202) while it is generated.
+
+    Reviews are normally scheduled when the game finishes; a missing or stale
+    review (the game's moves changed) is scheduled here instead.
+    """
+    row = repo.get_game_with_review(db, game_id)
+    if not row:
         raise HTTPException(status_code=404, detail="Game not found")
+    g, review = row
 
-    # Build PGN if not already stored
-    pgn = g.pgn or _compute_pgn(g)
-
-    # ELO-aware tone
-    if g.elo_bucket <= 600:
-        tone = (
-            "The player is a complete beginner. Be extra warm, celebratory, and patient. "
-            "Praise what they did well. Frame tips as fun things to explore, not mistakes to fix."
-        )
-    elif g.elo_bucket <= 1000:
-        tone = (
-            "The player is a beginner. Be encouraging and supportive. "
-            "Acknowledge effort and gently suggest areas to improve."
-        )
-    elif g.elo_bucket <= 1400:
-        tone = (
-            "The player is intermediate. Be friendly but more direct with tactical and strategic advice."
-        )
-    else:
-        tone = (
-            "The player is advanced. Be concise and focus on deeper strategic or calculation insights."
-        )
-
-    system = (
-        "You are Theo, a kind and thoughtful chess coach reviewing a student's game. "
-        "Analyze the game and produce exactly 4 to 6 key takeaways as bullet points.\n\n"
-        "RULES:\n"
-        "- Each bullet should be one clear, actionable sentence.\n"
-        "- Mix praise with constructive advice — always start with something positive.\n"
-        "- Reference specific moments from the game when possible (e.g., 'Your knight maneuver to f5 was strong').\n"
-        "- Never use centipawn values or engine jargon.\n"
-        "- Keep language warm and natural.\n"
-        "- Return ONLY a JSON array of strings, no other text. Example: [\"Great opening play!\", \"Watch for back-rank threats.\"]\n\n"
-        f"Tone guidance: {tone}"
-    )
-    user = (
-        f"Player ELO bucket: {g.elo_bucket}\n"
-        f"Player color: {g.player_color}\n"
-        f"Game PGN:\n{pgn}\n\n"
-        "Produce 4-6 key takeaway bullet points as a JSON array of strings."
+    stale = review is None or review.moves_key != review_key(g.moves_uci)
+    lost = (
+        review is not None
+        and review.status == "pending"
+        and datetime.utcnow() - review.updated_at > REVIEW_PENDING_TIMEOUT
     )
+    if stale or lost:
+        _schedule_review(background_tasks, db, g)
 
-    takeaways = []
-    try:
-        client = LLMClient()
-        import json as _json
-        raw = client.chat(
-            [{"role": "system", "content": system}, {"role": "user", "content": user}],
-            temperature=0.7,
-            max_tokens=500,
-        )
-        # Parse the JSON array from the LLM response
-        # Strip markdown code fences if present
-        cleaned = raw.strip()
-        if cleaned.startswith("```"):
-            cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else cleaned[3:]
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-            cleaned = cleaned.strip()
-        takeaways = _json.loads(cleaned)
-        if not isinstance(takeaways, list):
-            takeaways = [str(takeaways)]
-    except Exception as e:
-        print(f"LLM review generation failed: {e}")
-        # Deterministic fallback
-        takeaways = [
-            "Good effort completing this game — every game is a chance to learn!",
-            "Review your opening moves: developing pieces early and controlling the center is key.",
-            "Watch for undefended pieces — keeping everything protected avoids easy losses.",
-            "Think about your opponent's last move before making yours.",
-            "Practice spotting checks, captures, and threats each turn.",
-        ]
+    if stale or lost or review.status != "ready":
+        response.status_code = 202
+        status = "pending"
+        takeaways = []
+    else:
+        status = "ready"
+        takeaways = json.loads(review.takeaways)
 
     return {
         "game_id": g.id,
         "elo_bucket": g.elo_bucket,
         "player_color": g.player_color,
+        "status": status,
         "takeaways": takeaways,
     }
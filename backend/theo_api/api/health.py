@@ -1,7 +1,31 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+from theo_api.core import metrics
+from theo_api.core.lifecycle import warmup
+from theo_api.utils.timing import TimedRoute, timing_snapshot
 
-router = APIRouter(tags=["health"])
+router = APIRouter(tags=["health"], route_class=TimedRoute)
 
 @router.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@router.get("/ready")
+def ready():
+    """Readiness: 200 once start-up warm-up has finished, 503 with progress until then."""
+    warmup.retry_failed()
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@router.get("/timings")
+def timings():
+    """Per-route, per-stage latency histograms (count, avg and bucketed quantiles)."""
+    return timing_snapshot()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus text exposition of request, engine, LLM and rate-limit metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,57 @@
+import chess
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from theo_api.services.storage import repo
+from theo_api.services.storage.db import get_db
+from theo_api.services.storage.positions import position_key
+from theo_api.utils.timing import TimedRoute
+
+router = APIRouter(prefix="/positions", tags=["positions"], route_class=TimedRoute)
+
+
+def _fen_at(game, ply: int) -> str | None:
+    board = chess.Board(game.start_fen)
+    try:
+        for uci in game.moves_uci.split()[:ply]:
+            board.push_uci(uci)
+    except ValueError:
+        return None
+    return board.fen()
+
+
+@router.get("")
+def position_lookup(fen: str, limit: int = Query(50, ge=1, le=500), db: Session = Depends(get_db)):
+    """How often a position occurs in stored games, and where."""
+    try:
+        board = chess.Board(fen)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid FEN")
+    key = position_key(board)
+    occurrences, games, samples = repo.position_occurrences(db, key, limit)
+    return {
+        "fen": board.fen(),
+        "key": key,
+        "occurrences": occurrences,
+        "games": games,
+        "samples": [{"game_id": game_id, "ply": ply} for game_id, ply in samples],
+    }
+
+
+@router.get("/popular")
+def popular_positions(
+    limit: int = Query(20, ge=1, le=200),
+    min_ply: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    """Most frequent positions across stored games, e.g. to pick analyses to pre-warm."""
+    out = []
+    for key, occurrences, games, game_id, ply in repo.popular_positions(db, limit, min_ply):
+        g = repo.get_game(db, game_id)
+        out.append({
+            "key": key,
+            "fen": _fen_at(g, ply) if g is not None else None,
+            "occurrences": occurrences,
+            "games": games,
+        })
+    return out
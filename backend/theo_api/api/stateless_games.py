@@ -4,10 +4,16 @@ from typing import Optional
 
 from theo_api.services.stockfish.difficulty import clamp_bucket
 import theo_api.services.stockfish.analysis as analysis_mod
+from theo_api.services.stockfish.scheduler import Priority, engine_request
 from theo_api.services.llm.client import get_hint_for_async
 from theo_api.core.rate_limit import rate_limit_dependency
+from theo_api.core.admission import EngineOverloaded
+from theo_api.core import events
+from theo_api.core.chess_rules import GameRules
+from theo_api.core.game_token import InvalidGameToken, engine_history, open_game, sign
+from theo_api.utils.timing import TimedRoute
 
-router = APIRouter(prefix="/games", tags=["games"])
+router = APIRouter(prefix="/games", tags=["games"], route_class=TimedRoute)
 
 
 class AnalyzeRequest(BaseModel):
@@ -25,6 +31,10 @@ class MoveRequest(BaseModel):
     fen: str
     move_uci: str
     elo: int
+    # Token from the previous response: carries the game's history, so repetitions
+    # are detected and the engine sees the moves that led here. A token that
+    # doesn't verify is ignored and the move is played from the FEN alone.
+    game_token: Optional[str] = None
 
 
 class MoveResponse(BaseModel):
@@ -34,13 +44,25 @@ class MoveResponse(BaseModel):
     engine_reply_uci: Optional[str]
     fen_after_engine: Optional[str]
     hint: str
+    game_token: str
+    game_over: bool = False
+    outcome: Optional[str] = None
+    winner: Optional[str] = None
+
+
+def _same_position(a: str, b: str) -> bool:
+    # Placement, side to move, castling and en passant; move counters may be omitted
+    return a.split()[:4] == b.split()[:4]
 
 
 @router.post("/analyze", response_model=AnalyzeResponse)
-async def analyze(req: AnalyzeRequest, _rl=Depends(rate_limit_dependency)):
+async def analyze(req: AnalyzeRequest, request: Request, _rl=Depends(rate_limit_dependency)):
     elo_bucket = clamp_bucket(req.elo)
     try:
-        move_uci, analysis = analysis_mod.choose_engine_reply(req.fen, elo_bucket)
+        with engine_request(Priority.HINT, client=request.client.host if request.client else None):
+            move_uci, analysis = analysis_mod.choose_engine_reply(req.fen, elo_bucket)
+    except EngineOverloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -59,7 +81,7 @@ async def analyze(req: AnalyzeRequest, _rl=Depends(rate_limit_dependency)):
 
 
 @router.post("/move", response_model=MoveResponse)
-async def submit_move(req: MoveRequest, _rl=Depends(rate_limit_dependency)):
+async def submit_move(req: MoveRequest, request: Request, _rl=Depends(rate_limit_dependency)):
     elo_bucket = clamp_bucket(req.elo)
 
     try:
@@ -67,7 +89,24 @@ async def submit_move(req: MoveRequest, _rl=Depends(rate_limit_dependency)):
     except Exception:
         raise HTTPException(status_code=503, detail="chess package required for move validation")
 
-    board = chess.Board(req.fen)
+    rules = None
+    if req.game_token:
+        # E.g. signed by a worker with another key: lose the history, not the move
+        try:
+            rules = open_game(req.game_token)
+        except InvalidGameToken as e:
+            events.emit("game_token_rejected", error=str(e))
+        else:
+            if not _same_position(rules.board.fen(), req.fen):
+                events.emit("game_token_rejected", error="game_token does not match fen")
+                rules = None
+    if rules is None:
+        try:
+            rules = GameRules(req.fen)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid FEN")
+    board = rules.board
+
     try:
         user_move = board.parse_uci(req.move_uci)
     except ValueError:
@@ -76,24 +115,30 @@ async def submit_move(req: MoveRequest, _rl=Depends(rate_limit_dependency)):
     if user_move not in board.legal_moves:
         raise HTTPException(status_code=400, detail="Illegal move")
 
-    board.push(user_move)
+    rules.push(user_move)
     fen_after = board.fen()
 
-    # Engine reply after user's move
-    engine_reply, analysis = analysis_mod.choose_engine_reply(fen_after, elo_bucket)
+    result = rules.outcome()
+    engine_reply = None
     fen_after_engine = None
-    if engine_reply:
-        try:
-            engine_move = board.parse_uci(engine_reply)
-            if engine_move in board.legal_moves:
-                board.push(engine_move)
-                fen_after_engine = board.fen()
-            else:
+    hint = ""
+    if not result.game_over:
+        # Engine reply after user's move
+        with engine_request(Priority.MOVE, client=request.client.host if request.client else None):
+            engine_reply, analysis = analysis_mod.choose_engine_reply(fen_after, elo_bucket, history=engine_history(board))
+        if engine_reply:
+            try:
+                engine_move = board.parse_uci(engine_reply)
+                if engine_move in board.legal_moves:
+                    rules.push(engine_move)
+                    fen_after_engine = board.fen()
+                    result = rules.outcome()
+                else:
+                    engine_reply = None
+            except Exception:
                 engine_reply = None
-        except Exception:
-            engine_reply = None
 
-    hint = await get_hint_for_async(analysis, elo_bucket)
+        hint = await get_hint_for_async(analysis, elo_bucket)
 
     return MoveResponse(
         fen_before=req.fen,
@@ -102,4 +147,8 @@ async def submit_move(req: MoveRequest, _rl=Depends(rate_limit_dependency)):
         engine_reply_uci=engine_reply,
         fen_after_engine=fen_after_engine,
         hint=hint,
+        game_token=sign(rules),
+        game_over=result.game_over,
+        outcome=result.outcome,
+        winner=result.winner,
     )
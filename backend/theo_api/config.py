@@ -1,3 +1,4 @@
+import os
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -9,8 +10,74 @@ class Settings(BaseSettings):
     api_prefix: str = "/api"
     cors_origins: str = "http://localhost:5173,http://127.0.0.1:5173,http://localhost:5174,http://127.0.0.1:5174,http://localhost:3000"
 
+    # Token budgets for the per-request part of LLM prompts
+    llm_prompt_token_budget: int = 400
+    llm_review_token_budget: int = 1500
+
+    # Rate limiting: "memory" (per process), "shm" (shared by workers on a host)
+    # or "tcp" (shared across hosts via theo_api.core.rate_limit_server)
+    rate_limit_backend: str = "memory"
+    rate_limit_shm_path: str = "/dev/shm/theo-ratelimit"
+    rate_limit_shm_slots: int = 65536
+    rate_limit_store_address: str = "127.0.0.1:7390"
+
+    # Engine admission control: total search time (ms) that may be outstanding,
+    # the fraction above which searches are degraded, and the queue wait at
+    # which new work is shed with 503
+    engine_capacity_ms: int = 4000
+    engine_degrade_ratio: float = 0.75
+    engine_max_wait_ms: int = 2000
+    # Stockfish worker processes (0 = one per two CPUs)
+    engine_workers: int = 0
+
+    # Warm the engine pool, DB and LLM client in the background at start-up;
+    # /ready reports 503 until done. Off: everything starts lazily.
+    warm_on_startup: bool = True
+
+    # Request profiling (off by default): profile this fraction of requests,
+    # and/or requests sent with "X-Theo-Profile: 1". Collapsed stacks are
+    # written to profile_dir, keeping the newest profile_keep files.
+    profile_sample_rate: float = 0.0
+    profile_allow_header: bool = False
+    profile_dir: str = "./profiles"
+    profile_interval_ms: float = 5.0
+    profile_keep: int = 50
+    # Structured JSON-lines event log: a file path, "-" for stdout, or empty
+    # to disable. Move events are sampled per game at event_log_sample_rate.
+    event_log_path: str = "-"
+    event_log_sample_rate: float = 1.0
+    event_log_queue_size: int = 10000
+    event_log_batch_size: int = 256
+
+    # GET /games/{id}: how long a remembered game version answers If-None-Match
+    # without a DB read, and how long ?wait_for_version= may hold a request
+    game_version_ttl_s: float = 10.0
+    game_long_poll_s: float = 25.0
+
+    # Finished games older than archive_after_days are moved by the archive job
+    # into compressed segment files in archive_dir (services/storage/archive.py)
+    archive_dir: str = "./archive"
+    archive_after_days: float = 30
+    archive_segment_bytes: int = 256 * 1024 * 1024
+
+    # Difficulty profiles (elo_<bucket>.json); empty = the repository's
+    # engine/stockfish/configs. Changed files are picked up within difficulty_reload_s.
+    difficulty_profiles_dir: str = ""
+    difficulty_reload_s: float = 2.0
+
+    # HMAC key for the stateless API's game tokens (core/game_token.py). Set the
+    # same value on every worker; when empty each process uses a random key and
+    # tokens from other workers are ignored.
+    game_token_secret: str = ""
+
+    # /admin endpoints require this value in the X-Admin-Token header; unset, they are disabled
+    admin_token: str = ""
+
     def cors_origin_list(self) -> list[str]:
         return [origin.strip() for origin in self.cors_origins.split(",") if origin.strip()]
 
+    def engine_worker_count(self) -> int:
+        return self.engine_workers or max(1, (os.cpu_count() or 2) // 2)
+
 
 settings = Settings()
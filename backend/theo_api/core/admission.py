@@ -0,0 +1,128 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from theo_api.config import settings
+from theo_api.services.stockfish.difficulty import Difficulty, degrade, search_cost_ms
+
+
+class EngineOverloaded(Exception):
+    """Raised when engine work is shed; mapped to 503 with Retry-After."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Engine is at capacity, retry later")
+        self.retry_after = retry_after
+
+
+@dataclass
+class Ticket:
+    difficulty: Difficulty
+    cost_ms: int
+    admitted_at: float
+    degraded: bool = False
+    started_at: float | None = None
+
+
+# Admission control for engine searches, weighted by each search's time budget.
+#
+# Every search reserves its nominal cost (see `search_cost_ms`) until it finishes,
+# so "outstanding" is the engine time already promised to admitted requests.
+# Above `degrade_ratio` of capacity new searches run with a cheaper difficulty;
+# at capacity, or when admitted work waits too long before starting, new work is
+# shed with EngineOverloaded instead of piling up until everything times out.
+class AdmissionController:
+    def __init__(
+        self,
+        capacity_ms: int,
+        degrade_ratio: float = 0.75,
+        max_wait_ms: int = 2000,
+        parallelism: int | None = None,
+    ):
+        self.capacity_ms = capacity_ms
+        self.degrade_ratio = degrade_ratio
+        self.max_wait_ms = max_wait_ms
+        self.parallelism = parallelism or os.cpu_count() or 1
+        self.outstanding_ms = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.wait_ewma_ms = 0.0
+        self.shed = 0
+        self.degraded = 0
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> float:
+        # Time for the engines to drain the work already promised
+        return max(1.0, math.ceil(self.outstanding_ms / self.parallelism / 1000))
+
+    def _reserve(self, diff: Difficulty, degradable: bool) -> Ticket:
+        cost = search_cost_ms(diff)
+        with self._lock:
+            overloaded = self.wait_ewma_ms > self.max_wait_ms or self.outstanding_ms + cost > self.capacity_ms
+            degraded = False
+            if degradable and (overloaded or self.outstanding_ms + cost > self.capacity_ms * self.degrade_ratio):
+                diff = degrade(diff)
+                cost = search_cost_ms(diff)
+                degraded = True
+                overloaded = self.wait_ewma_ms > self.max_wait_ms or self.outstanding_ms + cost > self.capacity_ms
+            # An idle engine always takes work, however large
+            if overloaded and self.in_flight:
+                self.shed += 1
+                raise EngineOverloaded(self.retry_after())
+            self.outstanding_ms += cost
+            self.in_flight += 1
+            self.waiting += 1
+            if degraded:
+                self.degraded += 1
+        return Ticket(difficulty=diff, cost_ms=cost, admitted_at=time.perf_counter(), degraded=degraded)
+
+    def mark_started(self, ticket: Ticket) -> None:
+        """Record that the search actually started; feeds the wait-time estimate."""
+        if ticket.started_at is not None:
+            return
+        ticket.started_at = time.perf_counter()
+        wait_ms = (ticket.started_at - ticket.admitted_at) * 1000
+        with self._lock:
+            self.waiting -= 1
+            self.wait_ewma_ms += 0.2 * (wait_ms - self.wait_ewma_ms)
+
+    def _release(self, ticket: Ticket) -> None:
+        with self._lock:
+            if ticket.started_at is None:
+                self.waiting -= 1
+            self.outstanding_ms -= ticket.cost_ms
+            self.in_flight -= 1
+            if not self.in_flight:
+                # Nothing queued: the next request starts immediately
+                self.wait_ewma_ms = 0.0
+
+    @contextmanager
+    def admit(self, diff: Difficulty, degradable: bool = True):
+        """Reserve engine capacity for one search; yields a Ticket with the difficulty to use."""
+        ticket = self._reserve(diff, degradable)
+        try:
+            yield ticket
+        finally:
+            self._release(ticket)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "capacity_ms": self.capacity_ms,
+                "outstanding_ms": self.outstanding_ms,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "wait_ewma_ms": round(self.wait_ewma_ms, 1),
+                "shed": self.shed,
+                "degraded": self.degraded,
+            }
+
+
+engine_admission = AdmissionController(
+    capacity_ms=settings.engine_capacity_ms,
+    degrade_ratio=settings.engine_degrade_ratio,
+    max_wait_ms=settings.engine_max_wait_ms,
+    parallelism=settings.engine_worker_count(),
+)
@@ -0,0 +1,237 @@
+"""Game-end rules for live games, evaluated in one pass per move.
+
+`board.is_game_over(claim_draw=True)` followed by the individual
+`is_checkmate()` / `can_claim_*()` checks regenerates legal moves several
+times per move, and every repetition claim replays the move stack back to
+the last irreversible move, so the cost grows with the length of the game.
+
+`GameRules` keeps a board together with a `RepetitionTracker`, which counts
+positions by Polyglot Zobrist hash as moves are pushed. The hash is updated
+incrementally from the squares a move touches. Outcome classification
+generates legal moves once, and only looks ahead for a threefold claim when
+some position in the current window has already occurred twice.
+
+Repetition follows python-chess's claim rules: positions count from the last
+irreversible move, and a draw can be claimed when the current position
+occurred three times or a legal move reaches a third occurrence. Polyglot
+hashes count an en passant square whenever a pawn stands ready to capture,
+legal or not, so a position with a pinned en passant pawn may differ from
+python-chess's own comparison. That is rare enough to ignore here.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import chess
+import chess.polyglot
+
+_RANDOM = chess.polyglot.POLYGLOT_RANDOM_ARRAY
+_BACK_RANK_FILES = (0, 2, 3, 5, 6, 7)  # rook and king squares touched by castling
+
+
+@dataclass(frozen=True)
+class Outcome:
+    game_over: bool
+    outcome: str | None = None  # checkmate | stalemate | insufficient_material | fifty_move | threefold
+    winner: str | None = None   # "white" | "black" on checkmate
+
+    @property
+    def pgn_result(self) -> str:
+        if not self.game_over:
+            return "*"
+        if self.winner == "white":
+            return "1-0"
+        if self.winner == "black":
+            return "0-1"
+        return "1/2-1/2"
+
+
+ONGOING = Outcome(game_over=False)
+
+
+def _piece_key(piece: chess.Piece, square: chess.Square) -> int:
+    return _RANDOM[64 * ((piece.piece_type - 1) * 2 + int(piece.color)) + square]
+
+
+def _pieces_hash(board: chess.Board) -> int:
+    h = 0
+    for square, piece in board.piece_map().items():
+        h ^= _piece_key(piece, square)
+    return h
+
+
+def _state_hash(board: chess.Board) -> int:
+    # Castling rights, en passant file and side to move, as in chess.polyglot
+    h = 0
+    castling = board.castling_rights
+    if castling & chess.BB_H1:
+        h ^= _RANDOM[768]
+    if castling & chess.BB_A1:
+        h ^= _RANDOM[769]
+    if castling & chess.BB_H8:
+        h ^= _RANDOM[770]
+    if castling & chess.BB_A8:
+        h ^= _RANDOM[771]
+    ep = board.ep_square
+    if ep is not None and board.pawns & board.occupied_co[board.turn] & chess.BB_PAWN_ATTACKS[not board.turn][ep]:
+        h ^= _RANDOM[772 + chess.square_file(ep)]
+    if board.turn == chess.WHITE:
+        h ^= _RANDOM[780]
+    return h
+
+
+class RepetitionTracker:
+    """Occurrence counts of the positions since the last irreversible move."""
+
+    def __init__(self, board: chess.Board):
+        self._pieces = _pieces_hash(board)
+        self.key = self._pieces ^ _state_hash(board)
+        self.counts: dict[int, int] = {self.key: 1}
+        self.repeated = 0  # positions in the window seen at least twice
+
+    def push(self, board: chess.Board, move: chess.Move) -> None:
+        """Play `move` on `board` and count the resulting position."""
+        pending = self.before_move(board, move)
+        board.push(move)
+        self.after_move(board, pending)
+
+    def before_move(self, board: chess.Board, move: chess.Move):
+        """State needed by `after_move`, for callers that push the move themselves."""
+        squares = {move.from_square, move.to_square}
+        if board.is_en_passant(move):
+            squares.add(chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square)))
+        elif board.is_castling(move):
+            rank = chess.square_rank(move.from_square)
+            squares.update(chess.square(f, rank) for f in _BACK_RANK_FILES)
+        return [(sq, board.piece_at(sq)) for sq in squares], board.is_irreversible(move)
+
+    def after_move(self, board: chess.Board, pending) -> None:
+        before, irreversible = pending
+        for sq, old in before:
+            new = board.piece_at(sq)
+            if old != new:
+                if old is not None:
+                    self._pieces ^= _piece_key(old, sq)
+                if new is not None:
+                    self._pieces ^= _piece_key(new, sq)
+        self.key = self._pieces ^ _state_hash(board)
+
+        if irreversible:
+            # Earlier positions can no longer recur (python-chess stops its scan here too)
+            self.counts.clear()
+            self.repeated = 0
+        n = self.counts.get(self.key, 0) + 1
+        self.counts[self.key] = n
+        if n == 2:
+            self.repeated += 1
+
+    def can_claim_threefold(self, board: chess.Board) -> bool:
+        if self.counts[self.key] >= 3:
+            return True
+        if not self.repeated:
+            # No position has occurred twice, so no move can make a third occurrence
+            return False
+        for move in board.generate_legal_moves():
+            board.push(move)
+            try:
+                if self.counts.get(chess.polyglot.zobrist_hash(board), 0) >= 2:
+                    return True
+            finally:
+                board.pop()
+        return False
+
+
+def _can_claim_fifty_moves(board: chess.Board) -> bool:
+    # Caller has established that the side to move has a legal move
+    if board.halfmove_clock >= 100:
+        return True
+    if board.halfmove_clock >= 99:
+        for move in board.generate_legal_moves():
+            if not board.is_zeroing(move):
+                board.push(move)
+                try:
+                    if any(board.generate_legal_moves()):
+                        return True
+                finally:
+                    board.pop()
+    return False
+
+
+def classify(board: chess.Board, tracker: RepetitionTracker) -> Outcome:
+    """Outcome of the position, equivalent to `is_game_over(claim_draw=True)` plus its cause."""
+    if not any(board.generate_legal_moves()):
+        if board.is_check():
+            return Outcome(True, "checkmate", "white" if board.turn == chess.BLACK else "black")
+        return Outcome(True, "stalemate")
+    if board.is_insufficient_material():
+        return Outcome(True, "insufficient_material")
+    if _can_claim_fifty_moves(board):
+        return Outcome(True, "fifty_move")
+    if tracker.can_claim_threefold(board):
+        return Outcome(True, "threefold")
+    return ONGOING
+
+
+class GameRules:
+    """A game's board with its repetition tracker."""
+
+    def __init__(self, start_fen: str, moves: list[str] = ()):
+        self.start_fen = start_fen
+        self.board = chess.Board(start_fen)
+        self.tracker = RepetitionTracker(self.board)
+        for uci in moves:
+            self.push(self.board.parse_uci(uci))
+
+    @property
+    def plies(self) -> int:
+        return len(self.board.move_stack)
+
+    def push(self, move: chess.Move) -> None:
+        self.tracker.push(self.board, move)
+
+    def outcome(self) -> Outcome:
+        return classify(self.board, self.tracker)
+
+    def matches(self, moves: list[str]) -> bool:
+        if self.plies != len(moves):
+            return False
+        return not moves or self.board.peek().uci() == moves[-1]
+
+
+class GameRulesCache:
+    """LRU of `GameRules` per game id, so a move doesn't replay the whole game.
+
+    `checkout` hands the caller exclusive use of the entry (it is removed from
+    the cache) and rebuilds it if it doesn't match the stored move list, e.g.
+    when another worker process advanced the game. `checkin` returns it.
+    """
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, GameRules] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def checkout(self, game_id: str, start_fen: str, moves: list[str]) -> GameRules:
+        with self._lock:
+            rules = self._entries.pop(game_id, None)
+        if rules is not None and rules.start_fen == start_fen and rules.matches(moves):
+            self.hits += 1
+            return rules
+        self.misses += 1
+        return GameRules(start_fen, moves)
+
+    def checkin(self, game_id: str, rules: GameRules) -> None:
+        with self._lock:
+            self._entries[game_id] = rules
+            self._entries.move_to_end(game_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, game_id: str) -> None:
+        with self._lock:
+            self._entries.pop(game_id, None)
+
+
+game_rules_cache = GameRulesCache()
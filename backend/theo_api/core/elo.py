@@ -0,0 +1,13 @@
+def elo_tier(elo_bucket: int) -> str:
+    """Map an Elo bucket to the coaching tier used for tone and wording.
+
+    The thresholds match the tone bands used by the LLM prompts:
+    <=600 novice, <=1000 beginner, <=1400 intermediate, otherwise advanced.
+    """
+    if elo_bucket <= 600:
+        return "novice"
+    if elo_bucket <= 1000:
+        return "beginner"
+    if elo_bucket <= 1400:
+        return "intermediate"
+    return "advanced"
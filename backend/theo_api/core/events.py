@@ -0,0 +1,128 @@
+"""Structured event log (JSON lines) written off the request path.
+
+    events.emit("move", game_id=g.id, ply=12, outcome=None)
+
+`emit` builds a dict and puts it on a bounded queue; a background thread
+writes queued events in batches. When the queue is full the event is dropped
+and counted rather than blocking the request. High-volume events can be
+sampled per key (e.g. per game, so sampled games are complete); events
+emitted with `sample_key=None` are always kept.
+
+Configured with EVENT_LOG_PATH ("-" for stdout, empty to disable),
+EVENT_LOG_SAMPLE_RATE, EVENT_LOG_QUEUE_SIZE and EVENT_LOG_BATCH_SIZE.
+"""
+import atexit
+import json
+import queue
+import sys
+import threading
+import time
+import zlib
+
+from theo_api.config import settings
+from theo_api.core import metrics
+
+
+class EventLog:
+    def __init__(
+        self,
+        path: str,
+        sample_rate: float = 1.0,
+        queue_size: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 0.5,
+    ):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self._queue: queue.Queue[dict | None] = queue.Queue(maxsize=queue_size)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def sampled(self, key: str) -> bool:
+        if self.sample_rate >= 1.0:
+            return True
+        # Stable per key, so a sampled game is logged from its first move to its last
+        return zlib.crc32(key.encode()) % 10000 < self.sample_rate * 10000
+
+    def emit(self, event: str, sample_key: str | None = None, **fields) -> None:
+        if not self.enabled or (sample_key is not None and not self.sampled(sample_key)):
+            return
+        if self._thread is None:
+            self._start()
+        record = {"ts": round(time.time(), 3), "event": event, **fields}
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Write out queued events and stop the writer thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+        self._thread = None
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._writer, name="event-log", daemon=True)
+                self._thread.start()
+
+    def _writer(self) -> None:
+        # stdout is looked up per batch: it may be swapped (tests, log capture) while we run
+        out = open(self.path, "a", encoding="utf-8") if self.path != "-" else None
+        try:
+            running = True
+            while running:
+                try:
+                    first = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                batch = [first]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if None in batch:
+                    running = False
+                    batch = [r for r in batch if r is not None]
+                if batch:
+                    target = out or sys.stdout
+                    try:
+                        target.write("".join(json.dumps(r, default=str, separators=(",", ":")) + "\n" for r in batch))
+                        target.flush()
+                        self.written += len(batch)
+                    except (OSError, ValueError):
+                        self.dropped += len(batch)
+        finally:
+            if out is not None:
+                out.close()
+
+
+event_log = EventLog(
+    path=settings.event_log_path,
+    sample_rate=settings.event_log_sample_rate,
+    queue_size=settings.event_log_queue_size,
+    batch_size=settings.event_log_batch_size,
+)
+emit = event_log.emit
+atexit.register(event_log.close)
+
+metrics.register(metrics.CounterFunc(
+    "theo_events_dropped_total", "Structured log events dropped because the writer queue was full",
+    lambda: {(): event_log.dropped},
+))
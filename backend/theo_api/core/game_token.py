@@ -0,0 +1,126 @@
+"""Signed, self-contained game state for the stateless API.
+
+`POST /api/games/move` (api/stateless_games.py) keeps nothing on the
+server. A game token carries what the FEN alone loses: the start position
+and every move since. With it the server can detect threefold repetition
+and give the engine the game history. That makes stateless workers
+full-fidelity without any DB I/O, so any worker can serve any request.
+
+Layout, before URL-safe base64 (no padding):
+
+    version (1 byte) | flags (1 byte) | [FEN length (2 bytes) | FEN] | moves | HMAC
+
+The FEN is only included when the game didn't start from the standard
+position. Each move is 2 bytes: from square (6 bits), to square (6 bits)
+and promotion piece (4 bits). The HMAC is SHA-256 over everything before
+it, truncated to 16 bytes. Tokens are signed with `game_token_secret`.
+When that is unset, a random per-process key is used, so tokens only
+verify on the worker that issued them. The API then plays the move from the
+FEN alone, without the history.
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+import struct
+
+import chess
+
+from theo_api.config import settings
+from theo_api.core.chess_rules import GameRules
+
+VERSION = 1
+MAX_PLIES = 1024
+_MAC_BYTES = 16
+_CUSTOM_START = 0x01
+_HEAD = struct.Struct(">BB")
+_FEN_LEN = struct.Struct(">H")
+
+_key = settings.game_token_secret.encode() or secrets.token_bytes(32)
+
+
+class InvalidGameToken(ValueError):
+    pass
+
+
+def _mac(data: bytes) -> bytes:
+    return hmac.new(_key, data, hashlib.sha256).digest()[:_MAC_BYTES]
+
+
+def pack_move(move: chess.Move) -> int:
+    return move.from_square << 10 | move.to_square << 4 | (move.promotion or 0)
+
+
+def unpack_move(value: int) -> chess.Move:
+    return chess.Move(value >> 10, (value >> 4) & 0x3F, (value & 0x0F) or None)
+
+
+def encode(start_fen: str, moves: list[chess.Move]) -> str:
+    """Signed token for a game that started at `start_fen` and played `moves`."""
+    if len(moves) > MAX_PLIES:
+        raise InvalidGameToken(f"games are limited to {MAX_PLIES} plies")
+    parts = []
+    if start_fen == chess.STARTING_FEN:
+        parts.append(_HEAD.pack(VERSION, 0))
+    else:
+        fen = start_fen.encode()
+        parts += [_HEAD.pack(VERSION, _CUSTOM_START), _FEN_LEN.pack(len(fen)), fen]
+    parts.append(struct.pack(f">{len(moves)}H", *map(pack_move, moves)))
+    data = b"".join(parts)
+    return base64.urlsafe_b64encode(data + _mac(data)).rstrip(b"=").decode()
+
+
+def decode(token: str) -> tuple[str, list[chess.Move]]:
+    """(start FEN, moves) of a token; raises InvalidGameToken unless it is intact and ours."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (ValueError, TypeError):
+        raise InvalidGameToken("malformed game token")
+    data, mac = raw[:-_MAC_BYTES], raw[-_MAC_BYTES:]
+    if len(data) < _HEAD.size or not hmac.compare_digest(mac, _mac(data)):
+        raise InvalidGameToken("game token signature does not match")
+
+    version, flags = _HEAD.unpack_from(data)
+    if version != VERSION:
+        raise InvalidGameToken(f"unsupported game token version {version}")
+    pos = _HEAD.size
+    start_fen = chess.STARTING_FEN
+    if flags & _CUSTOM_START:
+        (n,) = _FEN_LEN.unpack_from(data, pos)
+        pos += _FEN_LEN.size
+        start_fen = data[pos:pos + n].decode()
+        pos += n
+    body = data[pos:]
+    if len(body) % 2 or len(body) // 2 > MAX_PLIES:
+        raise InvalidGameToken("malformed game token")
+    return start_fen, [unpack_move(v) for v in struct.unpack(f">{len(body) // 2}H", body)]
+
+
+def sign(rules: GameRules) -> str:
+    return encode(rules.start_fen, rules.board.move_stack)
+
+
+def open_game(token: str) -> GameRules:
+    """Replay a token's game; raises InvalidGameToken if a move is not legal."""
+    start_fen, moves = decode(token)
+    try:
+        rules = GameRules(start_fen)
+    except ValueError:
+        raise InvalidGameToken("game token has an invalid start position")
+    for move in moves:
+        if not rules.board.is_legal(move):
+            raise InvalidGameToken("game token contains an illegal move")
+        rules.push(move)
+    return rules
+
+
+def engine_history(board: chess.Board) -> tuple[str, list[str]]:
+    """Root FEN and moves for UCI `position ... moves`, from the last irreversible move on.
+
+    Earlier moves can't affect repetition, so they are left out to keep the
+    command short.
+    """
+    n = min(board.halfmove_clock, len(board.move_stack))
+    root = board.copy(stack=n)
+    moves = [root.pop().uci() for _ in range(n)][::-1]
+    return root.fen(), moves
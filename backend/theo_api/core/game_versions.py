@@ -0,0 +1,102 @@
+"""Per-game state versions for conditional GETs and long polling.
+
+A game's version is derived from its stored state (two per ply, plus one
+once it is finished), so every worker computes the same value from the DB
+row. This process remembers the latest version of each game it has written
+or read. `GET /games/{id}` uses that to answer `If-None-Match` with 304
+without loading the game, and to park `?wait_for_version=N` requests until
+the game moves past N.
+
+The map is per process. With several workers, an entry only reflects this
+worker's own writes, so entries are trusted for `game_version_ttl_s`
+seconds and then re-read from the DB. Set that low, or route a game's
+requests to one worker, when running more than one.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from theo_api.config import settings
+
+
+def version_of(moves_uci: str, status: str) -> int:
+    plies = len(moves_uci.split())
+    return 2 * plies + (0 if status == "active" else 1)
+
+
+def etag(version: int) -> str:
+    return f'"g{version}"'
+
+
+def etag_matches(if_none_match: str | None, version: int) -> bool:
+    if not if_none_match:
+        return False
+    tag = etag(version)
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == tag:
+            return True
+    return False
+
+
+def _wake(fut: asyncio.Future) -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+class GameVersions:
+    def __init__(self, ttl: float = 10.0, maxsize: int = 100_000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._versions: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._waiters: dict[str, list[tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, game_id: str) -> int | None:
+        """Known version of a game, or None if unknown or too old to trust."""
+        with self._lock:
+            entry = self._versions.get(game_id)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            return None
+        return entry[0]
+
+    def set(self, game_id: str, version: int) -> None:
+        """Record a version and wake long polls waiting on an older one."""
+        with self._lock:
+            previous = self._versions.get(game_id)
+            self._versions[game_id] = (version, time.monotonic())
+            self._versions.move_to_end(game_id)
+            while len(self._versions) > self.maxsize:
+                self._versions.popitem(last=False)
+            waiters = self._waiters.pop(game_id, []) if previous is None or previous[0] != version else []
+        for loop, fut in waiters:
+            loop.call_soon_threadsafe(_wake, fut)
+
+    async def wait_for_change(self, game_id: str, version: int, timeout: float) -> None:
+        """Return once the game's version differs from `version`, or after `timeout` seconds."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            entry = self._versions.get(game_id)
+            if entry is not None and entry[0] != version:
+                return
+            self._waiters.setdefault(game_id, []).append((loop, fut))
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(game_id)
+                if waiters is not None:
+                    waiters[:] = [w for w in waiters if w[1] is not fut]
+                    if not waiters:
+                        del self._waiters[game_id]
+
+    def waiting(self) -> int:
+        with self._lock:
+            return sum(len(w) for w in self._waiters.values())
+
+
+game_versions = GameVersions(ttl=settings.game_version_ttl_s)
@@ -0,0 +1,107 @@
+"""Start-up warm-up and readiness.
+
+Warm-up steps (engine pool, DB, LLM client, imports used by request handlers)
+are registered with `warmup.add` and run in parallel threads from the app
+lifespan, after the server has started accepting connections. `/ready`
+answers 503 until every required step has finished, so a rolling deploy only
+routes traffic to warm instances; `/health` stays a plain liveness check.
+A cheap step registered with `retry=True` is run again by `/ready` while it
+is failing, so the instance becomes ready once its cause is fixed.
+"""
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+
+@dataclass
+class WarmupStep:
+    name: str
+    fn: Callable[[], None]
+    required: bool = True
+    retry: bool = False
+    status: str = "pending"  # pending | running | ok | failed
+    duration_ms: float | None = None
+    error: str | None = None
+
+
+class Warmup:
+    def __init__(self):
+        self.steps: dict[str, WarmupStep] = {}
+        self.import_ms: float | None = None
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.skipped = False
+        self._lock = threading.Lock()
+
+    def add(self, name: str, fn: Callable[[], None], required: bool = True, retry: bool = False) -> None:
+        self.steps[name] = WarmupStep(name=name, fn=fn, required=required, retry=retry)
+
+    def skip(self) -> None:
+        """Mark the instance ready without warming (lazy start-up)."""
+        self.skipped = True
+
+    @property
+    def ready(self) -> bool:
+        if self.skipped:
+            return True
+        if self.finished_at is None:
+            return False
+        return all(s.status == "ok" for s in self.steps.values() if s.required)
+
+    def retry_failed(self) -> None:
+        """Re-run failed `retry` steps once warm-up has finished; concurrent callers don't wait."""
+        if self.finished_at is None or not self._lock.acquire(blocking=False):
+            return
+        try:
+            for step in self.steps.values():
+                if step.retry and step.status == "failed":
+                    self._run_step(step)
+                    if step.status == "ok":
+                        step.error = None
+        finally:
+            self._lock.release()
+
+    async def run(self) -> None:
+        self.started_at = time.perf_counter()
+        await asyncio.gather(*(asyncio.to_thread(self._run_step, s) for s in self.steps.values()))
+        self.finished_at = time.perf_counter()
+
+    def _run_step(self, step: WarmupStep) -> None:
+        step.status = "running"
+        start = time.perf_counter()
+        try:
+            step.fn()
+        except Exception as e:
+            step.status = "failed"
+            step.error = f"{type(e).__name__}: {e}"
+        else:
+            step.status = "ok"
+        finally:
+            step.duration_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    def status(self) -> dict:
+        done = sum(1 for s in self.steps.values() if s.status in ("ok", "failed"))
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = round(((self.finished_at or time.perf_counter()) - self.started_at) * 1000, 1)
+        return {
+            "ready": self.ready,
+            "progress": f"{done}/{len(self.steps)}",
+            "import_ms": self.import_ms,
+            "warmup_ms": elapsed,
+            "skipped": self.skipped,
+            "steps": {
+                s.name: {
+                    "status": s.status,
+                    "required": s.required,
+                    "duration_ms": s.duration_ms,
+                    "error": s.error,
+                }
+                for s in self.steps.values()
+            },
+        }
+
+
+warmup = Warmup()
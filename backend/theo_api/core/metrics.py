@@ -0,0 +1,250 @@
+"""In-process metrics with Prometheus text exposition.
+
+Counters and histograms are created once at import time with `counter(...)`
+and `histogram(...)`, then updated on the hot path:
+
+    ENGINE_SEARCH.labels(elo_bucket=800).observe(0.21)
+    RATE_LIMIT_REJECTIONS.inc()
+
+Updating a child is a dict lookup plus an uncontended per-child lock, a few
+microseconds at most; there is no global lock on the update path. Values that
+already live elsewhere (scheduler counters, the per-route stage histograms of
+`utils.timing`) are read by collectors only when `/metrics` is scraped.
+"""
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Iterable
+
+from theo_api.utils import timing
+
+# Seconds; covers a cache hit through a long LLM call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _Family(ABC):
+    """A metric name with a fixed set of label names and one child per label value set."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._child_for(())
+
+    @abstractmethod
+    def _new_child(self):
+        """A fresh child for one label value set (None when values are read at scrape time)."""
+
+    def _child_for(self, key: tuple[str, ...]):
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def labels(self, **labels):
+        return self._child_for(tuple(str(labels[n]) for n in self.labelnames))
+
+    def children(self) -> dict[tuple[str, ...], object]:
+        return dict(self._children)
+
+    @abstractmethod
+    def collect(self) -> list[str]:
+        """Sample lines of this metric in the exposition format."""
+
+
+class Counter(_Family):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def collect(self) -> list[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, key)} {_fmt(child.value)}"
+            for key, child in sorted(self._children.items())
+        ]
+
+
+_LE_INF = 'le="+Inf"'
+
+
+def _histogram_lines(name: str, labelnames, key, h: timing.Histogram, scale: float = 1.0) -> list[str]:
+    out = []
+    cumulative = 0
+    for bound, n in zip(h.buckets, h.counts):
+        cumulative += n
+        le = 'le="%s"' % _fmt(bound * scale)
+        out.append(f"{name}_bucket{_labels(labelnames, key, le)} {cumulative}")
+    out.append(f"{name}_bucket{_labels(labelnames, key, _LE_INF)} {h.count}")
+    out.append(f"{name}_sum{_labels(labelnames, key)} {_fmt(h.sum * scale)}")
+    out.append(f"{name}_count{_labels(labelnames, key)} {h.count}")
+    return out
+
+
+class Histogram(_Family):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return timing.Histogram(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def collect(self) -> list[str]:
+        out = []
+        for key, child in sorted(self._children.items()):
+            out.extend(_histogram_lines(self.name, self.labelnames, key, child))
+        return out
+
+
+class GaugeFunc(_Family):
+    """Gauge whose values are read from `fn` at scrape time: {label values: value}."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], dict[tuple[str, ...], float]], labelnames: Iterable[str] = ()):
+        self.fn = fn
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return None
+
+    def collect(self) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_fmt(v)}" for key, v in sorted(self.fn().items())]
+
+
+class CounterFunc(GaugeFunc):
+    """Counter maintained elsewhere and read at scrape time."""
+
+    type = "counter"
+
+
+class _StageTimings(_Family):
+    """Exposes the per-route, per-stage histograms kept by `utils.timing` (in seconds)."""
+
+    type = "histogram"
+
+    def _new_child(self):
+        return None
+
+    def collect(self) -> list[str]:
+        out = []
+        for (route, stage), h in sorted(timing._histograms.items()):
+            out.extend(_histogram_lines(self.name, self.labelnames, (route, stage), h, scale=0.001))
+        return out
+
+
+_registry: dict[str, _Family] = {}
+_registry_lock = threading.Lock()
+
+
+def register(family: _Family) -> _Family:
+    with _registry_lock:
+        existing = _registry.get(family.name)
+        if existing is not None:
+            return existing
+        _registry[family.name] = family
+    return family
+
+
+def counter(name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+    return register(Counter(name, help, labelnames))
+
+
+def histogram(name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+    return register(Histogram(name, help, labelnames, buckets))
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text format (version 0.0.4)."""
+    lines = []
+    for family in list(_registry.values()):
+        samples = family.collect()
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.type}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+register(_StageTimings(
+    "theo_stage_duration_seconds",
+    "Request stage latency by route; stage=\"total\" is the whole request, route=\"-\" is work outside requests",
+    ("route", "stage"),
+))
+
+ENGINE_SEARCH = histogram(
+    "theo_engine_search_seconds", "Stockfish search time per Elo bucket", ("elo_bucket",)
+)
+ENGINE_DEPTH = histogram(
+    "theo_engine_depth", "Depth reached by the best line per Elo bucket", ("elo_bucket",),
+    buckets=(1, 2, 4, 6, 8, 10, 12, 14, 16, 18, 20, 25, 30),
+)
+ENGINE_SELDEPTH = histogram(
+    "theo_engine_seldepth", "Selective depth reached per Elo bucket", ("elo_bucket",),
+    buckets=(2, 4, 8, 12, 16, 20, 25, 30, 40, 50, 64),
+)
+ENGINE_NPS = histogram(
+    "theo_engine_nps", "Nodes per second of finished searches per Elo bucket", ("elo_bucket",),
+    buckets=(1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2e6, 4e6, 8e6, 1.6e7),
+)
+ENGINE_HASHFULL = histogram(
+    "theo_engine_hashfull_permille", "Hash table fill at the end of a search per Elo bucket", ("elo_bucket",),
+    buckets=(10, 50, 100, 250, 500, 750, 900, 1000),
+)
+ENGINE_NODES = counter("theo_engine_nodes_total", "Nodes searched per Elo bucket", ("elo_bucket",))
+ENGINE_TBHITS = counter("theo_engine_tbhits_total", "Tablebase hits per Elo bucket", ("elo_bucket",))
+ENGINE_BOUNDED = counter(
+    "theo_engine_bounded_lines_total",
+    "Returned lines whose score was only a lower/upper bound (search cut short on a fail-high/low)",
+    ("elo_bucket",),
+)
+ENGINE_SHED = counter("theo_engine_shed_total", "Engine requests rejected with 503 by admission control")
+LLM_LATENCY = histogram("theo_llm_request_seconds", "LLM chat completion latency, including failed calls")
+LLM_ERRORS = counter("theo_llm_errors_total", "LLM calls that raised (HTTP, timeout or decode errors)")
+LLM_FALLBACKS = counter(
+    "theo_llm_fallbacks_total", "Responses served from a local fallback instead of the LLM", ("kind",)
+)
+RATE_LIMIT_REJECTIONS = counter("theo_rate_limit_rejections_total", "Requests rejected with 429 by the rate limiter")
@@ -1,33 +1,299 @@
+import hashlib
+import math
+import os
+import socket
+import struct
 import time
-import asyncio
-from typing import Dict
+import threading
+from abc import ABC, abstractmethod
+
 from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+from theo_api.config import settings
+from theo_api.core import metrics
+
+
+class BaseRateLimiter(ABC):
+    """Common interface: `acquire` returns 0.0 if allowed, else seconds to wait."""
+
+    max_requests: int
+    per_seconds: float
+    # acquire() may block (file locks, network); async callers run it in the threadpool
+    blocking = False
+
+    @abstractmethod
+    def acquire(self, key: str, now: float | None = None) -> float:
+        ...
+
+    async def acquire_async(self, key: str) -> float:
+        if self.blocking:
+            return await run_in_threadpool(self.acquire, key)
+        return self.acquire(key)
+
+    async def hit(self, key: str) -> bool:
+        return await self.acquire_async(key) == 0.0
+
+
+def _gcra(tat: float | None, now: float, interval: float, window: float) -> tuple[float, float]:
+    """Return (retry_after, new_tat) for one hit; retry_after is 0.0 when allowed."""
+    if tat is None or tat < now:
+        tat = now
+    new_tat = tat + interval
+    excess = new_tat - now - window
+    if excess > 1e-9:  # tolerate float rounding on the last allowed hit
+        return excess, tat
+    return 0.0, new_tat
+
 
-# Simple in-memory token-bucket style limiter per key (IP). Not distributed.
-class RateLimiter:
-    def __init__(self, max_requests: int, per_seconds: int):
+# In-memory GCRA (generic cell rate algorithm) limiter per key (IP), local to one process.
+#
+# Each key stores a single float, its "theoretical arrival time" (TAT): the time at
+# which the key would be back to a full allowance. A hit is allowed while the TAT
+# stays within `per_seconds` of now, which gives the same burst as a sliding window
+# of `max_requests` per `per_seconds` with O(1) work and memory per key.
+#
+# Keys are spread over shards, each with its own small lock, so threads handling
+# different clients rarely contend. A key whose TAT is in the past is equivalent
+# to an unseen key, so idle keys are dropped by a background thread that sweeps
+# one shard at a time, off the request path. It starts with the first hit timed
+# by the real clock (hits with an explicit `now` are simulations and tests).
+class RateLimiter(BaseRateLimiter):
+    def __init__(self, max_requests: int, per_seconds: float, shards: int = 16):
+        if max_requests < 1 or per_seconds <= 0:
+            raise ValueError("max_requests and per_seconds must be positive")
         self.max_requests = max_requests
         self.per_seconds = per_seconds
-        self.state: Dict[str, list[float]] = {}
-        self.lock = asyncio.Lock()
+        self.interval = per_seconds / max_requests
+        self._shards: list[dict[str, float]] = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        # Sweep every shard about once per window
+        self._sweep_every = per_seconds / shards
+        self._sweeper: threading.Thread | None = None
+        self._sweeper_lock = threading.Lock()
+        self._closed = threading.Event()
 
-    async def hit(self, key: str) -> bool:
-        now = time.time()
-        async with self.lock:
-            q = self.state.get(key) or []
-            # drop old timestamps
-            cutoff = now - self.per_seconds
-            q = [t for t in q if t > cutoff]
-            if len(q) >= self.max_requests:
-                self.state[key] = q
-                return False
-            q.append(now)
-            self.state[key] = q
-            return True
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def acquire(self, key: str, now: float | None = None) -> float:
+        """Record a hit for `key`; return 0.0 if allowed, else seconds until it would be."""
+        if now is None:
+            if self._sweeper is None:
+                self._start_sweeper()
+            now = time.monotonic()
+
+        i = hash(key) % len(self._shards)
+        shard = self._shards[i]
+        with self._locks[i]:
+            retry_after, new_tat = _gcra(shard.get(key), now, self.interval, self.per_seconds)
+            if not retry_after:
+                shard[key] = new_tat
+            return retry_after
+
+    def evict_idle(self, now: float | None = None) -> int:
+        """Drop every key that is back to a full allowance; returns how many were dropped."""
+        if now is None:
+            now = time.monotonic()
+        return sum(self._evict_shard(i, now) for i in range(len(self._shards)))
+
+    def _evict_shard(self, i: int, now: float) -> int:
+        with self._locks[i]:
+            shard = self._shards[i]
+            idle = [key for key, tat in shard.items() if tat <= now]
+            for key in idle:
+                del shard[key]
+            return len(idle)
+
+    def _start_sweeper(self) -> None:
+        with self._sweeper_lock:
+            if self._sweeper is None and not self._closed.is_set():
+                t = threading.Thread(target=self._sweep_loop, name="rate-limit-sweep", daemon=True)
+                t.start()
+                self._sweeper = t
+
+    def _sweep_loop(self) -> None:
+        i = 0
+        while not self._closed.wait(self._sweep_every):
+            self._evict_shard(i, time.monotonic())
+            i = (i + 1) % len(self._shards)
+
+    def close(self) -> None:
+        """Stop the background sweep."""
+        self._closed.set()
+
+
+class SharedMemoryRateLimiter(BaseRateLimiter):
+    """GCRA limiter whose state is a memory-mapped table shared by every worker on a host.
+
+    The file holds fixed-size buckets of 8 slots; a slot is (64-bit key hash, TAT).
+    A key lives in the bucket picked by its hash. Each hit locks only that
+    bucket's byte range (POSIX record lock for other processes, plus a thread
+    lock because record locks don't exclude threads of one process). Slots whose
+    TAT has passed are free for reuse, so the table never needs a sweep; if a
+    bucket is full of live keys the one closest to a full allowance is replaced.
+    """
+
+    BUCKET_SLOTS = 8
+    blocking = True
+    _SLOT = struct.Struct("<Qd")
+    _BUCKET = struct.Struct("<" + "Qd" * BUCKET_SLOTS)
+
+    def __init__(self, max_requests: int, per_seconds: float, path: str, slots: int = 65536):
+        import fcntl
+        import mmap
+
+        if max_requests < 1 or per_seconds <= 0:
+            raise ValueError("max_requests and per_seconds must be positive")
+        self.max_requests = max_requests
+        self.per_seconds = per_seconds
+        self.interval = per_seconds / max_requests
+        self.path = path
+        self.buckets = max(1, slots // self.BUCKET_SLOTS)
+        self._lockf = fcntl.lockf
+        self._LOCK_EX = fcntl.LOCK_EX
+        self._LOCK_UN = fcntl.LOCK_UN
+
+        size = self.buckets * self._BUCKET.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self._mm = mmap.mmap(self._fd, size)
+        self._thread_locks = [threading.Lock() for _ in range(64)]
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+    def acquire(self, key: str, now: float | None = None) -> float:
+        if now is None:
+            now = time.monotonic()  # system-wide clock, comparable across processes
+        # Python's hash() is randomized per process; workers need a stable hash.
+        h = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        bucket = h % self.buckets
+        offset = bucket * self._BUCKET.size
+        with self._thread_locks[bucket % len(self._thread_locks)]:
+            self._lockf(self._fd, self._LOCK_EX, self._BUCKET.size, offset)
+            try:
+                return self._acquire_in_bucket(h, offset, now)
+            finally:
+                self._lockf(self._fd, self._LOCK_UN, self._BUCKET.size, offset)
+
+    def _acquire_in_bucket(self, h: int, offset: int, now: float) -> float:
+        fields = self._BUCKET.unpack_from(self._mm, offset)
+        slot = None
+        free = None
+        victim = 0
+        for i in range(self.BUCKET_SLOTS):
+            slot_hash = fields[2 * i]
+            slot_tat = fields[2 * i + 1]
+            if slot_hash == h:
+                slot = i
+                break
+            if free is None and (slot_hash == 0 or slot_tat <= now):
+                free = i
+            if slot_tat < fields[2 * victim + 1]:
+                victim = i
+
+        tat = fields[2 * slot + 1] if slot is not None else None
+        retry_after, new_tat = _gcra(tat, now, self.interval, self.per_seconds)
+        if not retry_after:
+            if slot is None:
+                slot = free if free is not None else victim
+            self._SLOT.pack_into(self._mm, offset + slot * self._SLOT.size, h, new_tat)
+        return retry_after
+
+
+class TcpRateLimiter(BaseRateLimiter):
+    """Client for the rate-limit store in `theo_api.core.rate_limit_server`.
+
+    Each thread keeps one persistent connection. A request is one line,
+    "<max_requests> <per_seconds> <key>", answered with the retry-after seconds.
+    If the store is unreachable requests are allowed (fail open) and the
+    connection is retried after a short backoff, so an outage of the store
+    cannot take the API down with it.
+    """
+
+    blocking = True
+
+    def __init__(self, max_requests: int, per_seconds: float, address: str, timeout: float = 0.05):
+        host, _, port = address.rpartition(":")
+        self.max_requests = max_requests
+        self.per_seconds = per_seconds
+        self.address = (host or "127.0.0.1", int(port))
+        self.timeout = timeout
+        self.retry_backoff = 1.0
+        self._prefix = f"{max_requests} {per_seconds} ".encode()
+        self._local = threading.local()
+        self._down_until = 0.0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn[1].close()
+                conn[0].close()
+            except OSError:
+                pass
+
+    def acquire(self, key: str, now: float | None = None) -> float:
+        # `now` is ignored: the store's clock is authoritative
+        if time.monotonic() < self._down_until:
+            return 0.0
+        try:
+            sock, rfile = self._connection()
+            sock.sendall(self._prefix + key.replace("\n", " ").encode() + b"\n")
+            line = rfile.readline()
+            if not line:
+                raise ConnectionError("rate-limit store closed the connection")
+            return float(line)
+        except (OSError, ValueError):
+            self._drop_connection()
+            self._down_until = time.monotonic() + self.retry_backoff
+            return 0.0
+
+
+def make_limiter(max_requests: int, per_seconds: float, name: str = "default") -> BaseRateLimiter:
+    """Build a limiter for the backend selected by `settings.rate_limit_backend`.
+
+    "memory" limits per process, "shm" shares counters between the workers on
+    one host, and "tcp" shares them between hosts through the rate-limit store.
+    """
+    backend = settings.rate_limit_backend
+    if backend == "memory":
+        return RateLimiter(max_requests=max_requests, per_seconds=per_seconds)
+    if backend == "shm":
+        return SharedMemoryRateLimiter(
+            max_requests=max_requests,
+            per_seconds=per_seconds,
+            path=f"{settings.rate_limit_shm_path}-{name}",
+            slots=settings.rate_limit_shm_slots,
+        )
+    if backend == "tcp":
+        return TcpRateLimiter(
+            max_requests=max_requests,
+            per_seconds=per_seconds,
+            address=settings.rate_limit_store_address,
+        )
+    raise ValueError(f"Unknown rate_limit_backend: {backend!r}")
 
 
 # Default limiter: 60 requests per minute per IP
-limiter = RateLimiter(max_requests=60, per_seconds=60)
+limiter = make_limiter(max_requests=60, per_seconds=60)
 
 
 async def rate_limit_dependency(request: Request):
@@ -38,6 +304,11 @@ async def rate_limit_dependency(request: Request):
     except Exception:
         key = "anon"
 
-    ok = await limiter.hit(key)
-    if not ok:
-        raise HTTPException(status_code=429, detail="Too many requests")
+    retry_after = await limiter.acquire_async(key)
+    if retry_after:
+        metrics.RATE_LIMIT_REJECTIONS.inc()
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
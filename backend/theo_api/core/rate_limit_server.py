@@ -0,0 +1,60 @@
+"""Tiny TCP store that holds rate-limit state for several API hosts.
+
+Run one per deployment and point every API worker at it with
+`RATE_LIMIT_BACKEND=tcp RATE_LIMIT_STORE_ADDRESS=host:7390`:
+
+    python -m theo_api.core.rate_limit_server --host 0.0.0.0 --port 7390
+
+Protocol: one request per line, "<max_requests> <per_seconds> <key>\n",
+answered with "<retry_after_seconds>\n" (0 means allowed). State is the same
+sharded GCRA table the in-process limiter uses, one per distinct limit.
+"""
+import argparse
+import asyncio
+
+from theo_api.core.rate_limit import RateLimiter
+
+
+class RateLimitStore:
+    def __init__(self):
+        self.limiters: dict[bytes, RateLimiter] = {}
+
+    def acquire(self, line: bytes) -> bytes:
+        max_requests, per_seconds, key = line.rstrip(b"\n").split(b" ", 2)
+        limiter = self.limiters.get(max_requests + b" " + per_seconds)
+        if limiter is None:
+            limiter = RateLimiter(max_requests=int(max_requests), per_seconds=float(per_seconds))
+            self.limiters[max_requests + b" " + per_seconds] = limiter
+        return f"{limiter.acquire(key.decode())}\n".encode()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    writer.write(self.acquire(line))
+                except ValueError:
+                    writer.write(b"0\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host: str, port: int) -> asyncio.Server:
+    store = RateLimitStore()
+    return await asyncio.start_server(store.handle, host, port)
+
+
+async def _main(host: str, port: int) -> None:
+    server = await serve(host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7390)
+    args = parser.parse_args()
+    asyncio.run(_main(args.host, args.port))
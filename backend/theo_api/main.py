@@ -1,16 +1,35 @@
-from fastapi import FastAPI
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+import asyncio
 import os
 import traceback
+from contextlib import asynccontextmanager
 from theo_api.api.health import router as health_router
 from theo_api.api.coach import router as coach_router
+from theo_api.api.analysis import router as analysis_router
+from theo_api.api.admin import router as admin_router
 from theo_api.config import settings
+from theo_api.core import metrics
+from theo_api.core.admission import EngineOverloaded
+from theo_api.core.events import event_log
+from theo_api.core.lifecycle import warmup
+from theo_api.services.stockfish.scheduler import engine_scheduler
+from theo_api.services.stockfish.difficulty import profiles
+from theo_api.utils.timing import ServerTimingMiddleware
+from theo_api.utils.profiling import ProfilingMiddleware, profiling_enabled
+from theo_api.services.llm.templates import get_templates
 
 # Try to import DB and games router; if SQLAlchemy is unavailable (e.g., in minimal test env),
 # fall back to creating the app without DB-backed routes to keep tests lightweight.
 try:
     from theo_api.services.storage.db import Base, engine
     from theo_api.api.games import router as games_router
+    from theo_api.api.positions import router as positions_router
     _HAS_DB = True
 except Exception:
     # Print the traceback so uvicorn logs show the real import error (helps debugging)
@@ -19,6 +38,7 @@ except Exception:
     Base = None
     engine = None
     games_router = None
+    positions_router = None
     _HAS_DB = False
     # If DB isn't available, attempt to expose a stateless games router instead
     try:
@@ -26,12 +46,91 @@ except Exception:
     except Exception:
         stateless_games_router = None
 
-def create_app() -> FastAPI:
-    app = FastAPI(title="Theo Backend", version="0.1.0")
+# Most of the cold import is FastAPI, SQLAlchemy and python-chess, which the
+# routers need at definition time; modules only needed by handlers are loaded
+# by the warm-up below.
+warmup.import_ms = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+
+
+def _warm_imports():
+    # Imported lazily by handlers; load them (and python-chess's attack tables) now
+    import chess
+    import chess.pgn
+    import chess.polyglot
+    import httpx  # noqa: F401
+
+    chess.Board().legal_moves.count()
+
+
+def _init_db():
     # Create tables only when explicitly requested (avoid side-effects during tests)
-    if _HAS_DB and Base is not None and os.environ.get("THEO_INIT_DB") == "1":
+    if _HAS_DB and os.environ.get("THEO_INIT_DB") == "1":
         Base.metadata.create_all(bind=engine)
+        # create_all skips existing tables, including indexes added to them later
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
+
+
+def _warm_db():
+    from sqlalchemy import text
+
+    _init_db()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+def _warm_llm():
+    # Load prompt templates once so every LLM call reuses the same static prefixes
+    get_templates()
+    from theo_api.services.llm.client import LLMClient
 
+    LLMClient()
+
+
+def _warm_coaching():
+    import chess
+    from theo_api.services.coaching.motifs import detect_motifs
+    from theo_api.services.stockfish.engine import EngineAnalysis
+
+    board = chess.Board()
+    detect_motifs(board, EngineAnalysis(fen=board.fen(), lines=[], best_move=None))
+
+
+warmup.add("imports", _warm_imports)
+# A missing or invalid difficulty profile keeps the instance out of rotation until it is fixed
+warmup.add("difficulty_profiles", profiles.check, retry=True)
+warmup.add("engine_pool", lambda: engine_scheduler.start(warm=True))
+warmup.add("llm", _warm_llm, required=False)
+warmup.add("coaching", _warm_coaching, required=False)
+if _HAS_DB:
+    warmup.add("db", _warm_db)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so /ready can report progress while it runs
+    task = None
+    if settings.warm_on_startup:
+        task = asyncio.create_task(warmup.run())
+    else:
+        _init_db()
+        warmup.skip()
+    yield
+    if task is not None and not task.done():
+        task.cancel()
+    await asyncio.to_thread(engine_scheduler.close)
+    event_log.close()
+    if engine is not None:
+        engine.dispose()
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="Theo Backend", version="0.1.0", lifespan=lifespan)
+
+    app.add_middleware(ServerTimingMiddleware)
+    if profiling_enabled():
+        app.add_middleware(ProfilingMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=settings.cors_origin_list(),
@@ -40,13 +139,31 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    @app.exception_handler(EngineOverloaded)
+    async def engine_overloaded_handler(request: Request, exc: EngineOverloaded):
+        metrics.ENGINE_SHED.inc()
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(exc)},
+            headers={"Retry-After": str(int(exc.retry_after))},
+        )
+
     app.include_router(health_router, prefix=settings.api_prefix)
     if _HAS_DB and games_router is not None:
         app.include_router(games_router, prefix=settings.api_prefix)
+        app.include_router(positions_router, prefix=settings.api_prefix)
     else:
         if stateless_games_router is not None:
             app.include_router(stateless_games_router, prefix=settings.api_prefix)
+            if not settings.game_token_secret:
+                print(
+                    "WARNING: GAME_TOKEN_SECRET is not set; game tokens only verify on the worker that "
+                    "issued them, and other workers play from the FEN without the game history.",
+                    flush=True,
+                )
     app.include_router(coach_router, prefix=settings.api_prefix)
+    app.include_router(analysis_router, prefix=settings.api_prefix)
+    app.include_router(admin_router, prefix=settings.api_prefix)
 
     return app
 
@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from pydantic import BaseModel, Field
 from typing import Literal, Optional
 
@@ -67,3 +69,18 @@ class GameStateResponse(BaseModel):
     current_fen: str
     moves_uci: list[str]
     pgn: str
+
+
+class GameSummary(BaseModel):
+    game_id: str
+    created_at: datetime
+    status: str
+    elo_bucket: int
+    player_color: Color
+    current_fen: str
+
+
+class GameListResponse(BaseModel):
+    games: list[GameSummary]
+    # Pass as `cursor` to get the next page; None on the last page
+    next_cursor: Optional[str] = None
@@ -1,4 +1,5 @@
 import theo_api.services.stockfish.analysis as analysis_mod
+from theo_api.services.stockfish.scheduler import Priority, engine_request
 from theo_api.services.llm.client import LLMClient
 import chess
 
@@ -9,7 +10,8 @@ def explain_move(fen: str, move_uci: str | None, elo_bucket: int) -> str:
 	Uses the LLM client when an API key is configured, otherwise returns
 	a short deterministic explanation based on engine evals.
 	"""
-	analysis = analysis_mod.analyze_position(fen, elo_bucket)
+	with engine_request(Priority.EXPLAIN):
+		analysis = analysis_mod.analyze_position(fen, elo_bucket)
 
 	# If move not provided, use engine best move
 	move = move_uci or analysis.best_move
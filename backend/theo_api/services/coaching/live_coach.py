@@ -1,4 +1,5 @@
 import theo_api.services.stockfish.analysis as analysis_mod
+from theo_api.services.stockfish.scheduler import Priority, engine_request
 from theo_api.services.llm.client import get_hint_for
 import chess
 
@@ -9,7 +10,8 @@ def get_live_hint(fen: str, elo_bucket: int) -> dict:
 	The return value includes UCI move, SAN move (when convertible),
 	the textual hint, and the raw analysis object.
 	"""
-	move_uci, analysis = analysis_mod.choose_engine_reply(fen, elo_bucket)
+	with engine_request(Priority.HINT):
+		move_uci, analysis = analysis_mod.choose_engine_reply(fen, elo_bucket)
 
 	san = None
 	try:
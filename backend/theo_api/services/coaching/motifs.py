@@ -0,0 +1,347 @@
+"""Rule-based coaching from board features.
+
+Detects common tactical and opening motifs with python-chess attack maps and
+produces short, Elo-aware sentences for them. This runs locally in well under
+a millisecond, so the LLM is only needed when no motif applies.
+"""
+import zlib
+from dataclasses import dataclass
+
+import chess
+
+from theo_api.core.elo import elo_tier
+from theo_api.services.stockfish.engine import EngineAnalysis
+
+
+PIECE_VALUES = {
+	chess.PAWN: 1,
+	chess.KNIGHT: 3,
+	chess.BISHOP: 3,
+	chess.ROOK: 5,
+	chess.QUEEN: 9,
+	chess.KING: 100,
+}
+
+_MINOR_HOME = {
+	chess.WHITE: ((chess.B1, chess.KNIGHT), (chess.G1, chess.KNIGHT), (chess.C1, chess.BISHOP), (chess.F1, chess.BISHOP)),
+	chess.BLACK: ((chess.B8, chess.KNIGHT), (chess.G8, chess.KNIGHT), (chess.C8, chess.BISHOP), (chess.F8, chess.BISHOP)),
+}
+
+# Development advice stops being useful once the opening is over.
+_OPENING_MOVES = 12
+
+
+@dataclass(frozen=True)
+class Motif:
+	kind: str                    # missed_capture / fork / hanging / pin / back_rank / undeveloped
+	color: chess.Color           # side the motif is about
+	square: chess.Square | None  # main square involved
+	piece: chess.PieceType | None
+	targets: tuple[chess.Square, ...] = ()
+
+
+# Sentence templates per motif and tier. Placeholders:
+# {side} / {other}  colour names ("White" / "Black")
+# {piece} {square}  the main piece and its square
+# {targets}         comma-separated list of attacked pieces
+_TEMPLATES: dict[str, dict[str, tuple[str, ...]]] = {
+	"missed_capture": {
+		"novice": (
+			"Look closely! {side} can capture {other}'s {piece} on {square} and win it for free.",
+			"Great chance here: {other}'s {piece} on {square} can be taken by {side}!",
+		),
+		"beginner": (
+			"{other}'s {piece} on {square} isn't safe — {side} can capture it and win material.",
+			"Before anything else, notice that {side} can win {other}'s {piece} on {square}.",
+		),
+		"intermediate": (
+			"{side} can win material: {other}'s {piece} on {square} is insufficiently defended.",
+			"Check the captures first — {other}'s {piece} on {square} drops to {side}.",
+		),
+		"advanced": (
+			"{other}'s {piece} on {square} is en prise; {side} wins material.",
+			"Material is there for {side} on {square}.",
+		),
+	},
+	"fork": {
+		"novice": (
+			"Ooh, a fork! {side}'s {piece} can jump to {square} and attack {targets} at once.",
+			"Fun idea: moving {side}'s {piece} to {square} would hit {targets} at the same time!",
+		),
+		"beginner": (
+			"{side} has a fork: the {piece} to {square} attacks {targets} together.",
+			"Look for the double attack — {side}'s {piece} on {square} hits {targets}.",
+		),
+		"intermediate": (
+			"{side}'s {piece} to {square} forks {targets}; one of them should fall.",
+			"There's a fork on {square} for {side}'s {piece}, hitting {targets}.",
+		),
+		"advanced": (
+			"{side} forks {targets} with the {piece} on {square}.",
+			"{side} has a double attack on {square} against {targets}.",
+		),
+	},
+	"hanging": {
+		"novice": (
+			"Careful! {side}'s {piece} on {square} can be captured. Can you keep it safe?",
+			"Uh-oh, {side}'s {piece} on {square} is in danger. Let's protect it or move it.",
+		),
+		"beginner": (
+			"{side}'s {piece} on {square} is hanging — defend it or move it to a safe square.",
+			"Watch out: {other} is attacking {side}'s {piece} on {square} and it isn't protected enough.",
+		),
+		"intermediate": (
+			"{side}'s {piece} on {square} is under-defended; deal with it before anything else.",
+			"The {piece} on {square} is loose for {side}, so {other} has a target.",
+		),
+		"advanced": (
+			"{side}'s {piece} on {square} is loose.",
+			"{other} is pressuring the under-defended {piece} on {square}.",
+		),
+	},
+	"pin": {
+		"novice": (
+			"{side}'s {piece} on {square} is stuck — moving it would leave the king in danger.",
+			"See how {side}'s {piece} on {square} can't move? It's protecting the king!",
+		),
+		"beginner": (
+			"{side}'s {piece} on {square} is pinned to the king, so it can't move freely.",
+			"Notice the pin: {side}'s {piece} on {square} is shielding the king.",
+		),
+		"intermediate": (
+			"{side}'s {piece} on {square} is pinned; {other} can add pressure to it.",
+			"The pin on {side}'s {piece} on {square} is worth exploiting or breaking.",
+		),
+		"advanced": (
+			"{side}'s {piece} on {square} is pinned — pile up on it or unpin.",
+			"Absolute pin on {square}; {other} should look to exploit it.",
+		),
+	},
+	"back_rank": {
+		"novice": (
+			"{side}'s king has no escape squares! Moving a pawn in front of it can give it room.",
+			"Keep an eye on {side}'s king — it is trapped on the back row by its own pawns.",
+		),
+		"beginner": (
+			"{side}'s back rank is weak: the king has no escape square if a rook or queen checks.",
+			"Watch {side}'s back rank — a little pawn move can give the king some air.",
+		),
+		"intermediate": (
+			"{side} has a back-rank weakness; {other}'s heavy pieces could exploit it.",
+			"{side}'s king lacks luft, so back-rank tactics are in the air.",
+		),
+		"advanced": (
+			"Back-rank weakness for {side}.",
+			"{side}'s king has no luft; back-rank motifs matter.",
+		),
+	},
+	"undeveloped": {
+		"novice": (
+			"{side} still has knights and bishops at home. Bring them out to join the fun!",
+			"Let's wake up {side}'s sleepy knights and bishops and move them toward the center.",
+		),
+		"beginner": (
+			"{side} should develop the knights and bishops before moving the same piece twice.",
+			"Getting {side}'s minor pieces out will help control the center and castle sooner.",
+		),
+		"intermediate": (
+			"{side} is behind in development; bring out the minor pieces before starting operations.",
+			"{side}'s minor pieces are still on the back rank — finish development first.",
+		),
+		"advanced": (
+			"{side} lags in development.",
+			"{side} should complete minor-piece development.",
+		),
+	},
+}
+
+
+def _color_name(color: chess.Color) -> str:
+	return "White" if color == chess.WHITE else "Black"
+
+
+def _is_defended(board: chess.Board, color: chess.Color, square: chess.Square) -> bool:
+	return bool(board.attackers_mask(color, square))
+
+
+def _cheapest_attacker(board: chess.Board, color: chess.Color, square: chess.Square) -> int | None:
+	cheapest = None
+	for sq in chess.scan_forward(board.attackers_mask(color, square)):
+		value = PIECE_VALUES[board.piece_type_at(sq)]
+		if cheapest is None or value < cheapest:
+			cheapest = value
+	return cheapest
+
+
+def _best_move(board: chess.Board, analysis: EngineAnalysis) -> chess.Move | None:
+	uci = analysis.best_move
+	if not uci and analysis.lines and analysis.lines[0].pv:
+		uci = analysis.lines[0].pv[0]
+	if not uci:
+		return None
+	try:
+		move = chess.Move.from_uci(uci)
+	except ValueError:
+		return None
+	return move if board.is_legal(move) else None
+
+
+def _missed_capture(board: chess.Board, move: chess.Move) -> Motif | None:
+	if not board.is_capture(move):
+		return None
+	mover = board.piece_type_at(move.from_square)
+	if board.is_en_passant(move):
+		captured = chess.PAWN
+	else:
+		captured = board.piece_type_at(move.to_square)
+	if captured is None or mover is None:
+		return None
+	defended = _is_defended(board, not board.turn, move.to_square)
+	if captured == chess.PAWN and defended:
+		return None
+	if defended and PIECE_VALUES[captured] < PIECE_VALUES[mover]:
+		return None
+	return Motif("missed_capture", board.turn, move.to_square, captured)
+
+
+def _fork(board: chess.Board, move: chess.Move) -> Motif | None:
+	mover = board.piece_type_at(move.from_square)
+	if mover is None or mover == chess.KING:
+		return None
+	color = board.turn
+	after = board.copy(stack=False)
+	after.push(move)
+	to_sq = move.to_square
+	mover_value = PIECE_VALUES[mover]
+	targets = []
+	for sq in chess.scan_forward(after.attacks_mask(to_sq) & after.occupied_co[not color]):
+		piece = after.piece_type_at(sq)
+		if piece == chess.PAWN:
+			continue
+		if PIECE_VALUES[piece] > mover_value or not _is_defended(after, not color, sq):
+			targets.append(sq)
+	if len(targets) < 2:
+		return None
+	# A fork is only worth pointing out if the forking piece survives.
+	cheapest = _cheapest_attacker(after, not color, to_sq)
+	if cheapest is not None and cheapest < mover_value and chess.KING not in (after.piece_type_at(t) for t in targets):
+		return None
+	return Motif("fork", color, to_sq, mover, tuple(targets))
+
+
+def _hanging(board: chess.Board, color: chess.Color) -> Motif | None:
+	pieces = board.occupied_co[color] & ~board.pawns & ~board.kings
+	best = None
+	best_value = 0
+	for sq in chess.scan_forward(pieces):
+		cheapest = _cheapest_attacker(board, not color, sq)
+		if cheapest is None:
+			continue
+		piece = board.piece_type_at(sq)
+		value = PIECE_VALUES[piece]
+		if _is_defended(board, color, sq) and cheapest >= value:
+			continue
+		if value > best_value:
+			best = Motif("hanging", color, sq, piece)
+			best_value = value
+	return best
+
+
+def _pin(board: chess.Board, color: chess.Color) -> Motif | None:
+	pieces = board.occupied_co[color] & ~board.pawns & ~board.kings
+	for sq in chess.scan_forward(pieces):
+		if board.is_pinned(color, sq):
+			return Motif("pin", color, sq, board.piece_type_at(sq))
+	return None
+
+
+def _back_rank(board: chess.Board, color: chess.Color) -> Motif | None:
+	king = board.king(color)
+	if king is None:
+		return None
+	back = 0 if color == chess.WHITE else 7
+	if chess.square_rank(king) != back:
+		return None
+	them = not color
+	if not (board.pieces_mask(chess.ROOK, them) | board.pieces_mask(chess.QUEEN, them)):
+		return None
+	# A rook or queen guarding the back rank covers the weakness.
+	heavy = board.pieces_mask(chess.ROOK, color) | board.pieces_mask(chess.QUEEN, color)
+	if heavy & chess.BB_RANKS[back]:
+		return None
+	forward = chess.BB_KING_ATTACKS[king] & ~chess.BB_RANKS[back]
+	for sq in chess.scan_forward(forward):
+		if not board.occupied_co[color] & chess.BB_SQUARES[sq] and not board.is_attacked_by(them, sq):
+			return None
+	return Motif("back_rank", color, king, chess.KING)
+
+
+def _undeveloped(board: chess.Board, color: chess.Color) -> Motif | None:
+	if board.fullmove_number > _OPENING_MOVES:
+		return None
+	home = [sq for sq, piece in _MINOR_HOME[color] if board.piece_type_at(sq) == piece and board.color_at(sq) == color]
+	if len(home) < 3:
+		return None
+	return Motif("undeveloped", color, None, None, tuple(home))
+
+
+def detect_motifs(board: chess.Board, analysis: EngineAnalysis) -> list[Motif]:
+	"""Return motifs for the position, most instructive first.
+
+	Motifs tied to the engine's best move (captures, forks) come first,
+	followed by static weaknesses of the side to move, then of the opponent.
+	"""
+	motifs: list[Motif] = []
+	us = board.turn
+	them = not us
+
+	move = _best_move(board, analysis)
+	if move is not None:
+		for found in (_missed_capture(board, move), _fork(board, move)):
+			if found is not None:
+				motifs.append(found)
+
+	for check in (_hanging, _pin, _back_rank):
+		for color in (us, them):
+			found = check(board, color)
+			if found is not None:
+				motifs.append(found)
+
+	found = _undeveloped(board, us)
+	if found is not None:
+		motifs.append(found)
+	return motifs
+
+
+def render_motif(motif: Motif, board: chess.Board, elo_bucket: int) -> str:
+	"""Render a motif as a sentence for the player's tier.
+
+	The template is picked from a hash of the position so the same position
+	always reads the same way while different positions vary.
+	"""
+	variants = _TEMPLATES[motif.kind][elo_tier(elo_bucket)]
+	choice = zlib.crc32(f"{board.board_fen()}|{motif.kind}".encode()) % len(variants)
+	names = [
+		f"the {chess.piece_name(board.piece_type_at(sq) or chess.PAWN)} on {chess.square_name(sq)}"
+		for sq in motif.targets
+	]
+	targets = ", ".join(names[:-1]) + " and " + names[-1] if len(names) > 1 else "".join(names)
+	return variants[choice].format(
+		side=_color_name(motif.color),
+		other=_color_name(not motif.color),
+		piece=chess.piece_name(motif.piece) if motif.piece else "piece",
+		square=chess.square_name(motif.square) if motif.square is not None else "",
+		targets=targets,
+	)
+
+
+def hint_from_motifs(analysis: EngineAnalysis, elo_bucket: int) -> str | None:
+	"""Return a rule-based hint for the analysed position, or None if no motif applies."""
+	try:
+		board = chess.Board(analysis.fen)
+	except (ValueError, TypeError):
+		return None
+	motifs = detect_motifs(board, analysis)
+	if not motifs:
+		return None
+	return render_motif(motifs[0], board, elo_bucket)
@@ -1,4 +1,9 @@
+import hashlib
+import json
+
+from theo_api.core import events, metrics
 from theo_api.services.llm.client import LLMClient
+from theo_api.services.llm.templates import post_game_messages, review_messages
 
 def post_game_summary(pgn_or_moves: str, elo_bucket: int) -> str:
 	"""Generate a short post-game summary and improvement tips.
@@ -7,11 +12,43 @@ def post_game_summary(pgn_or_moves: str, elo_bucket: int) -> str:
 	"""
 	client = LLMClient()
 	try:
-		system = (
-			"You are a friendly, encouraging chess coach. Summarize the game in 2-3 simple sentences and provide three practical tips tailored to the player's level. "
-			"Avoid technical engine scores; focus on what the player can practice next."
-		)
-		user = f"Player elo bucket: {elo_bucket}\nGame moves or PGN:\n{pgn_or_moves}"
-		return client.chat([{"role": "system", "content": system}, {"role": "user", "content": user}], temperature=0.6, max_tokens=400)
+		return client.chat(post_game_messages(pgn_or_moves, elo_bucket), temperature=0.6, max_tokens=400)
 	except Exception:
+		metrics.LLM_FALLBACKS.labels(kind="post_game").inc()
 		return "Post-game summary: Review opening principles, practice tactics, and analyze key mistakes. Tips: 1) Solve tactical puzzles; 2) Review missed tactics; 3) Practice endgames."
+
+
+FALLBACK_TAKEAWAYS = [
+	"Good effort completing this game — every game is a chance to learn!",
+	"Review your opening moves: developing pieces early and controlling the center is key.",
+	"Watch for undefended pieces — keeping everything protected avoids easy losses.",
+	"Think about your opponent's last move before making yours.",
+	"Practice spotting checks, captures, and threats each turn.",
+]
+
+
+def review_key(moves_uci: str) -> str:
+	"""Identify the move list a review was generated from."""
+	return hashlib.blake2b(moves_uci.strip().encode(), digest_size=16).hexdigest()
+
+
+def generate_takeaways(pgn: str, elo_bucket: int, player_color: str) -> list[str]:
+	"""Ask the LLM for 4-6 review takeaways, falling back to generic tips."""
+	try:
+		client = LLMClient()
+		raw = client.chat(review_messages(pgn, elo_bucket, player_color), temperature=0.7, max_tokens=500)
+		# Strip markdown code fences if present
+		cleaned = raw.strip()
+		if cleaned.startswith("```"):
+			cleaned = cleaned.split("\n", 1)[1] if "\n" in cleaned else cleaned[3:]
+			if cleaned.endswith("```"):
+				cleaned = cleaned[:-3]
+			cleaned = cleaned.strip()
+		takeaways = json.loads(cleaned)
+		if not isinstance(takeaways, list):
+			takeaways = [str(takeaways)]
+		return [str(t) for t in takeaways]
+	except Exception as e:
+		events.emit("llm_error", kind="review", error=str(e))
+		metrics.LLM_FALLBACKS.labels(kind="review").inc()
+		return list(FALLBACK_TAKEAWAYS)
@@ -0,0 +1,144 @@
+"""Prompt templates loaded from `prompts/*.md`.
+
+Each prompt is split into a static system prefix and a dynamic user suffix.
+The prefix depends only on the prompt kind and the player's Elo tier and is
+built once at load time, so it is byte-identical across requests and the
+provider's prompt caching can reuse it. Per-request data goes in the suffix,
+which is trimmed to a token budget.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from theo_api.config import settings
+from theo_api.core.elo import elo_tier
+from theo_api.services.stockfish.engine import EngineAnalysis
+
+PROMPTS_DIR = Path(__file__).parent / "prompts"
+
+TIERS = ("novice", "beginner", "intermediate", "advanced")
+KINDS = ("live_hint", "review", "post_game")
+
+# Rough chars-per-token ratio for English prompt text; good enough for budgeting.
+_CHARS_PER_TOKEN = 4
+_MAX_PV_MOVES = 8
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+
+def _parse_tone_rules(text: str) -> tuple[str, dict[str, str]]:
+    """Split tone_rules.md into the shared preamble and per-tier sections."""
+    general: list[str] = []
+    sections: dict[str, list[str]] = {}
+    current: list[str] = general
+    for line in text.splitlines():
+        if line.startswith("## "):
+            current = sections.setdefault(line[3:].strip().lower(), [])
+            continue
+        current.append(line)
+    tiers = {name: "\n".join(body).strip() for name, body in sections.items()}
+    missing = [tier for tier in TIERS if tier not in tiers]
+    if missing:
+        raise ValueError(f"tone_rules.md is missing tier sections: {', '.join(missing)}")
+    return "\n".join(general).strip(), tiers
+
+
+@dataclass(frozen=True)
+class PromptTemplates:
+    # (kind, tier) -> fully rendered static system prompt
+    system: dict[tuple[str, str], str]
+
+    def system_prompt(self, kind: str, elo_bucket: int) -> str:
+        return self.system[(kind, elo_tier(elo_bucket))]
+
+
+def load_templates(directory: Path = PROMPTS_DIR) -> PromptTemplates:
+    general, tones = _parse_tone_rules((directory / "tone_rules.md").read_text(encoding="utf-8"))
+    system: dict[tuple[str, str], str] = {}
+    for kind in KINDS:
+        base = (directory / f"{kind}.md").read_text(encoding="utf-8").strip()
+        for tier in TIERS:
+            system[(kind, tier)] = f"{base}\n\n{general}\n\nTone guidance: {tones[tier]}"
+    return PromptTemplates(system=system)
+
+
+@lru_cache(maxsize=1)
+def get_templates() -> PromptTemplates:
+    return load_templates()
+
+
+def _format_line(index: int, line, max_pv: int) -> str:
+    if line.eval_cp is not None:
+        ev = f"{line.eval_cp/100:.2f}"  # show in pawns
+    elif line.mate is not None:
+        ev = f"mate in {line.mate}"
+    else:
+        ev = "n/a"
+    pv = " ".join(line.pv[:max_pv]) if line.pv else ""
+    return f"Line {index}: eval={ev} depth={line.depth} pv={pv}"
+
+
+def live_hint_suffix(analysis: EngineAnalysis, elo_bucket: int, budget: int | None = None) -> str:
+    """Per-request part of the live hint prompt, trimmed to `budget` tokens.
+
+    Engine lines are dropped from the end, then principal variations are
+    shortened, until the suffix fits.
+    """
+    budget = budget or settings.llm_prompt_token_budget
+    head = f"Player elo bucket: {elo_bucket}\nPosition FEN: {analysis.fen}\nEngine's top lines:\n"
+    lines = list(analysis.lines[:3])
+    max_pv = _MAX_PV_MOVES
+    while True:
+        body = "\n".join(_format_line(i, l, max_pv) for i, l in enumerate(lines, start=1))
+        text = head + body
+        if estimate_tokens(text) <= budget:
+            return text
+        if len(lines) > 1:
+            lines.pop()
+        elif max_pv > 1:
+            max_pv //= 2
+        else:
+            return text
+
+
+def _trim_middle(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    keep = max(max_chars - 5, 0) // 2
+    return f"{text[:keep]} ... {text[len(text) - keep:]}"
+
+
+def review_suffix(pgn: str, elo_bucket: int, player_color: str, budget: int | None = None) -> str:
+    """Per-request part of the review prompt; long PGNs lose moves from the middle."""
+    budget = budget or settings.llm_review_token_budget
+    head = f"Player ELO bucket: {elo_bucket}\nPlayer color: {player_color}\nGame PGN:\n"
+    room = max(budget * _CHARS_PER_TOKEN - len(head), 0)
+    return head + _trim_middle(pgn.strip(), room)
+
+
+def post_game_suffix(pgn_or_moves: str, elo_bucket: int, budget: int | None = None) -> str:
+    budget = budget or settings.llm_review_token_budget
+    head = f"Player elo bucket: {elo_bucket}\nGame moves or PGN:\n"
+    room = max(budget * _CHARS_PER_TOKEN - len(head), 0)
+    return head + _trim_middle(pgn_or_moves.strip(), room)
+
+
+def _messages(kind: str, elo_bucket: int, suffix: str) -> list[dict]:
+    return [
+        {"role": "system", "content": get_templates().system_prompt(kind, elo_bucket)},
+        {"role": "user", "content": suffix},
+    ]
+
+
+def live_hint_messages(analysis: EngineAnalysis, elo_bucket: int) -> list[dict]:
+    return _messages("live_hint", elo_bucket, live_hint_suffix(analysis, elo_bucket))
+
+
+def review_messages(pgn: str, elo_bucket: int, player_color: str) -> list[dict]:
+    return _messages("review", elo_bucket, review_suffix(pgn, elo_bucket, player_color))
+
+
+def post_game_messages(pgn_or_moves: str, elo_bucket: int) -> list[dict]:
+    return _messages("post_game", elo_bucket, post_game_suffix(pgn_or_moves, elo_bucket))
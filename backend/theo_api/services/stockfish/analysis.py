@@ -1,27 +1,119 @@
 import random
-from theo_api.services.stockfish.engine import StockfishUCI, EngineAnalysis
+import time
+
+import chess
+
+from theo_api.services.stockfish.engine import EngineAnalysis
+from theo_api.services.stockfish.scheduler import current_request, engine_scheduler
 from theo_api.services.stockfish.difficulty import get_difficulty
+from theo_api.services.stockfish.weak import heuristic_move
+from theo_api.core import metrics
+from theo_api.core.admission import engine_admission
+from theo_api.utils.timing import record
 
 
-def analyze_position(fen: str, elo_bucket: int) -> EngineAnalysis:
-    diff = get_difficulty(elo_bucket)
-    engine = StockfishUCI()
-    try:
-        engine.set_option("Skill Level", diff.skill_level)
-        # Optional: make weaker play more human by reducing strength a bit
-        # engine.set_option("UCI_LimitStrength", "true")  # not always supported consistently
-        return engine.analyze(fen=fen, movetime_ms=diff.movetime_ms, depth=diff.depth, multipv=diff.multipv)
-    finally:
-        engine.close()
+def analyze_position(
+    fen: str,
+    elo_bucket: int,
+    degradable: bool = True,
+    history: tuple[str, list[str]] | None = None,
+) -> EngineAnalysis:
+    """Analyse `fen` at the bucket's difficulty on the engine scheduler.
+
+    The job's priority class and client come from the surrounding
+    `engine_request` context. Raises EngineOverloaded when the engine is
+    saturated; `degradable` work may instead run with a cheaper search.
+    `history` (root FEN and moves leading to `fen`) lets the engine see
+    repetitions.
+    """
+    priority, client = current_request()
+    with engine_admission.admit(get_difficulty(elo_bucket), degradable=degradable) as ticket:
+        submitted = time.perf_counter()
+        started: list[float] = []
+
+        def on_start():
+            started.append(time.perf_counter())
+            engine_admission.mark_started(ticket)
+
+        analysis = None
+        try:
+            analysis = engine_scheduler.analyze(
+                fen, ticket.difficulty, priority=priority, client=client, on_start=on_start, history=history
+            )
+            return analysis
+        finally:
+            # Queue wait and engine checkout vs. the UCI search itself
+            done = time.perf_counter()
+            begin = started[0] if started else done
+            record("engine_checkout", (begin - submitted) * 1000)
+            record("uci_search", (done - begin) * 1000)
+            if analysis is not None:
+                _record_search(elo_bucket, analysis, done - begin)
+
 
+def _record_search(elo_bucket: int, analysis: EngineAnalysis, seconds: float) -> None:
+    metrics.ENGINE_SEARCH.labels(elo_bucket=elo_bucket).observe(seconds)
+    stats = analysis.stats
+    if stats is None:
+        return
+    metrics.ENGINE_DEPTH.labels(elo_bucket=elo_bucket).observe(stats.depth)
+    if stats.seldepth is not None:
+        metrics.ENGINE_SELDEPTH.labels(elo_bucket=elo_bucket).observe(stats.seldepth)
+    if stats.nps is not None:
+        metrics.ENGINE_NPS.labels(elo_bucket=elo_bucket).observe(stats.nps)
+    if stats.hashfull is not None:
+        metrics.ENGINE_HASHFULL.labels(elo_bucket=elo_bucket).observe(stats.hashfull)
+    if stats.nodes:
+        metrics.ENGINE_NODES.labels(elo_bucket=elo_bucket).inc(stats.nodes)
+    if stats.tbhits:
+        metrics.ENGINE_TBHITS.labels(elo_bucket=elo_bucket).inc(stats.tbhits)
+    if stats.bounded_lines:
+        metrics.ENGINE_BOUNDED.labels(elo_bucket=elo_bucket).inc(stats.bounded_lines)
 
-def choose_engine_reply(fen: str, elo_bucket: int) -> tuple[str | None, EngineAnalysis]:
+
+def search_stats_by_bucket() -> dict[str, dict]:
+    """Per-Elo-bucket search statistics for capacity planning.
+
+    A low NPS points at CPU starvation, a hashfull near 1000 at a hash table
+    that is too small, and a high bounded-line share at searches cut short.
+    """
+    def avg(h) -> float | None:
+        return round(h.sum / h.count, 1) if h is not None and h.count else None
+
+    searches = metrics.ENGINE_SEARCH.children()
+    depth = metrics.ENGINE_DEPTH.children()
+    seldepth = metrics.ENGINE_SELDEPTH.children()
+    nps = metrics.ENGINE_NPS.children()
+    hashfull = metrics.ENGINE_HASHFULL.children()
+    nodes = metrics.ENGINE_NODES.children()
+    bounded = metrics.ENGINE_BOUNDED.children()
+
+    out = {}
+    for key, h in sorted(searches.items(), key=lambda kv: int(kv[0][0])):
+        n_nodes = nodes.get(key)
+        n_bounded = bounded.get(key)
+        out[key[0]] = {
+            "searches": h.count,
+            "avg_search_ms": round(h.sum / h.count * 1000, 1) if h.count else None,
+            "avg_depth": avg(depth.get(key)),
+            "avg_seldepth": avg(seldepth.get(key)),
+            "avg_nps": avg(nps.get(key)),
+            "p95_hashfull": hashfull[key].quantile(0.95) if key in hashfull else None,
+            "nodes": int(n_nodes.value) if n_nodes is not None else 0,
+            "bounded_lines": int(n_bounded.value) if n_bounded is not None else 0,
+        }
+    return out
+
+
+def choose_engine_reply(
+    fen: str, elo_bucket: int, history: tuple[str, list[str]] | None = None
+) -> tuple[str | None, EngineAnalysis]:
     """
     Returns (reply_move_uci, analysis).
     For low Elo, optionally choose from top N lines.
     """
     diff = get_difficulty(elo_bucket)
-    analysis = analyze_position(fen, elo_bucket)
+    analysis = analyze_position(fen, elo_bucket, history=history)
 
     reply = analysis.best_move
     if analysis.lines and diff.choose_top_n > 1:
@@ -40,4 +132,10 @@ def choose_engine_reply(fen: str, elo_bucket: int) -> tuple[str | None, EngineAn
             weights = [w / s for w in weights]
             reply = random.choices(candidates, weights=weights, k=1)[0]
 
+    if diff.blunder_rate and random.random() < diff.blunder_rate:
+        # Weakest buckets: a beginner's move instead of the engine's
+        move = heuristic_move(chess.Board(fen))
+        if move is not None:
+            reply = move.uci()
+
     return reply, analysis
@@ -1,35 +1,201 @@
-from dataclasses import dataclass
+"""Engine difficulty per Elo bucket, loaded from JSON profiles.
+
+Each bucket's search settings live in `engine/stockfish/configs/elo_<bucket>.json`
+(or `difficulty_profiles_dir`). A profile has the fields of `Difficulty`:
+
+    {"skill_level": 10, "movetime_ms": 150, "depth": 10, "nodes": null,
+     "multipv": 3, "choose_top_n": 2, "threads": 1, "hash_mb": 16}
+
+`depth`, `nodes` and `movetime_ms` are combined limits: the search stops at
+whichever is reached first. A node budget costs the same CPU however
+loaded the machine is, and movetime caps a search starved of CPU. Every
+search therefore has a bounded cost.
+
+Profiles are validated when loaded. The files are checked for changes at
+most every `difficulty_reload_s` seconds, and changed files are reloaded
+without a restart. An invalid or missing file is reported (a
+`difficulty_profile_error` event) and the previous profile stays in use; a
+bucket that never had a valid profile raises ProfileError. There are no
+built-in defaults: the repository's files are the defaults. Check them with
+
+    cd backend && python -m theo_api.services.stockfish.difficulty
+"""
+import json
+import sys
+import threading
+import time
+from dataclasses import MISSING, asdict, dataclass, fields, replace
+from pathlib import Path
+
+from theo_api.config import settings
+from theo_api.core import events
 
 # Stockfish UCI options vary by version, but Skill Level is stable (0-20).
 # We'll mostly tune via:
 # - Skill Level
-# - (Depth or MoveTime)
+# - Depth, MoveTime and node budgets (combined; the first limit reached ends the search)
 # - Small randomness by sometimes choosing #2 line for low Elo
+# - Heuristic "beginner" moves at a set rate for the weakest buckets (weak.py)
 
 @dataclass(frozen=True)
 class Difficulty:
-    skill_level: int          # 0..20
-    movetime_ms: int          # time per move (ms)
-    depth: int | None         # optional
-    multipv: int              # how many lines to analyze
-    choose_top_n: int         # pick from top N moves (adds human-ish play)
+    skill_level: int            # 0..20
+    movetime_ms: int            # time per move (ms); caps every search
+    depth: int | None           # optional
+    multipv: int                # how many lines to analyze
+    choose_top_n: int           # pick from top N moves (adds human-ish play)
+    nodes: int | None = None    # optional search node budget
+    blunder_rate: float = 0.0   # share of replies taken from weak.heuristic_move
+    threads: int = 1            # Stockfish Threads
+    hash_mb: int = 16           # Stockfish Hash; keep equal across profiles, resizing clears it
+
+
+BUCKETS = (400, 800, 1200, 1600, 2000)
+
+# field: (types, minimum, maximum, may be null)
+_LIMITS = {
+    "skill_level": (int, 0, 20, False),
+    "movetime_ms": (int, 1, 60_000, False),
+    "depth": (int, 1, 99, True),
+    "multipv": (int, 1, 10, False),
+    "choose_top_n": (int, 1, 10, False),
+    "nodes": (int, 1, 10**9, True),
+    "blunder_rate": ((int, float), 0, 1, False),
+    "threads": (int, 1, 64, False),
+    "hash_mb": (int, 1, 65_536, False),
+}
+_REQUIRED = {f.name for f in fields(Difficulty) if f.default is MISSING}
+
+
+class ProfileError(ValueError):
+    pass
 
 
 def clamp_bucket(elo: int) -> int:
     # Normalize to buckets you support
-    buckets = [400, 800, 1200, 1600, 2000]
-    return min(buckets, key=lambda b: abs(b - elo))
+    return min(BUCKETS, key=lambda b: abs(b - elo))
+
+
+def profiles_dir() -> Path:
+    if settings.difficulty_profiles_dir:
+        return Path(settings.difficulty_profiles_dir)
+    # Repository layout: backend/theo_api/services/stockfish -> engine/stockfish/configs
+    return Path(__file__).resolve().parents[4] / "engine" / "stockfish" / "configs"
+
+
+def parse_profile(data) -> Difficulty:
+    """Validate a decoded profile; raises ProfileError describing the first problem."""
+    if not isinstance(data, dict):
+        raise ProfileError("profile must be a JSON object")
+    unknown = sorted(set(data) - set(_LIMITS))
+    if unknown:
+        raise ProfileError(f"unknown fields: {', '.join(unknown)}")
+    missing = sorted(_REQUIRED - set(data))
+    if missing:
+        raise ProfileError(f"missing fields: {', '.join(missing)}")
+    for name, value in data.items():
+        types, low, high, nullable = _LIMITS[name]
+        if value is None and nullable:
+            continue
+        if isinstance(value, bool) or not isinstance(value, types) or not low <= value <= high:
+            raise ProfileError(f"{name} must be {'null or ' if nullable else ''}a number in [{low}, {high}], got {value!r}")
+    diff = Difficulty(**data)
+    if diff.choose_top_n > diff.multipv:
+        raise ProfileError("choose_top_n cannot exceed multipv")
+    return diff
+
+
+def load_profile(path: Path) -> Difficulty:
+    try:
+        data = json.loads(path.read_text())
+    except ValueError as e:
+        raise ProfileError(f"invalid JSON: {e}")
+    return parse_profile(data)
+
+
+class DifficultyProfiles:
+    """Profiles by bucket, reloaded when their files change."""
+
+    def __init__(self, directory: Path | None = None, reload_s: float | None = None):
+        self.directory = directory
+        self.reload_s = settings.difficulty_reload_s if reload_s is None else reload_s
+        self._profiles: dict[int, Difficulty] = {}
+        self._mtimes: dict[int, int | None] = {}
+        self._checked: float | None = None
+        self._lock = threading.Lock()
+
+    def path(self, bucket: int) -> Path:
+        return (self.directory or profiles_dir()) / f"elo_{bucket}.json"
+
+    def get(self, bucket: int) -> Difficulty:
+        now = time.monotonic()
+        if self._checked is None or now - self._checked >= self.reload_s:
+            self.refresh()
+        profile = self._profiles.get(bucket)
+        if profile is None:
+            raise ProfileError(f"no valid profile for Elo bucket {bucket} ({self.path(bucket)})")
+        return profile
+
+    def refresh(self) -> list[str]:
+        """Reload changed files; returns the errors of the files that were rejected."""
+        errors = []
+        with self._lock:
+            self._checked = time.monotonic()
+            for bucket in BUCKETS:
+                path = self.path(bucket)
+                try:
+                    mtime = path.stat().st_mtime_ns
+                except OSError:
+                    mtime = None
+                if bucket in self._mtimes and self._mtimes[bucket] == mtime:
+                    continue
+                self._mtimes[bucket] = mtime
+                try:
+                    if mtime is None:
+                        raise ProfileError("file not found")
+                    self._profiles[bucket] = load_profile(path)
+                except (OSError, ProfileError) as e:
+                    errors.append(f"{path.name}: {e}")
+                    events.emit("difficulty_profile_error", bucket=bucket, path=str(path), error=str(e))
+        return errors
+
+    def check(self) -> None:
+        """Load every profile now; raises ProfileError if any file is missing or invalid (readiness check)."""
+        self._mtimes.clear()
+        errors = self.refresh()
+        if errors:
+            raise ProfileError("; ".join(errors))
+
+
+profiles = DifficultyProfiles()
 
 
 def get_difficulty(elo_bucket: int) -> Difficulty:
-    b = clamp_bucket(elo_bucket)
-
-    if b <= 400:
-        return Difficulty(skill_level=2, movetime_ms=50, depth=6, multipv=3, choose_top_n=3)
-    if b <= 800:
-        return Difficulty(skill_level=6, movetime_ms=100, depth=8, multipv=3, choose_top_n=2)
-    if b <= 1200:
-        return Difficulty(skill_level=10, movetime_ms=150, depth=10, multipv=3, choose_top_n=2)
-    if b <= 1600:
-        return Difficulty(skill_level=14, movetime_ms=250, depth=12, multipv=3, choose_top_n=1)
-    return Difficulty(skill_level=18, movetime_ms=400, depth=14, multipv=3, choose_top_n=1)
+    return profiles.get(clamp_bucket(elo_bucket))
+
+
+def search_cost_ms(diff: Difficulty) -> int:
+    """Nominal engine CPU budget of one search (time cap x threads), used to weight engine work."""
+    return diff.movetime_ms * diff.threads
+
+
+def degrade(diff: Difficulty) -> Difficulty:
+    """A cheaper search for the same bucket, used when the engine is saturated."""
+    return replace(
+        diff,
+        movetime_ms=max(30, diff.movetime_ms // 2),
+        depth=max(4, diff.depth - 4) if diff.depth is not None else None,
+        nodes=max(1000, diff.nodes // 2) if diff.nodes is not None else None,
+    )
+
+
+if __name__ == "__main__":
+    failed = False
+    for bucket in BUCKETS:
+        path = profiles.path(bucket)
+        try:
+            print(f"{bucket}: {asdict(load_profile(path))}")
+        except (OSError, ProfileError) as e:
+            failed = True
+            print(f"{bucket}: {path.name}: {e}", file=sys.stderr)
+    sys.exit(1 if failed else 0)
@@ -3,6 +3,7 @@ import threading
 import queue
 import time
 from dataclasses import dataclass
+from typing import Callable
 from theo_api.config import settings
 
 @dataclass
@@ -11,17 +12,38 @@ class UciLine:
     eval_cp: int | None     # centipawns from White POV
     mate: int | None        # mate in N (positive means White mates)
     depth: int
+    # Search statistics reported with the line (None when the engine omits them)
+    seldepth: int | None = None
+    nodes: int | None = None
+    nps: int | None = None
+    hashfull: int | None = None     # permille of the hash table in use
+    time_ms: int | None = None
+    tbhits: int | None = None
+    bound: str | None = None        # "lower"/"upper" when the score is a fail-high/low bound
+
+@dataclass
+class SearchStats:
+    """Whole-search statistics, taken from the last info line of the search."""
+    depth: int
+    seldepth: int | None = None
+    nodes: int | None = None
+    nps: int | None = None
+    hashfull: int | None = None
+    time_ms: int | None = None
+    tbhits: int | None = None
+    bounded_lines: int = 0          # final lines whose score is only a bound
 
 @dataclass
 class EngineAnalysis:
     fen: str
     lines: list[UciLine]    # sorted best-first
     best_move: str | None
+    stats: SearchStats | None = None
 
 class StockfishUCI:
     """
-    Simple, reliable UCI wrapper.
-    One instance per request is easiest (and safe). For speed later, pool it.
+    Simple, reliable UCI wrapper around one Stockfish process.
+    Not thread-safe; the engine scheduler gives each worker its own instance.
     """
     def __init__(self, path: str | None = None):
         self.path = path or settings.stockfish_path
@@ -34,7 +56,11 @@ class StockfishUCI:
             bufsize=1,
             universal_newlines=True,
         )
-        self.q: queue.Queue[str] = queue.Queue()
+        # Bounded: the reader drops superseded chatter, and blocks (leaving
+        # output in the pipe) rather than buffering without limit
+        self.q: queue.Queue[str] = queue.Queue(maxsize=256)
+        # Options last sent; unchanged values are not resent (a Hash change reallocates the table)
+        self._options: dict[str, str | int] = {}
         self._reader_thread = threading.Thread(target=self._reader, daemon=True)
         self._reader_thread.start()
 
@@ -56,7 +82,10 @@ class StockfishUCI:
     def _reader(self):
         assert self.proc.stdout is not None
         for line in self.proc.stdout:
-            self.q.put(line.strip())
+            line = line.strip()
+            if line.startswith("info ") and not _is_pv_info(line):
+                continue
+            self.q.put(line)
 
     def _send(self, cmd: str):
         assert self.proc.stdin is not None
@@ -74,77 +103,181 @@ class StockfishUCI:
                 continue
         raise TimeoutError(f"Timed out waiting for {token}")
 
+    def stop(self):
+        """Ask a running search to finish now; `analyze` then returns what it has."""
+        self._send("stop")
+
     def set_option(self, name: str, value: str | int):
+        if self._options.get(name) == value:
+            return
         self._send(f"setoption name {name} value {value}")
+        self._options[name] = value
 
-    def analyze(self, *, fen: str, movetime_ms: int, depth: int | None, multipv: int) -> EngineAnalysis:
+    def analyze(
+        self,
+        *,
+        fen: str,
+        movetime_ms: int,
+        depth: int | None,
+        multipv: int,
+        history: tuple[str, list[str]] | None = None,
+        nodes: int | None = None,
+        on_go: Callable[[], None] | None = None,
+    ) -> EngineAnalysis:
+        """Search `fen` until the first of `nodes`, `depth` and `movetime_ms` is
+        reached (None or 0 leaves a limit out). With `history` (root FEN, moves
+        leading to `fen`) the engine sees the game so far and can score
+        repetitions. `on_go` is called once the search has been started, from
+        which point `stop` ends it early."""
         # reset hash between games could be set later; for now keep simple
         self.set_option("MultiPV", multipv)
 
-        self._send(f"position fen {fen}")
-        if depth is not None:
-            self._send(f"go depth {depth}")
+        if history and history[1]:
+            self._send(f"position fen {history[0]} moves {' '.join(history[1])}")
         else:
-            self._send(f"go movetime {movetime_ms}")
+            self._send(f"position fen {fen}")
+        limits = []
+        if nodes is not None:
+            limits.append(f"nodes {nodes}")
+        if depth is not None:
+            limits.append(f"depth {depth}")
+        if movetime_ms:
+            limits.append(f"movetime {movetime_ms}")
+        self._send("go " + " ".join(limits) if limits else "go depth 1")
+        if on_go is not None:
+            on_go()
 
-        lines: dict[int, UciLine] = {}
+        # Latest raw PV line per multipv slot; earlier depths are superseded
+        # and never parsed.
+        raw: dict[int, str] = {}
+        last_slot: int | None = None
         best_move: str | None = None
 
         while True:
-            line = self.q.get()
+            try:
+                line = self.q.get(timeout=0.5)
+            except queue.Empty:
+                if self.proc.poll() is not None:
+                    raise RuntimeError("Stockfish exited during search")
+                continue
             if line.startswith("info "):
-                parsed = _parse_info(line)
-                if parsed is not None:
-                    mpv, uciline = parsed
-                    lines[mpv] = uciline
+                last_slot = _multipv_of(line)
+                raw[last_slot] = line
             elif line.startswith("bestmove"):
                 parts = line.split()
                 best_move = parts[1] if len(parts) > 1 else None
                 break
 
+        lines: dict[int, UciLine] = {}
+        for slot, info in raw.items():
+            parsed = _parse_info(info)
+            if parsed is not None:
+                lines[slot] = parsed[1]
+        last = lines.get(last_slot) if last_slot is not None else None
+
         ordered = [lines[k] for k in sorted(lines.keys()) if k in lines]
-        return EngineAnalysis(fen=fen, lines=ordered, best_move=best_move)
+        return EngineAnalysis(fen=fen, lines=ordered, best_move=best_move, stats=_search_stats(ordered, last))
 
 
-def _parse_info(line: str):
-    # Parses:
-    # info depth 12 multipv 1 score cp 23 pv e2e4 e7e5 ...
-    # info depth 18 multipv 2 score mate -3 pv ...
-    toks = line.split()
-    if "pv" not in toks or "score" not in toks:
+def _search_stats(lines: list[UciLine], last: UciLine | None) -> SearchStats | None:
+    # nodes/nps/time/hashfull are search-wide counters, so the most recent line has them
+    if last is None:
         return None
+    return SearchStats(
+        depth=max(l.depth for l in lines),
+        seldepth=max((l.seldepth for l in lines if l.seldepth is not None), default=None),
+        nodes=last.nodes,
+        nps=last.nps,
+        hashfull=last.hashfull,
+        time_ms=last.time_ms,
+        tbhits=last.tbhits,
+        bounded_lines=sum(1 for l in lines if l.bound is not None),
+    )
+
+
+# Integer fields of an info line, mapped to UciLine attribute names
+_INT_FIELDS = {
+    "depth": "depth",
+    "seldepth": "seldepth",
+    "multipv": "multipv",
+    "nodes": "nodes",
+    "nps": "nps",
+    "hashfull": "hashfull",
+    "time": "time_ms",
+    "tbhits": "tbhits",
+}
 
-    def get_int_after(key: str) -> int | None:
-        if key in toks:
-            i = toks.index(key)
-            if i + 1 < len(toks):
-                try:
-                    return int(toks[i + 1])
-                except ValueError:
-                    return None
-        return None
 
-    depth = get_int_after("depth") or 0
-    multipv = get_int_after("multipv") or 1
+def _is_pv_info(line: str) -> bool:
+    # Only info lines carrying a scored PV matter; currmove, hashfull-only and
+    # "info string" lines are dropped before they reach the queue.
+    return line.startswith("info ") and " pv " in line and " score " in line
 
-    # score
+
+def _multipv_of(line: str) -> int:
+    """The multipv slot of a PV info line, without tokenizing the whole line."""
+    i = line.find(" multipv ")
+    if i < 0:
+        return 1
+    i += 9
+    j = line.find(" ", i)
+    try:
+        return int(line[i:j] if j >= 0 else line[i:])
+    except ValueError:
+        return 1
+
+
+def _parse_info(line: str):
+    # Parses, in one pass over the tokens:
+    # info depth 12 seldepth 18 multipv 1 score cp 23 nodes 1200 nps 900000 time 2 pv e2e4 e7e5 ...
+    # info depth 18 multipv 2 score mate -3 lowerbound pv ...
+    if " pv " not in line:
+        return None
+    toks = line.split()
+    n = len(toks)
+    fields: dict[str, int] = {}
     eval_cp = None
     mate = None
-    if "score" in toks:
-        si = toks.index("score")
-        if si + 2 < len(toks):
-            stype = toks[si + 1]
-            sval = toks[si + 2]
+    bound = None
+    scored = False
+    pv_moves: list[str] | None = None
+
+    i = 1
+    while i < n:
+        tok = toks[i]
+        if tok == "pv":
+            pv_moves = toks[i + 1 :]
+            break
+        if tok == "score":
+            scored = True
+            if i + 2 < n:
+                try:
+                    value = int(toks[i + 2])
+                except ValueError:
+                    value = None
+                if toks[i + 1] == "cp":
+                    eval_cp = value
+                elif toks[i + 1] == "mate":
+                    mate = value
+            i += 3
+            if i < n and toks[i] in ("lowerbound", "upperbound"):
+                bound = toks[i][:5]
+                i += 1
+            continue
+        if tok == "string":
+            return None
+        name = _INT_FIELDS.get(tok)
+        if name is not None and i + 1 < n:
             try:
-                n = int(sval)
-                if stype == "cp":
-                    eval_cp = n
-                elif stype == "mate":
-                    mate = n
+                fields[name] = int(toks[i + 1])
             except ValueError:
                 pass
+            i += 2
+            continue
+        i += 1
 
-    pvi = toks.index("pv")
-    pv_moves = toks[pvi + 1 :]
-
-    return multipv, UciLine(pv=pv_moves, eval_cp=eval_cp, mate=mate, depth=depth)
+    if pv_moves is None or not scored:
+        return None
+    multipv = fields.pop("multipv", None) or 1
+    depth = fields.pop("depth", None) or 0
+    return multipv, UciLine(pv=pv_moves, eval_cp=eval_cp, mate=mate, depth=depth, bound=bound, **fields)
@@ -0,0 +1,401 @@
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Callable
+
+from theo_api.config import settings
+from theo_api.core import metrics
+from theo_api.core.admission import EngineOverloaded, engine_admission
+from theo_api.services.stockfish.difficulty import Difficulty
+from theo_api.services.stockfish.engine import EngineAnalysis, StockfishUCI
+from theo_api.utils.timing import span
+
+
+class Priority(IntEnum):
+    """Engine work classes, most urgent first."""
+    MOVE = 0        # engine reply in an active game
+    HINT = 1        # live hint
+    EXPLAIN = 2     # explain-move
+    BACKGROUND = 3  # reviews, pondering, batch analysis
+
+
+# Priority and client of the engine work issued by the current request. Endpoints
+# set these with `engine_request`; analysis functions read them, so call
+# signatures stay the same.
+_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar("engine_priority", default=Priority.MOVE)
+_client: contextvars.ContextVar[str] = contextvars.ContextVar("engine_client", default="anon")
+
+
+@contextmanager
+def engine_request(priority: Priority, client: str | None = None):
+    p = _priority.set(priority)
+    c = _client.set(client or "anon")
+    try:
+        yield
+    finally:
+        _priority.reset(p)
+        _client.reset(c)
+
+
+def current_request() -> tuple[Priority, str]:
+    return _priority.get(), _client.get()
+
+
+# A background search is preempted at most this many times, then runs to completion.
+MAX_PREEMPTIONS = 3
+
+
+@dataclass
+class _Job:
+    fen: str
+    difficulty: Difficulty
+    priority: Priority
+    client: str
+    on_start: Callable[[], None] | None
+    history: tuple[str, list[str]] | None = None
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    started: bool = False
+    preempted: bool = False
+    preemptions: int = 0
+    abandoned: bool = False  # the caller stopped waiting; never requeue it
+
+
+@dataclass
+class _Slot:
+    job: _Job | None = None
+    engine: StockfishUCI | None = None
+    searching: bool = False  # `go` has been sent for job and its bestmove not yet read
+
+
+@dataclass
+class _ClassStats:
+    waited: int = 0
+    wait_total_ms: float = 0.0
+    wait_max_ms: float = 0.0
+    preempted: int = 0
+
+
+class EngineScheduler:
+    """Priority scheduler in front of a pool of Stockfish workers.
+
+    Jobs are served strictly by Priority class. Within a class, clients are
+    served round-robin so one client's batch cannot starve another's request.
+    When every worker is busy, an urgent job (MOVE or HINT) stops a running
+    BACKGROUND search with UCI `stop`; that job is requeued at the head of its
+    client's queue. Only a slot whose search is under way is stopped: a `stop`
+    sent before `go` would be lost. A background job that was claimed but had
+    not started searching is preempted as soon as its `go` is sent. A job
+    whose caller times out in `analyze` is dropped: cancelled if still
+    queued, stopped if searching. Each
+    worker keeps its Stockfish process between jobs and respawns it after a
+    failure.
+
+    Engines from `engine_factory` must implement `set_option` and `analyze`
+    with the keyword arguments of `StockfishUCI.analyze`; the workers always
+    pass all of them (nodes, history and on_go included).
+    """
+
+    def __init__(self, workers: int, engine_factory: Callable[[], StockfishUCI] = StockfishUCI):
+        self.workers = workers
+        self.engine_factory = engine_factory
+        self._queues: dict[Priority, OrderedDict[str, deque[_Job]]] = {p: OrderedDict() for p in Priority}
+        self._slots = [_Slot() for _ in range(workers)]
+        self._idle = workers
+        self._cond = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._closed = False
+        self.stats = {p: _ClassStats() for p in Priority}
+        self.spawned = 0
+        self.respawns = 0
+        self.live = 0
+
+    # ----- public API -----
+
+    def start(self, warm: bool = False) -> None:
+        """Start the worker threads; with `warm`, spawn every engine before returning.
+
+        Engines are spawned in parallel, one per worker. If a warm spawn fails
+        the first error is raised once all workers have tried; the workers keep
+        running and spawn lazily on their next job.
+        """
+        with self._cond:
+            if self._threads:
+                return
+            self._closed = False
+            self._warm_errors: list[Exception] = []
+            ready = threading.Barrier(self.workers + 1) if warm else None
+            for i, slot in enumerate(self._slots):
+                t = threading.Thread(target=self._worker, args=(slot, ready), name=f"engine-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        if ready is not None:
+            ready.wait()
+            if self._warm_errors:
+                raise self._warm_errors[0]
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            threads, self._threads = self._threads, []
+        for t in threads:
+            t.join(timeout=5)
+
+    def submit(
+        self,
+        fen: str,
+        difficulty: Difficulty,
+        priority: Priority = Priority.MOVE,
+        client: str = "anon",
+        on_start: Callable[[], None] | None = None,
+        history: tuple[str, list[str]] | None = None,
+    ) -> Future:
+        return self._enqueue(_Job(fen=fen, difficulty=difficulty, priority=priority, client=client, on_start=on_start, history=history)).future
+
+    def analyze(
+        self,
+        fen: str,
+        difficulty: Difficulty,
+        priority: Priority = Priority.MOVE,
+        client: str = "anon",
+        on_start: Callable[[], None] | None = None,
+        timeout: float | None = 30.0,
+        history: tuple[str, list[str]] | None = None,
+    ) -> EngineAnalysis:
+        """Run a search and wait for it; raises EngineOverloaded if it doesn't finish within `timeout`."""
+        job = self._enqueue(_Job(fen=fen, difficulty=difficulty, priority=priority, client=client, on_start=on_start, history=history))
+        try:
+            return job.future.result(timeout=timeout)
+        except TimeoutError:
+            # Nobody will read the result: free the worker for live requests
+            self._abandon(job)
+            raise EngineOverloaded(engine_admission.retry_after())
+
+    def snapshot(self) -> dict:
+        """Queue lengths and wait times per class, for metrics and admin views."""
+        with self._cond:
+            classes = {}
+            for p in Priority:
+                s = self.stats[p]
+                classes[p.name.lower()] = {
+                    "queued": sum(len(q) for q in self._queues[p].values()),
+                    "waited": s.waited,
+                    "wait_avg_ms": round(s.wait_total_ms / s.waited, 2) if s.waited else 0.0,
+                    "wait_max_ms": round(s.wait_max_ms, 2),
+                    "preempted": s.preempted,
+                }
+            return {
+                "workers": self.workers,
+                "busy": self.workers - self._idle,
+                "engines_live": self.live,
+                "engines_spawned": self.spawned,
+                "engine_respawns": self.respawns,
+                "classes": classes,
+            }
+
+    def _enqueue(self, job: _Job) -> _Job:
+        if not self._threads:
+            self.start()
+        with self._cond:
+            self._queues[job.priority].setdefault(job.client, deque()).append(job)
+            if self._idle == 0 and job.priority <= Priority.HINT:
+                self._preempt_background()
+            self._cond.notify()
+        return job
+
+    def _abandon(self, job: _Job) -> None:
+        with self._cond:
+            job.abandoned = True
+            if job.future.cancel():
+                return  # still queued; the worker skips it
+            clients = self._queues[job.priority]
+            jobs = clients.get(job.client)
+            if jobs is not None and any(j is job for j in jobs):
+                # Requeued after a preemption
+                remaining = deque(j for j in jobs if j is not job)
+                if remaining:
+                    clients[job.client] = remaining
+                else:
+                    del clients[job.client]
+                return
+            for slot in self._slots:
+                if slot.job is job and slot.searching and slot.engine is not None:
+                    try:
+                        slot.engine.stop()
+                    except Exception:
+                        pass
+
+    # ----- internals (call with self._cond held) -----
+
+    def _pop(self) -> _Job | None:
+        for p in Priority:
+            clients = self._queues[p]
+            if not clients:
+                continue
+            client, jobs = next(iter(clients.items()))
+            job = jobs.popleft()
+            if jobs:
+                clients.move_to_end(client)
+            else:
+                del clients[client]
+            return job
+        return None
+
+    def _requeue_front(self, job: _Job) -> None:
+        jobs = self._queues[job.priority].setdefault(job.client, deque())
+        jobs.appendleft(job)
+        self._queues[job.priority].move_to_end(job.client, last=False)
+        job.enqueued_at = time.perf_counter()
+
+    def _urgent_waiting(self) -> bool:
+        return any(self._queues[p] for p in Priority if p <= Priority.HINT)
+
+    def _preempt_background(self) -> None:
+        for slot in self._slots:
+            job = slot.job
+            if (
+                job is not None
+                and slot.searching
+                and slot.engine is not None
+                and job.priority == Priority.BACKGROUND
+                and not job.preempted
+                and job.preemptions < MAX_PREEMPTIONS
+            ):
+                job.preempted = True
+                self.stats[job.priority].preempted += 1
+                try:
+                    slot.engine.stop()
+                except Exception:
+                    pass
+                return
+
+    # ----- worker -----
+
+    def _spawn(self) -> StockfishUCI:
+        # Worker threads run outside any request, so this lands under route "-";
+        # requests see the spawn as part of their "engine_checkout" stage.
+        with span("engine_spawn"):
+            engine = self.engine_factory()
+        with self._cond:
+            self.spawned += 1
+            self.live += 1
+        return engine
+
+    def _retire(self, engine: StockfishUCI) -> None:
+        engine.close()
+        with self._cond:
+            self.live -= 1
+
+    def _worker(self, slot: _Slot, ready: threading.Barrier | None) -> None:
+        engine: StockfishUCI | None = None
+        if ready is not None:
+            try:
+                engine = self._spawn()
+            except Exception as e:
+                self._warm_errors.append(e)
+            finally:
+                ready.wait()
+
+        while True:
+            with self._cond:
+                job = self._pop()
+                while job is None and not self._closed:
+                    self._cond.wait()
+                    job = self._pop()
+                if job is None:
+                    break
+                self._idle -= 1
+                slot.job = job
+                slot.engine = engine
+                wait_ms = (time.perf_counter() - job.enqueued_at) * 1000
+                stats = self.stats[job.priority]
+                stats.waited += 1
+                stats.wait_total_ms += wait_ms
+                stats.wait_max_ms = max(stats.wait_max_ms, wait_ms)
+
+            if not job.started:
+                job.started = True
+                if not job.future.set_running_or_notify_cancel():
+                    self._finish(slot)
+                    continue
+                if job.on_start is not None:
+                    job.on_start()
+
+            try:
+                if engine is None:
+                    engine = self._spawn()
+                    with self._cond:
+                        slot.engine = engine
+                def on_go(slot=slot):
+                    with self._cond:
+                        slot.searching = True
+                        # An urgent job may have arrived while this one was being set up
+                        if self._idle == 0 and self._urgent_waiting():
+                            self._preempt_background()
+
+                diff = job.difficulty
+                engine.set_option("Threads", diff.threads)
+                engine.set_option("Hash", diff.hash_mb)
+                engine.set_option("Skill Level", diff.skill_level)
+                result = engine.analyze(
+                    fen=job.fen,
+                    movetime_ms=diff.movetime_ms,
+                    depth=diff.depth,
+                    multipv=diff.multipv,
+                    nodes=diff.nodes,
+                    history=job.history,
+                    on_go=on_go,
+                )
+            except Exception as e:
+                if engine is not None:
+                    self._retire(engine)
+                    engine = None
+                    with self._cond:
+                        self.respawns += 1
+                job.future.set_exception(e)
+                self._finish(slot)
+                continue
+
+            with self._cond:
+                slot.searching = False
+                if job.preempted and not job.abandoned:
+                    job.preempted = False
+                    job.preemptions += 1
+                    self._requeue_front(job)
+                    self._cond.notify()
+                    result = None
+            if result is not None:
+                job.future.set_result(result)
+            self._finish(slot)
+
+        if engine is not None:
+            self._retire(engine)
+
+    def _finish(self, slot: _Slot) -> None:
+        with self._cond:
+            slot.searching = False
+            slot.job = None
+            self._idle += 1
+
+
+engine_scheduler = EngineScheduler(workers=settings.engine_worker_count())
+
+metrics.register(metrics.GaugeFunc(
+    "theo_engine_processes", "Live Stockfish processes",
+    lambda: {(): engine_scheduler.live},
+))
+metrics.register(metrics.CounterFunc(
+    "theo_engine_respawns_total", "Stockfish processes replaced after a failure",
+    lambda: {(): engine_scheduler.respawns},
+))
+metrics.register(metrics.GaugeFunc(
+    "theo_engine_queue_length", "Engine jobs waiting for a worker, by priority class",
+    lambda: {(name,): c["queued"] for name, c in engine_scheduler.snapshot()["classes"].items()},
+    ("priority",),
+))
@@ -0,0 +1,68 @@
+"""Human-like weak play for the lowest Elo buckets.
+
+Weakening a deep search by picking among its top lines pays for analysis
+that is then thrown away. For the 400 and 800 buckets, Stockfish instead
+runs a small search bounded by a node budget (see `Difficulty.nodes`; the
+three PV lines shown as the eval's top moves share it), and
+`choose_engine_reply` replaces the engine's move with one from
+`heuristic_move` at the bucket's `blunder_rate`. The budgets and rates in
+the profiles are starting points, not measured values; tune them with
+benchmarks/bench_weak_play.py against a real Stockfish.
+
+The policy plays the way beginners do. It grabs material (and half-notices
+when the capturing piece can be taken back), gives checks, promotes, moves
+attacked pieces away and develops minor pieces. Moves are sampled with
+softmax weights over those scores rather than always taking the best one.
+It needs no search: one pass over the legal moves with cheap python-chess
+attack lookups.
+"""
+import math
+import random
+
+import chess
+
+PIECE_VALUES = {
+    chess.PAWN: 1.0,
+    chess.KNIGHT: 3.0,
+    chess.BISHOP: 3.0,
+    chess.ROOK: 5.0,
+    chess.QUEEN: 9.0,
+    chess.KING: 0.0,
+}
+
+# Lower is greedier; at 0.8 a free pawn is ~3.5x as likely as a quiet move
+TEMPERATURE = 0.8
+
+
+def _score(board: chess.Board, move: chess.Move) -> float:
+    mover = board.piece_type_at(move.from_square)
+    them = not board.turn
+    score = 0.0
+
+    if board.is_capture(move):
+        victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+        score += PIECE_VALUES[victim]
+        if board.is_attacked_by(them, move.to_square):
+            # Recaptures are only half noticed
+            score -= 0.5 * PIECE_VALUES[mover]
+    if move.promotion:
+        score += PIECE_VALUES[move.promotion] - 1.0
+    if board.is_attacked_by(them, move.from_square) and not board.is_attacked_by(board.turn, move.from_square):
+        # Saving a hanging piece
+        score += 0.5 * PIECE_VALUES[mover]
+    if mover in (chess.KNIGHT, chess.BISHOP) and chess.square_rank(move.from_square) in (0, 7):
+        score += 0.3
+    if board.gives_check(move):
+        score += 0.5
+    return score
+
+
+def heuristic_move(board: chess.Board, rng: random.Random | None = None) -> chess.Move | None:
+    """A plausible beginner's move in `board`, or None if there are no legal moves."""
+    moves = list(board.legal_moves)
+    if not moves:
+        return None
+    scores = [_score(board, m) for m in moves]
+    top = max(scores)
+    weights = [math.exp((s - top) / TEMPERATURE) for s in scores]
+    return (rng or random).choices(moves, weights=weights, k=1)[0]
@@ -0,0 +1,229 @@
+"""Cold storage for old finished games: compressed, append-only segment files.
+
+The archive job moves finished games older than `archive_after_days` out of
+the `games` table:
+
+    cd backend && python -m theo_api.services.storage.archive [--older-than-days 30]
+
+Games are packed into blocks of up to BLOCK_GAMES. A block is the games'
+JSON records (with their review), compressed with zstd when the
+`zstandard` package is installed and with zlib otherwise. Blocks are
+appended to `archive_dir/segment-NNNNNN.seg`. A new segment starts once the
+current one reaches `archive_segment_bytes`. The small `archived_games`
+table maps each game id to its block (segment, offset, length).
+
+A block is written and fsynced before the DB transaction that records it and
+deletes the hot rows. A crash in between leaves an unreferenced block
+behind; the games remain in `games` and are archived again by the next run.
+`position_index` rows are kept, so archived games are still found by
+position; neither that table nor `game_reviews` has a foreign key to `games`.
+
+`load_game` is the read path: `repo.get_game` falls back to it, so
+`GET /games/{id}` and the review keep working for archived games.
+"""
+import argparse
+import json
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from theo_api.config import settings
+from theo_api.services.storage.models import ArchivedGame, Game, GameReview
+from theo_api.utils.timing import span
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
+
+BLOCK_GAMES = 64
+_HEADER = struct.Struct(">4sBI")  # magic, codec, payload length
+_MAGIC = b"TGA1"
+_ZLIB, _ZSTD = 1, 2
+
+_GAME_FIELDS = ("id", "created_at", "elo_bucket", "player_color", "start_fen", "current_fen", "moves_uci", "pgn", "status")
+_REVIEW_FIELDS = ("moves_key", "status", "takeaways", "updated_at")
+
+
+def _compress(payload: bytes) -> tuple[int, bytes]:
+    if zstandard is not None:
+        return _ZSTD, zstandard.ZstdCompressor(level=6).compress(payload)
+    return _ZLIB, zlib.compress(payload, 6)
+
+
+def _decompress(codec: int, data: bytes) -> bytes:
+    if codec == _ZLIB:
+        return zlib.decompress(data)
+    if codec == _ZSTD:
+        if zstandard is None:
+            raise RuntimeError("archive block is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"unknown archive codec {codec}")
+
+
+def _segment_path(segment: int) -> str:
+    return os.path.join(settings.archive_dir, f"segment-{segment:06d}.seg")
+
+
+def _current_segment() -> int:
+    os.makedirs(settings.archive_dir, exist_ok=True)
+    numbers = [
+        int(name[8:14]) for name in os.listdir(settings.archive_dir)
+        if name.startswith("segment-") and name.endswith(".seg")
+    ]
+    segment = max(numbers, default=1)
+    path = _segment_path(segment)
+    if os.path.exists(path) and os.path.getsize(path) >= settings.archive_segment_bytes:
+        segment += 1
+    return segment
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _record(game: Game, review: GameReview | None) -> dict:
+    rec = {f: _encode(getattr(game, f)) for f in _GAME_FIELDS}
+    rec["review"] = {f: _encode(getattr(review, f)) for f in _REVIEW_FIELDS} if review is not None else None
+    return rec
+
+
+def append_block(records: list[dict]) -> tuple[int, int, int]:
+    """Append one block; returns (segment, offset, length) once it is on disk."""
+    codec, data = _compress(json.dumps(records, separators=(",", ":")).encode())
+    segment = _current_segment()
+    with open(_segment_path(segment), "ab") as fh:
+        offset = fh.tell()
+        fh.write(_HEADER.pack(_MAGIC, codec, len(data)) + data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    return segment, offset, _HEADER.size + len(data)
+
+
+class _BlockCache:
+    """Recently read blocks, decoded; a game and its review are usually read together."""
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self._blocks: OrderedDict[tuple[int, int], dict[str, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, segment: int, offset: int, length: int) -> dict[str, dict]:
+        key = (segment, offset)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is not None:
+                self._blocks.move_to_end(key)
+                return block
+        with open(_segment_path(segment), "rb") as fh:
+            fh.seek(offset)
+            raw = fh.read(length)
+        magic, codec, size = _HEADER.unpack_from(raw)
+        if magic != _MAGIC or size != length - _HEADER.size:
+            raise ValueError(f"corrupt archive block at segment {segment} offset {offset}")
+        records = json.loads(_decompress(codec, raw[_HEADER.size:]))
+        block = {r["id"]: r for r in records}
+        with self._lock:
+            self._blocks[key] = block
+            while len(self._blocks) > self.maxsize:
+                self._blocks.popitem(last=False)
+        return block
+
+
+_cache = _BlockCache()
+
+
+def _load_record(db: Session, game_id: str) -> dict | None:
+    entry = db.get(ArchivedGame, game_id)
+    if entry is None:
+        return None
+    return _cache.get(entry.segment, entry.offset, entry.length).get(game_id)
+
+
+def _game_from(rec: dict) -> Game:
+    g = Game(**{f: rec[f] for f in _GAME_FIELDS if f != "created_at"})
+    g.created_at = datetime.fromisoformat(rec["created_at"])
+    g.archived = True
+    return g
+
+
+def load_game(db: Session, game_id: str) -> Game | None:
+    """An archived game as a detached, read-only `Game` (archived=True), or None."""
+    with span("archive_read"):
+        rec = _load_record(db, game_id)
+    return _game_from(rec) if rec is not None else None
+
+
+def load_game_with_review(db: Session, game_id: str) -> tuple[Game, GameReview | None] | None:
+    """An archived game and its review. A review written after archiving (hot table) wins."""
+    with span("archive_read"):
+        rec = _load_record(db, game_id)
+    if rec is None:
+        return None
+    review = db.get(GameReview, game_id)
+    if review is None and rec["review"] is not None:
+        r = rec["review"]
+        review = GameReview(
+            game_id=game_id,
+            moves_key=r["moves_key"],
+            status=r["status"],
+            takeaways=r["takeaways"],
+            updated_at=datetime.fromisoformat(r["updated_at"]),
+        )
+    return _game_from(rec), review
+
+
+def archive_games(db: Session, older_than: timedelta, limit: int | None = None, log=print) -> int:
+    """Move finished games created before now - `older_than` to segment files."""
+    cutoff = datetime.utcnow() - older_than
+    moved = 0
+    while limit is None or moved < limit:
+        batch_size = BLOCK_GAMES if limit is None else min(BLOCK_GAMES, limit - moved)
+        rows = db.execute(
+            select(Game, GameReview)
+            .outerjoin(GameReview, GameReview.game_id == Game.id)
+            .where(Game.status == "finished", Game.created_at < cutoff)
+            .order_by(Game.created_at, Game.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        segment, offset, length = append_block([_record(g, r) for g, r in rows])
+        ids = [g.id for g, _ in rows]
+        now = datetime.utcnow()
+        db.add_all(
+            ArchivedGame(game_id=gid, segment=segment, offset=offset, length=length, archived_at=now) for gid in ids
+        )
+        db.execute(delete(GameReview).where(GameReview.game_id.in_(ids)))
+        db.execute(delete(Game).where(Game.id.in_(ids)))
+        db.commit()
+        db.expunge_all()
+        moved += len(ids)
+        log(f"archived {moved} games (segment {segment})")
+    return moved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old finished games to compressed archive segments.")
+    parser.add_argument("--older-than-days", type=float, default=settings.archive_after_days)
+    parser.add_argument("--limit", type=int, default=None, help="archive at most this many games")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the SQLite database afterwards")
+    args = parser.parse_args()
+
+    from sqlalchemy import text
+
+    from theo_api.services.storage.db import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as session:
+        total = archive_games(session, timedelta(days=args.older_than_days), args.limit)
+    print(f"done: {total} games archived to {settings.archive_dir}")
+    if args.vacuum and engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.execute(text("VACUUM"))
@@ -0,0 +1,91 @@
+"""Streaming export of stored games as PGN or NDJSON.
+
+Used by `GET /games/export` and from the command line:
+
+    cd backend && python -m theo_api.services.storage.export --format pgn --status finished -o games.pgn
+
+Games are read page by page with keyset pagination (`repo.iter_games`), so
+memory use doesn't depend on the number of games exported. Stored PGN is
+written as-is; only games without one are rendered from their moves.
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+from typing import Iterator
+
+from sqlalchemy.orm import Session
+
+from theo_api.services.storage import repo
+from theo_api.utils.pgn import render_pgn
+
+MEDIA_TYPES = {
+    "pgn": "application/x-chess-pgn",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def game_record(g) -> dict:
+    return {
+        "game_id": g.id,
+        "created_at": g.created_at.isoformat(),
+        "status": g.status,
+        "elo_bucket": g.elo_bucket,
+        "player_color": g.player_color,
+        "start_fen": g.start_fen,
+        "current_fen": g.current_fen,
+        "moves_uci": g.moves_uci.split(),
+    }
+
+
+def _pgn(g) -> str | None:
+    if g.pgn:
+        return g.pgn
+    try:
+        return render_pgn(g)
+    except ValueError:
+        return None  # corrupt move list; nothing sensible to export
+
+
+def export_games(bind, fmt: str, filters: list, page_size: int = 500) -> Iterator[str]:
+    """Yield the export one page of games at a time.
+
+    Opens its own session on `bind`, so it can outlive the request's session
+    while a streaming response is being sent.
+    """
+    with Session(bind=bind, autoflush=False) as db:
+        for page in repo.iter_games(db, filters, page_size):
+            if fmt == "pgn":
+                texts = (_pgn(g) for g in page)
+                yield "".join(t.rstrip("\n") + "\n\n" for t in texts if t)
+            else:
+                yield "".join(json.dumps(game_record(g)) + "\n" for g in page)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export stored games as PGN or NDJSON.")
+    parser.add_argument("--format", choices=sorted(MEDIA_TYPES), default="pgn")
+    parser.add_argument("--status", default="finished", help='game status, or "all"')
+    parser.add_argument("--elo-bucket", type=int)
+    parser.add_argument("--player-color", choices=("white", "black"))
+    parser.add_argument("--from", dest="created_from", type=datetime.fromisoformat, help="created at or after (ISO date)")
+    parser.add_argument("--to", dest="created_to", type=datetime.fromisoformat, help="created before (ISO date)")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    from theo_api.services.storage.db import engine
+
+    filters = repo.game_filters(
+        status=None if args.status == "all" else args.status,
+        elo_bucket=args.elo_bucket,
+        player_color=args.player_color,
+        created_from=args.created_from,
+        created_to=args.created_to,
+    )
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for block in export_games(engine, args.format, filters):
+            out.write(block)
+    finally:
+        if out is not sys.stdout:
+            out.close()
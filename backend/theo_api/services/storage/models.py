@@ -1,12 +1,19 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import String, DateTime, Text, Integer
+from sqlalchemy import BigInteger, String, DateTime, Text, Integer, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from theo_api.services.storage.db import Base
 
 
 class Game(Base):
     __tablename__ = "games"
+    # Listing and export page by (created_at, id), optionally filtered by status
+    # or Elo bucket; each index serves one of those orders without a sort
+    __table_args__ = (
+        Index("ix_games_created_at_id", "created_at", "id"),
+        Index("ix_games_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_games_elo_bucket_created_at_id", "elo_bucket", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -20,3 +27,51 @@ class Game(Base):
     moves_uci: Mapped[str] = mapped_column(Text, default="", nullable=False)  # space-separated
     pgn: Mapped[str] = mapped_column(Text, default="", nullable=False)
     status: Mapped[str] = mapped_column(String(12), default="active", nullable=False)  # active/finished
+
+    # Set on read-only copies loaded from the archive (services/storage/archive.py)
+    archived = False
+
+
+class GameReview(Base):
+    """Post-game review generated once when a game finishes.
+
+    `moves_key` identifies the move list the review was built from, so a
+    review is stale (and regenerated) only if the game's moves change.
+    `game_id` has no foreign key: a review requested after the game was
+    archived is written here while the game itself lives in the archive.
+    """
+    __tablename__ = "game_reviews"
+
+    game_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    moves_key: Mapped[str] = mapped_column(String(32), nullable=False)
+    status: Mapped[str] = mapped_column(String(12), default="pending", nullable=False)  # pending/ready
+    takeaways: Mapped[str] = mapped_column(Text, default="[]", nullable=False)  # JSON array of strings
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class PositionIndex(Base):
+    """Every position reached in a stored game, keyed by Polyglot Zobrist hash.
+
+    `key` is the 64-bit hash stored as a signed integer. The table has no
+    rowid: the primary key is the table itself, ordered by key, so a lookup
+    by position reads only the matching (game_id, ply) entries. Ply 0 is the
+    start position. The index outlives the hot row: archived games stay
+    searchable by position, so `game_id` has no foreign key to `games`.
+    """
+    __tablename__ = "position_index"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    key: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    game_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    ply: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+
+class ArchivedGame(Base):
+    """Where an archived game lives: a compressed block in a segment file."""
+    __tablename__ = "archived_games"
+
+    game_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    segment: Mapped[int] = mapped_column(Integer, nullable=False)
+    offset: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    length: Mapped[int] = mapped_column(Integer, nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,188 @@
+"""Bulk import of PGN archives into `games` (and the position index).
+
+The main process streams the file in chunks (`utils.pgn.iter_chunks`) and
+hands them to a process pool for parsing and validation. Results come back
+in file order. They are inserted in large transactions, each covering whole
+chunks, and after every commit a checkpoint file records the byte offset
+reached. Re-running with the same checkpoint resumes from there. Game ids
+are derived from the game content, so games that are re-read after a crash
+are skipped rather than duplicated.
+"""
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from typing import Callable
+
+from sqlalchemy.orm import sessionmaker
+
+from theo_api.services.stockfish.difficulty import clamp_bucket
+from theo_api.services.storage import repo
+from theo_api.services.storage.positions import to_signed
+from theo_api.utils.pgn import ChunkResult, ParsedGame, iter_chunks, parse_chunk
+
+DEFAULT_ELO_BUCKET = 1200
+
+
+@dataclass
+class ImportStats:
+    read: int = 0       # games parsed successfully
+    inserted: int = 0   # new rows (read minus games already in the DB)
+    invalid: int = 0    # games rejected by validation
+    offset: int = 0     # bytes of the file processed
+    seconds: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.read / self.seconds if self.seconds else 0.0
+
+
+class _InlineExecutor(Executor):
+    """Runs work in the calling process (workers=1, tests)."""
+
+    def submit(self, fn, *args, **kwargs):
+        f = Future()
+        try:
+            f.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            f.set_exception(e)
+        return f
+
+
+def _elo_bucket(game: ParsedGame, default: int) -> int:
+    elos = []
+    for tag in ("WhiteElo", "BlackElo"):
+        try:
+            elos.append(int(game.headers.get(tag, "")))
+        except ValueError:
+            pass
+    return clamp_bucket(sum(elos) // len(elos)) if elos else default
+
+
+def _rows(results: list[ChunkResult], elo_bucket: int | None, now: datetime) -> tuple[list[dict], list[tuple]]:
+    games, positions = [], []
+    for result in results:
+        for g in result.games:
+            games.append({
+                "id": g.id,
+                "created_at": now,
+                "elo_bucket": elo_bucket or _elo_bucket(g, DEFAULT_ELO_BUCKET),
+                "player_color": "white",
+                "start_fen": g.start_fen,
+                "current_fen": g.final_fen,
+                "moves_uci": " ".join(g.moves),
+                "pgn": g.pgn,
+                "status": "finished",
+            })
+            if g.positions:
+                positions.extend((to_signed(k), g.id, ply) for ply, k in g.positions)
+    return games, positions
+
+
+def _load_checkpoint(checkpoint: str | None, path: str, size: int) -> int:
+    if not checkpoint or not os.path.exists(checkpoint):
+        return 0
+    with open(checkpoint) as fh:
+        state = json.load(fh)
+    # A different or rewritten file starts over; content ids make that safe
+    if state.get("path") != os.path.abspath(path) or state.get("size") != size:
+        return 0
+    return int(state.get("offset", 0))
+
+
+def _save_checkpoint(checkpoint: str | None, path: str, size: int, stats: ImportStats) -> None:
+    if not checkpoint:
+        return
+    tmp = checkpoint + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump({
+            "path": os.path.abspath(path),
+            "size": size,
+            "offset": stats.offset,
+            "read": stats.read,
+            "inserted": stats.inserted,
+            "invalid": stats.invalid,
+        }, fh)
+    os.replace(tmp, checkpoint)
+
+
+def import_pgn(
+    path: str,
+    session_factory: sessionmaker,
+    *,
+    workers: int | None = None,
+    batch_size: int = 5000,
+    games_per_chunk: int = 250,
+    elo_bucket: int | None = None,
+    index_positions: bool = True,
+    checkpoint: str | None = None,
+    progress: Callable[[ImportStats, int], None] | None = None,
+    errors: Callable[[str], None] | None = None,
+) -> ImportStats:
+    """Import every valid game of a PGN file.
+
+    `batch_size` is the number of games per transaction; `elo_bucket`
+    overrides the bucket derived from the WhiteElo/BlackElo headers.
+    `progress(stats, file_size)` is called after every commit.
+    """
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(path)
+    start = _load_checkpoint(checkpoint, path, size)
+    stats = ImportStats(offset=start)
+    started = time.perf_counter()
+    parse = partial(parse_chunk, index_positions=index_positions)
+
+    executor = ProcessPoolExecutor(workers) if workers > 1 else _InlineExecutor()
+    pending: deque[Future] = deque()
+    done: list[ChunkResult] = []
+    buffered = 0
+
+    def flush():
+        nonlocal done, buffered
+        if not done:
+            return
+        games, positions = _rows(done, elo_bucket, datetime.utcnow())
+        with session_factory() as db:
+            stats.inserted += repo.insert_games(db, games, positions)
+            db.commit()
+        stats.offset = done[-1].end
+        stats.seconds = time.perf_counter() - started
+        _save_checkpoint(checkpoint, path, size, stats)
+        if progress is not None:
+            progress(stats, size)
+        done, buffered = [], 0
+
+    def collect(result: ChunkResult):
+        nonlocal buffered
+        stats.read += len(result.games)
+        stats.invalid += len(result.errors)
+        if errors is not None:
+            for e in result.errors:
+                errors(e)
+        done.append(result)
+        buffered += len(result.games)
+        if buffered >= batch_size:
+            flush()
+
+    try:
+        with open(path, "rb") as fh:
+            for chunk in iter_chunks(fh, games_per_chunk, start):
+                pending.append(executor.submit(parse, chunk))
+                # Bounded read-ahead: keep the workers busy without buffering the file
+                while len(pending) >= workers * 4:
+                    collect(pending.popleft().result())
+        while pending:
+            collect(pending.popleft().result())
+        flush()
+    finally:
+        for f in pending:
+            f.cancel()
+        executor.shutdown()
+
+    stats.seconds = time.perf_counter() - started
+    return stats
+
@@ -0,0 +1,92 @@
+"""Position index: Zobrist hash -> (game_id, ply) for every stored game.
+
+New moves are indexed as they are saved (see api/games.py). Games stored
+before the index existed are indexed by the backfill:
+
+    cd backend && python -m theo_api.services.storage.positions [--batch-size 500]
+
+A game counts as indexed once its start position (ply 0) has a row, so the
+backfill can be interrupted and re-run; rows that already exist are skipped.
+"""
+import argparse
+import time
+
+import chess
+import chess.polyglot
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from theo_api.core.chess_rules import GameRules
+from theo_api.services.storage import repo
+from theo_api.services.storage.models import Game
+
+
+def to_signed(key: int) -> int:
+    """Store unsigned 64-bit hashes in a signed BIGINT column."""
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+def position_key(board: chess.Board) -> int:
+    return to_signed(chess.polyglot.zobrist_hash(board))
+
+
+def game_positions(start_fen: str, moves: list[str]) -> list[tuple[int, int]]:
+    """(ply, key) for the start position and every position after it.
+
+    Stops at the first move that doesn't replay, so a corrupt move list
+    still gets its valid prefix indexed.
+    """
+    rules = GameRules(start_fen)
+    out = [(0, to_signed(rules.tracker.key))]
+    for uci in moves:
+        try:
+            move = rules.board.parse_uci(uci)
+        except ValueError:
+            break
+        rules.push(move)
+        out.append((rules.plies, to_signed(rules.tracker.key)))
+    return out
+
+
+def index_game(db: Session, game: Game) -> int:
+    """Queue index rows for a whole game; returns the number of positions."""
+    positions = game_positions(game.start_fen, game.moves_uci.split())
+    repo.add_positions(db, game.id, positions)
+    return len(positions)
+
+
+def backfill(db: Session, batch_size: int = 500, log=print) -> tuple[int, int]:
+    """Index every game without a ply-0 row. Returns (games indexed, positions)."""
+    games = positions = 0
+    last_id = ""
+    while True:
+        batch = db.execute(
+            select(Game).where(Game.id > last_id).order_by(Game.id).limit(batch_size)
+        ).scalars().all()
+        if not batch:
+            break
+        for g in batch:
+            start_key = position_key(chess.Board(g.start_fen))
+            if repo.has_position(db, g.id, start_key, 0):
+                continue
+            positions += index_game(db, g)
+            games += 1
+        last_id = batch[-1].id
+        db.commit()
+        db.expunge_all()
+        log(f"indexed {games} games, {positions} positions (up to {last_id})")
+    return games, positions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the position index for stored games.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    from theo_api.services.storage.db import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    with SessionLocal() as session:
+        n_games, n_positions = backfill(session, args.batch_size)
+    print(f"done: {n_games} games, {n_positions} positions in {time.perf_counter() - started:.1f}s")
@@ -1,5 +1,12 @@
+import json
+from datetime import datetime
+from typing import Iterator
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from theo_api.services.storage.models import Game
+from theo_api.services.storage import archive
+from theo_api.services.storage.models import Game, GameReview, PositionIndex
+from theo_api.utils.timing import span
 
 
 def create_game(db: Session, *, elo_bucket: int, player_color: str, start_fen: str) -> Game:
@@ -13,17 +20,227 @@ def create_game(db: Session, *, elo_bucket: int, player_color: str, start_fen: s
         status="active",
     )
     db.add(g)
-    db.commit()
-    db.refresh(g)
+    with span("db_commit"):
+        db.commit()
+        db.refresh(g)
     return g
 
 
 def get_game(db: Session, game_id: str) -> Game | None:
-    return db.get(Game, game_id)
+    """A live game, or a read-only copy of an archived one (game.archived)."""
+    with span("db_read"):
+        g = db.get(Game, game_id)
+    return g if g is not None else archive.load_game(db, game_id)
+
+
+def get_game_progress(db: Session, game_id: str) -> tuple[str, str] | None:
+    """(moves_uci, status) of a live game as stored, without loading the row."""
+    with span("db_read"):
+        row = db.execute(select(Game.moves_uci, Game.status).where(Game.id == game_id)).first()
+    return (row.moves_uci, row.status) if row else None
 
 
 def save_game(db: Session, game: Game) -> Game:
     db.add(game)
-    db.commit()
-    db.refresh(game)
+    with span("db_commit"):
+        db.commit()
+        db.refresh(game)
     return game
+
+
+def game_filters(
+    *,
+    status: str | None = None,
+    elo_bucket: int | None = None,
+    player_color: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+) -> list:
+    """WHERE clauses for the game listing/export filters; None means no filter."""
+    clauses = []
+    if status is not None:
+        clauses.append(Game.status == status)
+    if elo_bucket is not None:
+        clauses.append(Game.elo_bucket == elo_bucket)
+    if player_color is not None:
+        clauses.append(Game.player_color == player_color)
+    if created_from is not None:
+        clauses.append(Game.created_at >= created_from)
+    if created_to is not None:
+        clauses.append(Game.created_at < created_to)
+    return clauses
+
+
+def _after(key: tuple[datetime, str], descending: bool = False):
+    # Keyset condition: rows strictly past `key` in (created_at, id) order. The
+    # leading plain range on created_at lets the index seek straight to the page
+    created_at, game_id = key
+    if descending:
+        return and_(Game.created_at <= created_at, or_(Game.created_at < created_at, Game.id < game_id))
+    return and_(Game.created_at >= created_at, or_(Game.created_at > created_at, Game.id > game_id))
+
+
+def list_games(
+    db: Session, filters: list, limit: int = 50, after: tuple[datetime, str] | None = None, descending: bool = True
+) -> list:
+    """One page of game summaries (no move list or PGN), newest first by default.
+
+    `after` is the (created_at, id) of the last row of the previous page.
+    """
+    order = (Game.created_at.desc(), Game.id.desc()) if descending else (Game.created_at, Game.id)
+    query = select(
+        Game.id, Game.created_at, Game.status, Game.elo_bucket, Game.player_color, Game.current_fen
+    ).where(*filters)
+    if after is not None:
+        query = query.where(_after(after, descending))
+    with span("db_read"):
+        return db.execute(query.order_by(*order).limit(limit)).all()
+
+
+def iter_games(db: Session, filters: list, page_size: int = 500) -> Iterator[list[Game]]:
+    """Yield pages of matching games in (created_at, id) order.
+
+    Each page is a keyset query ("after the last row of the previous page"),
+    so the cost of a page doesn't grow with how far the export has got, and
+    rows are streamed from the cursor. Pages are expunged once the caller
+    has them, so memory stays at one page.
+    """
+    last = None
+    while True:
+        query = select(Game).where(*filters)
+        if last is not None:
+            query = query.where(_after(last))
+        query = query.order_by(Game.created_at, Game.id).limit(page_size)
+        with span("db_read"):
+            page = list(db.scalars(query, execution_options={"yield_per": page_size}))
+        if not page:
+            return
+        last = (page[-1].created_at, page[-1].id)
+        yield page
+        db.expunge_all()
+        if len(page) < page_size:
+            return
+
+
+def get_game_with_review(db: Session, game_id: str) -> tuple[Game, GameReview | None] | None:
+    """Load a game and its stored review in one query."""
+    with span("db_read"):
+        row = db.execute(
+            select(Game, GameReview).outerjoin(GameReview, GameReview.game_id == Game.id).where(Game.id == game_id)
+        ).first()
+    return (row[0], row[1]) if row else archive.load_game_with_review(db, game_id)
+
+
+def mark_review_pending(db: Session, game_id: str, moves_key: str) -> GameReview:
+    review = db.get(GameReview, game_id)
+    if review is None:
+        review = GameReview(game_id=game_id)
+        db.add(review)
+    review.moves_key = moves_key
+    review.status = "pending"
+    review.takeaways = "[]"
+    review.updated_at = datetime.utcnow()
+    with span("db_commit"):
+        db.commit()
+    return review
+
+
+def save_review(db: Session, game_id: str, moves_key: str, takeaways: list[str]) -> bool:
+    """Store a finished review unless a newer one was requested meanwhile."""
+    result = db.execute(
+        update(GameReview)
+        .where(GameReview.game_id == game_id, GameReview.moves_key == moves_key)
+        .values(status="ready", takeaways=json.dumps(takeaways), updated_at=datetime.utcnow())
+    )
+    with span("db_commit"):
+        db.commit()
+    return result.rowcount > 0
+
+
+def _insert_ignore(db: Session, model):
+    # Re-indexing a game (backfill after incremental writes) must not fail on existing rows
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing()
+    if dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    return insert(model)
+
+
+def add_positions(db: Session, game_id: str, positions: list[tuple[int, int]]) -> None:
+    """Queue (ply, key) index rows for a game; committed with the next commit."""
+    if not positions:
+        return
+    db.execute(
+        _insert_ignore(db, PositionIndex),
+        [{"key": key, "game_id": game_id, "ply": ply} for ply, key in positions],
+    )
+
+
+def insert_games(db: Session, games: list[dict], positions: list[tuple[int, str, int]] = ()) -> int:
+    """Bulk insert game rows and their (key, game_id, ply) index rows in the
+    current transaction, skipping rows that already exist. Returns the number
+    of games inserted."""
+    if not games:
+        return 0
+    # Core executemany on the session's connection: no ORM objects, and a rowcount
+    conn = db.connection()
+    result = conn.execute(_insert_ignore(db, Game), games)
+    if positions:
+        stmt = _insert_ignore(db, PositionIndex)
+        if conn.dialect.paramstyle == "qmark":
+            # Index rows outnumber games ~80 to 1; plain tuples through the driver are
+            # several times faster than dict rows, and key order keeps B-tree writes local
+            compiled = stmt.compile(dialect=conn.dialect, column_keys=["key", "game_id", "ply"])
+            order = [("key", "game_id", "ply").index(name) for name in compiled.positiontup]
+            rows = sorted(positions)
+            conn.exec_driver_sql(str(compiled), [tuple(row[i] for i in order) for row in rows])
+        else:
+            conn.execute(stmt, [{"key": k, "game_id": g, "ply": p} for k, g, p in positions])
+    return result.rowcount
+
+
+def has_position(db: Session, game_id: str, key: int, ply: int) -> bool:
+    with span("db_read"):
+        return db.get(PositionIndex, (key, game_id, ply)) is not None
+
+
+def position_occurrences(db: Session, key: int, limit: int = 50) -> tuple[int, int, list[tuple[str, int]]]:
+    """(occurrences, distinct games, first `limit` (game_id, ply) pairs) for one position."""
+    with span("db_read"):
+        total, games = db.execute(
+            select(func.count(), func.count(func.distinct(PositionIndex.game_id))).where(PositionIndex.key == key)
+        ).one()
+        rows = db.execute(
+            select(PositionIndex.game_id, PositionIndex.ply).where(PositionIndex.key == key).limit(limit)
+        ).all()
+    return total, games, [(r.game_id, r.ply) for r in rows]
+
+
+def popular_positions(db: Session, limit: int = 20, min_ply: int = 0) -> list[tuple[int, int, int, str, int]]:
+    """Most frequent positions as (key, occurrences, games, sample game_id, sample ply).
+
+    Scans the whole index; meant for batch jobs such as pre-warming analyses.
+    """
+    with span("db_read"):
+        rows = db.execute(
+            select(
+                PositionIndex.key,
+                func.count().label("n"),
+                func.count(func.distinct(PositionIndex.game_id)).label("games"),
+                func.min(PositionIndex.game_id).label("game_id"),
+            )
+            .where(PositionIndex.ply >= min_ply)
+            .group_by(PositionIndex.key)
+            .order_by(func.count().desc())
+            .limit(limit)
+        ).all()
+        out = []
+        for r in rows:
+            ply = db.execute(
+                select(func.min(PositionIndex.ply)).where(
+                    PositionIndex.key == r.key, PositionIndex.game_id == r.game_id, PositionIndex.ply >= min_ply
+                )
+            ).scalar_one()
+            out.append((r.key, r.n, r.games, r.game_id, ply))
+    return out
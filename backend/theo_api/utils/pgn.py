@@ -0,0 +1,246 @@
+"""PGN rendering for stored games, and streaming PGN reading for bulk imports.
+
+`render_pgn` builds the PGN of a stored game from its move list.
+
+`iter_chunks` splits a PGN file into chunks of raw game texts without
+loading the file. Each chunk records the byte offsets it covers, so an
+import can resume at a chunk boundary. `parse_chunk` runs in worker
+processes. It reads only the main line of each game (variations are
+skipped, and no GameNode tree is built) and validates every move.
+"""
+import io
+import re
+import uuid
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator
+
+import chess
+import chess.pgn
+
+from theo_api.core.chess_rules import Outcome, RepetitionTracker, classify
+
+# Namespace for content-derived game ids: importing the same game twice yields the same id
+IMPORT_NAMESPACE = uuid.UUID("5f0c2d8e-9a0b-4c47-9a53-2b1f0d6a7c11")
+_ID_HEADERS = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+_TAG_LINE = re.compile(rb'\[[A-Za-z0-9_]+\s+".*"\s*\]')
+
+
+def render_pgn(game, outcome: Outcome | None = None) -> str:
+    """PGN of a stored game (a `Game` row); replays the moves to find the result unless given."""
+    board = chess.Board(game.start_fen)
+    tracker = RepetitionTracker(board) if outcome is None else None
+    game_pgn = chess.pgn.Game()
+    game_pgn.headers["Event"] = "Theo Training Game"
+    game_pgn.headers["White"] = "Player" if game.player_color == "white" else "Theo"
+    game_pgn.headers["Black"] = "Theo" if game.player_color == "white" else "Player"
+
+    node = game_pgn
+    for uci in game.moves_uci.split():
+        move = board.parse_uci(uci)
+        node = node.add_variation(move)
+        if tracker is not None:
+            tracker.push(board, move)
+        else:
+            board.push(move)
+
+    if outcome is None:
+        outcome = classify(board, tracker)
+    game_pgn.headers["Result"] = outcome.pgn_result
+
+    buf = io.StringIO()
+    exporter = chess.pgn.FileExporter(buf)
+    game_pgn.accept(exporter)
+    return buf.getvalue()
+
+
+@dataclass
+class PgnChunk:
+    start: int  # byte offset of the first game
+    end: int    # byte offset just past the last game (start of the next one)
+    games: list[str]
+
+
+class PgnError(ValueError):
+    pass
+
+
+@dataclass
+class ParsedGame:
+    id: str
+    headers: dict[str, str]
+    start_fen: str
+    final_fen: str
+    moves: list[str]
+    pgn: str
+    positions: list[tuple[int, int]] | None = None  # (ply, unsigned zobrist key)
+
+
+@dataclass
+class ChunkResult:
+    end: int
+    games: list[ParsedGame] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+
+def iter_chunks(fh: BinaryIO, games_per_chunk: int = 250, start: int = 0) -> Iterator[PgnChunk]:
+    """Yield chunks of game texts from a binary PGN stream, starting at byte `start`.
+
+    A game starts at a tag line (`[Tag "value"]`) that follows movetext.
+    Lines inside `{...}` comments, which may span lines (a wrapped
+    `[%clk 0:03:00]`), and after `;` are not tag lines. Games without tags
+    can't be separated and end up merged with the previous one, where
+    validation rejects them.
+    """
+    fh.seek(start)
+    pos = start
+    chunk_start = start
+    games: list[str] = []
+    current: list[bytes] = []
+    in_movetext = False
+    in_comment = False  # inside a {...} comment; these don't nest
+
+    for line in fh:
+        stripped = line.strip()
+        is_tag = not in_comment and _TAG_LINE.fullmatch(stripped) is not None
+        if is_tag and in_movetext:
+            games.append(b"".join(current).decode("utf-8", "replace"))
+            current = []
+            in_movetext = False
+            if len(games) >= games_per_chunk:
+                yield PgnChunk(chunk_start, pos, games)
+                chunk_start = pos
+                games = []
+        if stripped and not is_tag and not stripped.startswith(b"%"):
+            in_movetext = True
+            in_comment = _ends_in_comment(stripped, in_comment)
+        if stripped or current:
+            current.append(line)
+        elif not games:
+            chunk_start = pos + len(line)  # leading blank lines
+        pos += len(line)
+
+    if current and any(s.strip() for s in current):
+        games.append(b"".join(current).decode("utf-8", "replace"))
+    if games:
+        yield PgnChunk(chunk_start, pos, games)
+
+
+def _ends_in_comment(line: bytes, in_comment: bool) -> bool:
+    """Whether a movetext line leaves a `{` comment open."""
+    i = 0
+    while i < len(line):
+        if in_comment:
+            end = line.find(b"}", i)
+            if end < 0:
+                return True
+            in_comment, i = False, end + 1
+            continue
+        c = line[i:i + 1]
+        if c == b";":
+            return False  # rest-of-line comment
+        if c == b"{":
+            in_comment = True
+        i += 1
+    return in_comment
+
+
+class _MainlineVisitor(chess.pgn.BaseVisitor):
+    """Collects headers and main-line moves; skips variations and comments.
+
+    Position hashes are updated from the reader's own board, so the game is
+    replayed only once.
+    """
+
+    def __init__(self, index_positions: bool = True):
+        self.index_positions = index_positions
+
+    def begin_game(self):
+        self.headers: dict[str, str] = {}
+        self.moves: list[chess.Move] = []
+        self.start_fen = chess.STARTING_FEN
+        self.final_fen = chess.STARTING_FEN
+        self.positions: list[tuple[int, int]] | None = None
+        self.errors: list[str] = []
+        self._tracker: RepetitionTracker | None = None
+        self._pending = None
+        self._board: chess.Board | None = None
+
+    def visit_header(self, tagname, tagvalue):
+        self.headers[tagname] = tagvalue
+
+    def end_headers(self):
+        # Games are replayed on a standard board by the app
+        if self.headers.get("Variant", "standard").lower() not in ("standard", "chess", ""):
+            self.errors.append(f"unsupported variant {self.headers['Variant']}")
+            return chess.pgn.SKIP
+        return None
+
+    def visit_board(self, board):
+        # Called for the starting position (after SetUp/FEN headers) and after each move
+        if self._board is None:
+            self.start_fen = board.fen()
+            if self.index_positions:
+                self._tracker = RepetitionTracker(board)
+                self.positions = [(0, self._tracker.key)]
+        elif self._pending is not None:
+            self._tracker.after_move(board, self._pending)
+            self._pending = None
+            self.positions.append((len(self.moves), self._tracker.key))
+        self._board = board
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def visit_move(self, board, move):
+        self.moves.append(move)
+        if self._tracker is not None:
+            self._pending = self._tracker.before_move(board, move)
+
+    def end_game(self):
+        if self.moves:
+            self.final_fen = self._board.fen()
+
+    def handle_error(self, error):
+        self.errors.append(str(error))
+
+    def result(self):
+        return self
+
+
+def _game_id(headers: dict[str, str], start_fen: str, moves: list[str]) -> str:
+    key = "\n".join([*(headers.get(h, "") for h in _ID_HEADERS), start_fen, " ".join(moves)])
+    return str(uuid.uuid5(IMPORT_NAMESPACE, key))
+
+
+def parse_game(text: str, index_positions: bool = True) -> ParsedGame:
+    """Parse and validate one game; raises PgnError if it can't be imported."""
+    visitor = chess.pgn.read_game(io.StringIO(text), Visitor=lambda: _MainlineVisitor(index_positions))
+    if visitor is None:
+        raise PgnError("no game")
+    if visitor.errors:
+        raise PgnError(visitor.errors[0])
+    if not visitor.moves:
+        raise PgnError("no moves")
+
+    moves = [m.uci() for m in visitor.moves]
+    return ParsedGame(
+        id=_game_id(visitor.headers, visitor.start_fen, moves),
+        headers=visitor.headers,
+        start_fen=visitor.start_fen,
+        final_fen=visitor.final_fen,
+        moves=moves,
+        pgn=text.strip() + "\n",
+        positions=visitor.positions,
+    )
+
+
+def parse_chunk(chunk: PgnChunk, index_positions: bool = True) -> ChunkResult:
+    """Worker entry point: parse every game of a chunk, collecting errors instead of raising."""
+    out = ChunkResult(end=chunk.end)
+    for text in chunk.games:
+        try:
+            out.games.append(parse_game(text, index_positions))
+        except (PgnError, ValueError) as e:
+            first = next((l for l in text.splitlines() if l.strip()), "")[:80]
+            out.errors.append(f"{e} ({first})")
+    return out
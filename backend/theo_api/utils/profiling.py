@@ -0,0 +1,211 @@
+"""Opt-in sampling profiler for individual requests.
+
+A profiled request gets a sampler thread that reads `sys._current_frames()`
+every `profile_interval_ms` and counts the stacks of the threads working on
+it: the event-loop thread, and any thread whose stack runs the matched
+endpoint (sync endpoints run in the threadpool). When the request finishes
+the counts are written as collapsed stacks, one "frame;frame;... count"
+line per stack, ready for flamegraph.pl or speedscope.
+
+Requests are picked by `profile_sample_rate`, or by an `X-Theo-Profile: 1`
+header when `profile_allow_header` is set. At most one request is profiled
+at a time. With both settings off the middleware is not installed at all.
+"""
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from theo_api.config import settings
+from theo_api.core import events
+
+PROFILE_HEADER = b"x-theo-profile"
+PROFILE_SUFFIX = ".collapsed"
+
+# One profile at a time keeps the overhead bounded under load
+_busy = threading.Lock()
+
+
+def profiling_enabled() -> bool:
+    return settings.profile_sample_rate > 0 or settings.profile_allow_header
+
+
+def _frame_name(code) -> str:
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{code.co_name} ({module})"
+
+
+class _Sampler:
+    def __init__(self, scope, loop_thread: int, interval: float):
+        self.scope = scope
+        self.loop_thread = loop_thread
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._endpoint_codes: set | None = None
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _codes(self) -> set:
+        # The endpoint is known only once routing has run
+        if self._endpoint_codes is None:
+            endpoint = self.scope.get("endpoint")
+            if endpoint is None:
+                return set()
+            codes = set()
+            while endpoint is not None:
+                code = getattr(endpoint, "__code__", None)
+                if code is not None:
+                    codes.add(code)
+                endpoint = getattr(endpoint, "__wrapped__", None)
+            self._endpoint_codes = codes
+        return self._endpoint_codes
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            codes = self._codes()
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                relevant = ident == self.loop_thread
+                f = frame
+                while f is not None:
+                    stack.append(_frame_name(f.f_code))
+                    relevant = relevant or f.f_code in codes
+                    f = f.f_back
+                if not relevant:
+                    continue
+                if ident not in names:
+                    names[ident] = next((t.name for t in threading.enumerate() if t.ident == ident), str(ident))
+                stack.append("event-loop" if ident == self.loop_thread else names[ident])
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+
+@dataclass
+class ProfileInfo:
+    name: str
+    method: str
+    route: str
+    duration_ms: int
+    samples: int
+    size: int
+    created: float
+
+
+_NAME_RE = re.compile(r"^(\d{8}-\d{6})-(\d+)ms-([A-Z]+)-(.*)\.collapsed$")
+
+
+def _slug(path: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:60] or "root"
+
+
+def write_profile(sampler: _Sampler, method: str, path: str, duration_ms: float) -> str:
+    os.makedirs(settings.profile_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    name = f"{stamp}-{int(duration_ms)}ms-{method}-{_slug(path)}{PROFILE_SUFFIX}"
+    tmp = os.path.join(settings.profile_dir, f".{name}.tmp")
+    with open(tmp, "w") as fh:
+        for stack, count in sampler.stacks.most_common():
+            fh.write(f"{stack} {count}\n")
+    os.replace(tmp, os.path.join(settings.profile_dir, name))
+    _prune()
+    return name
+
+
+def _prune() -> None:
+    files = sorted(f for f in os.listdir(settings.profile_dir) if f.endswith(PROFILE_SUFFIX))
+    for old in files[: max(0, len(files) - settings.profile_keep)]:
+        try:
+            os.remove(os.path.join(settings.profile_dir, old))
+        except OSError:
+            pass
+
+
+def list_profiles(limit: int = 20) -> list[ProfileInfo]:
+    """Latest profiles first."""
+    try:
+        files = sorted((f for f in os.listdir(settings.profile_dir) if f.endswith(PROFILE_SUFFIX)), reverse=True)
+    except FileNotFoundError:
+        return []
+    out = []
+    for name in files[:limit]:
+        m = _NAME_RE.match(name)
+        if m is None:
+            continue
+        full = os.path.join(settings.profile_dir, name)
+        try:
+            st = os.stat(full)
+            with open(full) as fh:
+                samples = sum(int(line.rsplit(" ", 1)[1]) for line in fh if line.strip())
+        except (OSError, ValueError, IndexError):
+            continue
+        out.append(ProfileInfo(
+            name=name,
+            method=m.group(3),
+            route=m.group(4),
+            duration_ms=int(m.group(2)),
+            samples=samples,
+            size=st.st_size,
+            created=st.st_mtime,
+        ))
+    return out
+
+
+def read_profile(name: str) -> str | None:
+    if _NAME_RE.match(name) is None or os.path.basename(name) != name:
+        return None
+    try:
+        with open(os.path.join(settings.profile_dir, name)) as fh:
+            return fh.read()
+    except FileNotFoundError:
+        return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that samples selected requests; install only when enabled."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _wanted(self, scope) -> bool:
+        if settings.profile_allow_header:
+            for key, value in scope.get("headers", ()):
+                if key == PROFILE_HEADER and value in (b"1", b"true"):
+                    return True
+        return settings.profile_sample_rate > 0 and random.random() < settings.profile_sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope) or not _busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = _Sampler(scope, threading.get_ident(), settings.profile_interval_ms / 1000)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            sampler.stop()
+            try:
+                if sampler.stacks:
+                    route = getattr(scope.get("route"), "path", None) or scope["path"]
+                    write_profile(sampler, scope["method"], route, (time.perf_counter() - start) * 1000)
+            except OSError as e:
+                events.emit("profile_write_error", method=scope["method"], path=scope["path"], error=str(e))
+            finally:
+                _busy.release()
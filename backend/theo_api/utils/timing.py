@@ -0,0 +1,217 @@
+"""Per-request stage timing.
+
+Code on the request path wraps its stages in `span("name")` (or calls `record`
+with a duration it measured itself). `ServerTimingMiddleware` collects the
+spans of each request, sends them to the client as a `Server-Timing` header
+and folds them into per-route, per-stage histograms that can be read with
+`timing_snapshot()`.
+
+Spans are kept in a context variable; FastAPI copies the request context into
+the threadpool that runs sync endpoints, so spans recorded there are seen too.
+Spans recorded outside any request are aggregated under the route "-".
+"""
+import bisect
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+from fastapi.routing import APIRoute
+
+# Upper bounds of the histogram buckets, in milliseconds
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_spans: contextvars.ContextVar[list[tuple[str, float]] | None] = contextvars.ContextVar("timing_spans", default=None)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; `observe` is a bisect and a few adds."""
+
+    def __init__(self, buckets: Iterable[float] = BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile: upper bound of the bucket holding it."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return float(bound)
+        return float("inf")
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+        }
+
+
+_histograms: dict[tuple[str, str], Histogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def histogram(route: str, stage: str) -> Histogram:
+    h = _histograms.get((route, stage))
+    if h is None:
+        with _histograms_lock:
+            h = _histograms.setdefault((route, stage), Histogram())
+    return h
+
+
+def record(name: str, duration_ms: float) -> None:
+    """Record a stage duration measured by the caller."""
+    spans = _spans.get()
+    if spans is None:
+        histogram("-", name).observe(duration_ms)
+    else:
+        spans.append((name, duration_ms))
+
+
+@contextmanager
+def span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - start) * 1000)
+
+
+def current_spans() -> dict[str, float]:
+    """Stage durations recorded so far in this request, summed per stage (ms)."""
+    totals: dict[str, float] = {}
+    for name, ms in _spans.get() or ():
+        totals[name] = round(totals.get(name, 0.0) + ms, 2)
+    return totals
+
+
+def timing_snapshot() -> dict[str, dict[str, dict]]:
+    """Histogram summaries as {route: {stage: summary}}."""
+    out: dict[str, dict[str, dict]] = {}
+    for (route, stage), h in sorted(_histograms.items()):
+        out.setdefault(route, {})[stage] = h.summary()
+    return out
+
+
+def server_timing_header(spans: list[tuple[str, float]], total_ms: float) -> str:
+    # Repeated stages (e.g. two DB commits) are summed into one entry
+    totals: dict[str, float] = {}
+    for name, ms in spans:
+        totals[name] = totals.get(name, 0.0) + ms
+    parts = [f"{name};dur={ms:.2f}" for name, ms in totals.items()]
+    parts.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware that collects spans per request and emits Server-Timing.
+
+    Histograms are fed when the last body chunk has been sent, so background
+    tasks that run after the response (e.g. post-game reviews) are not counted
+    in the route's latency.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans: list[tuple[str, float]] = []
+        token = _spans.set(spans)
+        start = time.perf_counter()
+        observed = False
+
+        def observe():
+            nonlocal observed
+            if observed:
+                return
+            observed = True
+            total_ms = (time.perf_counter() - start) * 1000
+            # Keyed by the route's path template (without the API prefix), so
+            # /games/{game_id} is one series however many games there are
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            key = f"{scope['method']} {path}"
+            for name, ms in list(spans):
+                histogram(key, name).observe(ms)
+            histogram(key, "total").observe(total_ms)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total_ms = (time.perf_counter() - start) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing_header(spans, total_ms).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                observe()
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _spans.reset(token)
+            # Requests that failed before finishing a response
+            observe()
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            with span("handler"):
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            with span("handler"):
+                return endpoint(*args, **kwargs)
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """Route class that times the endpoint body ("handler") and everything
+    FastAPI does around it: dependencies, request validation and response
+    serialization ("serialize")."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            spans = _spans.get()
+            if spans is None:
+                return await handler(request)
+            first = len(spans)
+            start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                total_ms = (time.perf_counter() - start) * 1000
+                inner_ms = sum(ms for name, ms in spans[first:] if name == "handler")
+                record("serialize", max(0.0, total_ms - inner_ms))
+
+        return timed_handler
@@ -168,11 +168,25 @@ export interface GameReviewResponse {
   game_id: string;
   elo_bucket: number;
   player_color: PlayerColor;
+  status: "pending" | "ready";
   takeaways: string[];
 }
 
-export async function getGameReview(gameId: string): Promise<GameReviewResponse> {
-  return fetchJson<GameReviewResponse>(`/games/${gameId}/review`);
+// reviews are generated in the background when a game ends; poll until ready
+export async function getGameReview(
+  gameId: string,
+  { intervalMs = 1000, maxAttempts = 30 } = {}
+): Promise<GameReviewResponse> {
+  for (let attempt = 1; ; attempt++) {
+    const review = await fetchJson<GameReviewResponse>(`/games/${gameId}/review`);
+    if (review.status !== "pending") {
+      return review;
+    }
+    if (attempt >= maxAttempts) {
+      throw new ApiError("review still pending", 202, review);
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
 }
 
 // ===== utility functions =====
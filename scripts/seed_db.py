@@ -0,0 +1,70 @@
+"""Load PGN archives into the Theo database as reference games.
+
+    python scripts/seed_db.py games.pgn [more.pgn ...] [--workers 8] [--batch-size 5000]
+
+Games are parsed in a process pool and inserted in batched transactions.
+Progress is saved to `<file>.import.json` after each batch, so an
+interrupted import continues where it stopped when run again. Uses
+DATABASE_URL like the app and creates missing tables.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from theo_api.services.storage.db import Base, SessionLocal, engine  # noqa: E402
+from theo_api.services.storage.pgn_import import import_pgn  # noqa: E402
+
+
+def _progress(stats, size):
+    pct = 100 * stats.offset / size if size else 100
+    print(
+        f"  {pct:5.1f}%  {stats.read} games ({stats.inserted} new, {stats.invalid} invalid)"
+        f"  {stats.rate:,.0f} games/s",
+        flush=True,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import PGN files into the games table.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--workers", type=int, default=0, help="parser processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="games per transaction")
+    parser.add_argument("--elo", type=int, default=None, help="Elo bucket for all games (default: from headers)")
+    parser.add_argument("--no-positions", action="store_true", help="don't add the games to the position index")
+    parser.add_argument("--restart", action="store_true", help="ignore saved progress")
+    parser.add_argument("--errors", help="write rejected games' errors to this file")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    error_log = open(args.errors, "a") if args.errors else None
+    try:
+        for path in args.files:
+            checkpoint = path + ".import.json"
+            if args.restart and os.path.exists(checkpoint):
+                os.remove(checkpoint)
+            print(f"{path}:", flush=True)
+            stats = import_pgn(
+                path,
+                SessionLocal,
+                workers=args.workers or None,
+                batch_size=args.batch_size,
+                elo_bucket=args.elo,
+                index_positions=not args.no_positions,
+                checkpoint=checkpoint,
+                progress=_progress,
+                errors=(lambda e: error_log.write(e + "\n")) if error_log else None,
+            )
+            print(
+                f"  done: {stats.read} games, {stats.inserted} new, {stats.invalid} invalid"
+                f" in {stats.seconds:.1f}s ({stats.rate:,.0f} games/s)"
+            )
+    finally:
+        if error_log is not None:
+            error_log.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())